@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对局归档 - 把结束的对局追加到gzip压缩的JSONL文件，按日期和大小轮转，并提供流式统计
+
+统计归档: python archive.py archive/ [开始日期] [结束日期]
+日期格式为YYYY-MM-DD，例如 python archive.py archive/ 2026-09-01 2026-09-30
+"""
+import asyncio
+import datetime
+import glob
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+# 归档文件名: games-年月日-序号.jsonl.gz，按文件名排序即按时间排序；
+# 启用分片时为 games-年月日-序号.工作进程ID.jsonl.gz，各进程只写自己的文件
+FILE_PREFIX = "games-"
+FILE_SUFFIX = ".jsonl.gz"
+
+
+def _file_date(path: str) -> str:
+    """从归档文件名取出日期(YYYYMMDD)"""
+    return os.path.basename(path)[len(FILE_PREFIX):len(FILE_PREFIX) + 8]
+
+
+class GameArchive:
+    """对局归档写入器
+
+    结束的对局先放在内存中，每隔flush_interval秒在单独的工作线程中批量写出：每批压缩为一个
+    gzip成员追加到当天的文件末尾，多个成员首尾相接仍是合法的gzip文件，进程中途退出最多丢失
+    最后一个不完整的成员。文件超过max_bytes或日期变化时换用新文件。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, flush_interval: float = 5.0,
+                 worker_id: str = ""):
+        self.directory = directory
+        self._suffix = f".{worker_id}{FILE_SUFFIX}" if worker_id else FILE_SUFFIX
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self._pending: List[str] = []  # 待写出的JSON行
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitaireArchive")
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()  # close时唤醒定时任务
+        self._closing = False
+        self._path: Optional[str] = None  # 当前写入的文件，仅在工作线程中使用
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, game: dict):
+        """归档一局对局，稍后批量写出"""
+        self._pending.append(json.dumps(game, ensure_ascii=False, separators=(",", ":")))
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        """每隔flush_interval秒写出一次，直到没有待写内容；close时提前写出"""
+        while self._pending and not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"批量写入对局归档失败: {str(e)}")
+
+    async def flush(self):
+        """把内存中的对局写入归档文件"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            if not await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch):
+                # 写入失败的对局放回队首，下一轮重试
+                self._pending[:0] = batch
+
+    def _write(self, batch: List[str]) -> bool:
+        """在工作线程中写出一批对局，返回是否成功"""
+        try:
+            data = gzip.compress(("\n".join(batch) + "\n").encode("utf-8"))
+            path = self._current_path(len(data))
+            with open(path, "ab") as f:
+                f.write(data)
+            return True
+        except Exception as e:
+            logger.error(f"写入对局归档失败，{len(batch)} 局稍后重试: {str(e)}")
+            return False
+
+    def _current_path(self, incoming: int) -> str:
+        """当前应写入的文件，日期变化或文件将超过大小上限时换用新文件"""
+        date = time.strftime("%Y%m%d")
+        path = self._path
+        if path is None or _file_date(path) != date:
+            # 启动或跨天时接着写当天最后一个文件
+            pattern = os.path.join(self.directory, f"{FILE_PREFIX}{date}-*{self._suffix}")
+            existing = sorted(p for p in glob.glob(pattern) if self._sequence(p) is not None)
+            path = existing[-1] if existing else self._path_for(date, 1)
+        if os.path.exists(path) and os.path.getsize(path) + incoming > self.max_bytes:
+            path = self._path_for(date, self._sequence(path) + 1)
+            logger.info(f"对局归档已轮转: {path}")
+        self._path = path
+        return path
+
+    def _sequence(self, path: str) -> Optional[int]:
+        """文件名中的序号，不是本进程写的文件时返回None"""
+        sequence = os.path.basename(path)[len(FILE_PREFIX) + 9:-len(self._suffix)]
+        return int(sequence) if sequence.isdigit() else None
+
+    def _path_for(self, date: str, sequence: int) -> str:
+        return os.path.join(self.directory, f"{FILE_PREFIX}{date}-{sequence:03d}{self._suffix}")
+
+    async def close(self):
+        """写出全部对局并关闭工作线程"""
+        self._closing = True
+        if self._timer is not None and not self._timer.done():
+            # 不取消定时任务，以免中途取消的那一批既没写出也没放回
+            self._wakeup.set()
+            await self._timer
+        await self.flush()
+        if self._pending:
+            logger.error(f"卸载时仍有 {len(self._pending)} 局未能写入归档")
+        self._executor.shutdown(wait=True)
+
+
+def archive_files(directory: str, since: Optional[datetime.date] = None,
+                  until: Optional[datetime.date] = None) -> List[str]:
+    """按时间顺序列出日期范围内的归档文件，范围两端均包含"""
+    paths = sorted(glob.glob(os.path.join(directory, f"{FILE_PREFIX}*{FILE_SUFFIX}")))
+    low = since.strftime("%Y%m%d") if since else ""
+    high = until.strftime("%Y%m%d") if until else "99999999"
+    return [path for path in paths if low <= _file_date(path) <= high]
+
+
+def iter_games(directory: str, since: Optional[datetime.date] = None,
+               until: Optional[datetime.date] = None) -> Iterator[dict]:
+    """逐局读取归档，每次只在内存中保留一行；文件末尾不完整的部分跳过"""
+    for path in archive_files(directory, since, until):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        logger.warning(f"跳过无法解析的归档记录: {path}")
+        except (EOFError, gzip.BadGzipFile, zlib.error) as e:
+            logger.warning(f"归档文件 {path} 末尾不完整，已读取完整的部分: {str(e)}")
+
+
+class ArchiveStats:
+    """一次遍历归档累计的统计：最常用成语、平均接龙长度、每个玩家的接龙成功率"""
+
+    def __init__(self):
+        self.games = 0
+        self.total_chain = 0
+        self.idioms: Counter = Counter()
+        self.successes: Counter = Counter()  # {wxid: 成功接龙次数}
+        self.attempts: Counter = Counter()  # {wxid: 接龙尝试次数}
+
+    @classmethod
+    def collect(cls, games: Iterable[dict]) -> "ArchiveStats":
+        stats = cls()
+        for game in games:
+            stats.add(game)
+        return stats
+
+    def add(self, game: dict):
+        chain = game.get("chain", [])
+        self.games += 1
+        self.total_chain += len(chain)
+        self.idioms.update(chain)
+        self.successes.update(game.get("idioms", {}))
+        self.attempts.update(game.get("attempts", {}))
+
+    def most_used(self, n: int = 10) -> List[Tuple[str, int]]:
+        """使用次数最多的成语"""
+        return self.idioms.most_common(n)
+
+    @property
+    def average_chain_length(self) -> float:
+        """平均每局的接龙长度(包括首个成语)"""
+        return self.total_chain / self.games if self.games else 0.0
+
+    def accuracy(self) -> Dict[str, Tuple[int, int, float]]:
+        """每个玩家的(成功次数, 尝试次数, 成功率)"""
+        result = {}
+        for wxid in self.attempts.keys() | self.successes.keys():
+            successes = self.successes[wxid]
+            # 旧版本或重启恢复的会话可能缺少尝试次数，至少按成功次数计
+            attempts = max(self.attempts[wxid], successes)
+            result[wxid] = (successes, attempts, successes / attempts if attempts else 0.0)
+        return result
+
+
+def _parse_date(text: str) -> datetime.date:
+    return datetime.datetime.strptime(text, "%Y-%m-%d").date()
+
+
+def main(argv):
+    if not 2 <= len(argv) <= 4:
+        print(__doc__)
+        return 1
+    since = _parse_date(argv[2]) if len(argv) > 2 else None
+    until = _parse_date(argv[3]) if len(argv) > 3 else None
+    stats = ArchiveStats.collect(iter_games(argv[1], since, until))
+
+    print(f"对局数: {stats.games}，平均接龙长度: {stats.average_chain_length:.1f}")
+    print("最常用的成语:")
+    for idiom, count in stats.most_used(20):
+        print(f"  {idiom}: {count}")
+    print("玩家接龙成功率(按尝试次数排序):")
+    accuracy = sorted(stats.accuracy().items(), key=lambda item: item[1][1], reverse=True)
+    for wxid, (successes, attempts, ratio) in accuracy[:20]:
+        print(f"  {wxid}: {successes}/{attempts} ({ratio:.1%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
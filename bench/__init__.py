@@ -0,0 +1,3 @@
+"""
+压力测试工具 - 本地模拟API、模拟微信客户端和负载生成器
+"""
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟微信客户端 - 代替WechatAPIClient，只记录发送的消息
+"""
+import asyncio
+import time
+from typing import List, Tuple
+
+
+class FakeWechatAPIClient:
+    """记录插件发出的消息，不连接微信
+
+    只实现插件用到的接口；send_latency可模拟发送消息的网络耗时。
+    """
+
+    def __init__(self, send_latency: float = 0.0):
+        self.send_latency = send_latency
+        self.sent: List[Tuple[str, str, float]] = []  # [(群聊ID, 内容, 发送时间)]
+        self.nickname_calls = 0
+
+    async def send_text_message(self, wxid: str, content: str, at=""):
+        if self.send_latency > 0:
+            await asyncio.sleep(self.send_latency)
+        self.sent.append((wxid, content, time.time()))
+        return len(self.sent), int(time.time()), len(self.sent)
+
+    async def get_nickname(self, wxid: str) -> str:
+        self.nickname_calls += 1
+        return f"玩家{wxid[-4:]}"
+
+    def sent_to(self, wxid: str) -> List[str]:
+        """发往某个群的全部消息"""
+        return [content for target, content, _ in self.sent if target == wxid]
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+负载生成器 - 在N个群中以每秒M条消息驱动 handle_message 和 check_game_sessions，输出JSON结果
+
+在机器人根目录运行(需能导入 utils、WechatAPI):
+    python -m plugins.IdiomSolitaire.bench.loadtest --words plugins/IdiomSolitaire/idioms.txt \\
+        --rooms 50 --rate 200 --duration 30 --output result.json
+
+传入 --baseline 时与上次的结果比较，关键指标变差超过 --tolerance 时以退出码1结束。
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tomllib
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from ..dictionary import IdiomDictionary
+from ..ledger import PointsLedger
+from ..main import IdiomSolitaire
+from .fake_bot import FakeWechatAPIClient
+from .mock_api import MockIdiomApi
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与基线比较的指标及方向，均为越小越好
+REGRESSION_METRICS = (
+    ("handle_latency_ms", "p95"),
+    ("handle_latency_ms", "p99"),
+    ("upstream_calls_per_accept",),
+    ("persistence", "record_us_mean"),
+    ("persistence", "close_ms"),
+)
+
+
+def percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """计算p50/p95/p99等统计值(最近秩法)"""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def rank(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 3),
+        "p50": round(rank(0.50), 3),
+        "p95": round(rank(0.95), 3),
+        "p99": round(rank(0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _toml_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return "[" + ", ".join(_toml_value(v) for v in value) + "]"
+    raise TypeError(f"不支持的配置值类型: {type(value)}")
+
+
+def write_config(path: str, game_config: dict):
+    """写出只含 [IdiomSolitaire] 一节的配置文件"""
+    lines = ["[IdiomSolitaire]"]
+    lines.extend(f"{key} = {_toml_value(value)}" for key, value in game_config.items())
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+class _TimedStore:
+    """统计会话存储在事件循环上的耗时"""
+
+    def __init__(self, store):
+        self._store = store
+        self.records = 0
+        self.record_seconds = 0.0
+        self.close_seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._store, name)
+
+    def record(self, op: str, chatroom_id: str, **fields):
+        start = time.perf_counter()
+        self._store.record(op, chatroom_id, **fields)
+        self.record_seconds += time.perf_counter() - start
+        self.records += 1
+
+    async def close(self):
+        start = time.perf_counter()
+        await self._store.close()
+        self.close_seconds = time.perf_counter() - start
+
+
+class LoadGenerator:
+    """模拟多个群的玩家按固定速率发送消息
+
+    每条消息随机选一个群：游戏已结束时发送开始命令，否则按比例发送
+    有效接龙、首字不对的成语或不是成语的文字。
+    """
+
+    def __init__(self, plugin: IdiomSolitaire, bot: FakeWechatAPIClient, dictionary: IdiomDictionary,
+                 rooms: int, players: int, valid_ratio: float, wrong_ratio: float, seed: Optional[int] = None):
+        self.plugin = plugin
+        self.bot = bot
+        self.dictionary = dictionary
+        self.rooms = [f"{10000000 + i}@chatroom" for i in range(rooms)]
+        self.players = [f"wxid_bench{i:04d}" for i in range(players)]
+        self.valid_ratio = valid_ratio
+        self.wrong_ratio = wrong_ratio
+        self.random = random.Random(seed)
+        self.latencies: List[float] = []  # 毫秒
+        self.kinds: Counter = Counter()
+
+    def _next_message(self) -> dict:
+        room = self.random.choice(self.rooms)
+        session = self.plugin.game_sessions.get(room)
+        if session is None or not session.active:
+            kind, content = "start", self.plugin.commands[0]
+        else:
+            roll = self.random.random()
+            content = None
+            if roll < self.valid_ratio:
+                kind = "valid"
+                ids = self.dictionary.starting_with(session.current_idiom[-1])
+                candidates = [w for w in map(self.dictionary.word_at, ids) if w not in session.used_idioms]
+                if candidates:
+                    content = self.random.choice(candidates)
+            elif roll < self.valid_ratio + self.wrong_ratio:
+                kind = "wrong"
+                content = self.dictionary.word_at(self.random.randrange(len(self.dictionary)))
+            else:
+                kind = "junk"
+            if content is None:
+                kind = "junk"
+                content = "".join(chr(self.random.randint(0x4E00, 0x9FA5)) for _ in range(4))
+        self.kinds[kind] += 1
+        return {"FromWxid": room, "SenderWxid": self.random.choice(self.players), "Content": content}
+
+    async def _deliver(self, message: dict):
+        start = time.perf_counter()
+        await self.plugin.handle_message(self.bot, message)
+        self.latencies.append((time.perf_counter() - start) * 1000)
+
+    async def start_rooms(self):
+        """先在所有群开始游戏"""
+        for room in self.rooms:
+            await self.plugin.handle_message(
+                self.bot, {"FromWxid": room, "SenderWxid": self.players[0], "Content": self.plugin.commands[0]}
+            )
+
+    async def run(self, rate: float, duration: float) -> int:
+        """开环发送：按固定间隔投递消息，不等待上一条处理完"""
+        interval = 1.0 / rate
+        tasks = set()
+        loop = asyncio.get_running_loop()
+        begin = next_at = loop.time()
+        sent = 0
+        while next_at - begin < duration:
+            task = loop.create_task(self._deliver(self._next_message()))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            sent += 1
+            next_at += interval
+            delay = next_at - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if tasks:
+            await asyncio.gather(*tasks)
+        return sent
+
+
+async def _tick(plugin: IdiomSolitaire, bot: FakeWechatAPIClient, latencies: List[float], stop: asyncio.Event):
+    """模拟框架每秒调用一次 check_game_sessions"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await plugin.check_game_sessions(bot)
+        latencies.append((time.perf_counter() - start) * 1000)
+        try:
+            await asyncio.wait_for(stop.wait(), 1.0)
+        except asyncio.TimeoutError:
+            pass
+
+
+def base_config(path: Optional[str]) -> dict:
+    """读取基础配置的 [IdiomSolitaire] 一节，依次尝试指定文件、插件目录下的config.toml和模板"""
+    for candidate in (path, os.path.join(PLUGIN_DIR, "config.toml"), os.path.join(PLUGIN_DIR, "config.toml.template")):
+        if candidate and os.path.exists(candidate):
+            with open(candidate, "rb") as f:
+                return dict(tomllib.load(f).get("IdiomSolitaire", {}))
+    return {}
+
+
+async def run(args) -> dict:
+    dictionary = IdiomDictionary.load(args.words)
+    if dictionary is None or len(dictionary) == 0:
+        raise SystemExit(f"词库文件不存在或为空: {args.words}")
+
+    mock: Optional[MockIdiomApi] = None
+    api_url = args.api_url
+    if api_url is None:
+        mock = MockIdiomApi(dictionary.words, args.api_latency, args.api_jitter, args.api_error_rate, args.seed)
+        api_url = await mock.start()
+
+    work_dir = tempfile.mkdtemp(prefix="idiom-bench-")
+    try:
+        game_config = base_config(args.config)
+        game_config.update({
+            "enable": True,
+            "debug-mode": False,
+            "mode": "exact",  # 模拟API只实现相同尾字规则
+            "api-url": api_url,
+            "validation": args.validation,
+            "dictionary-file": os.path.abspath(args.words),
+            "round-timeout": args.round_timeout,
+            "reminder-time": args.reminder_time,
+            "enable-persistence": args.persistence != "off",
+            "persistence-backend": args.persistence if args.persistence != "off" else "journal",
+        })
+        config_path = os.path.join(work_dir, "config.toml")
+        write_config(config_path, game_config)
+
+        plugin = IdiomSolitaire(config_path)
+        if not plugin.enable:
+            raise SystemExit("插件初始化失败")
+
+        # 积分只在内存中累计，不写入真实的积分数据库
+        plugin.ledger = PointsLedger(lambda wxid, points: None, flush_interval=game_config.get("points-flush-interval", 10))
+        store = plugin.session_store = _TimedStore(plugin.session_store)
+
+        # 统计上游请求和接龙成功次数
+        upstream: Counter = Counter()
+        api_get = plugin._api_get
+
+        async def counted_api_get(params: dict, **kwargs):
+            upstream["start" if "start" in params else "guess"] += 1
+            return await api_get(params, **kwargs)
+
+        plugin._api_get = counted_api_get
+
+        accepted = 0
+        handle_success = plugin._handle_success
+
+        async def counted_handle_success(*a, **kw):
+            nonlocal accepted
+            accepted += 1
+            return await handle_success(*a, **kw)
+
+        plugin._handle_success = counted_handle_success
+
+        await plugin.async_init()
+        bot = FakeWechatAPIClient(args.send_latency)
+        generator = LoadGenerator(plugin, bot, dictionary, args.rooms, args.players,
+                                  args.valid_ratio, args.wrong_ratio, args.seed)
+
+        await generator.start_rooms()
+
+        tick_latencies: List[float] = []
+        stop = asyncio.Event()
+        ticker = asyncio.get_running_loop().create_task(_tick(plugin, bot, tick_latencies, stop))
+        started = time.perf_counter()
+        messages = await generator.run(args.rate, args.duration)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ticker
+
+        await store.close()
+        await plugin.outbox.close()
+        await plugin.ledger.close()
+        if plugin.leaderboard is not None:
+            await plugin.leaderboard.close()
+        if plugin.archive is not None:
+            await plugin.archive.close()
+        if plugin.solver is not None:
+            plugin.solver.close()
+        if plugin.http_session is not None:
+            await plugin.http_session.close()
+
+        return {
+            "config": {
+                "rooms": args.rooms,
+                "players": args.players,
+                "rate": args.rate,
+                "duration": args.duration,
+                "validation": plugin.validation,
+                "persistence": args.persistence,
+                "api_latency": args.api_latency if mock else None,
+                "api_error_rate": args.api_error_rate if mock else None,
+                "dictionary_size": len(dictionary),
+            },
+            "messages": messages,
+            "message_kinds": dict(generator.kinds),
+            "achieved_rate": round(messages / elapsed, 2) if elapsed > 0 else 0.0,
+            "handle_latency_ms": percentiles(generator.latencies),
+            "check_sessions_ms": percentiles(tick_latencies),
+            "accepted": accepted,
+            "upstream_calls": dict(upstream),
+            "upstream_errors": mock.calls["error"] if mock else None,
+            "upstream_calls_per_accept": round(upstream["guess"] / accepted, 3) if accepted else None,
+            "persistence": {
+                "records": store.records,
+                "record_ms_total": round(store.record_seconds * 1000, 3),
+                "record_us_mean": round(store.record_seconds * 1e6 / store.records, 3) if store.records else 0.0,
+                "close_ms": round(store.close_seconds * 1000, 3),
+            },
+            "stages_ms": {
+                stage: {"p50": histogram.quantile(0.5) * 1000, "p95": histogram.quantile(0.95) * 1000,
+                        "count": histogram.count}
+                for stage, histogram in plugin.metrics.stages().items()
+            },
+            "sent_messages": len(bot.sent),
+            "verdict_cache": plugin.verdict_cache.stats(),
+        }
+    finally:
+        if mock is not None:
+            await mock.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """与基线比较，返回变差超过容差的指标"""
+    regressions = []
+    for path in REGRESSION_METRICS:
+        current, previous = result, baseline
+        for key in path:
+            current = current.get(key) if isinstance(current, dict) else None
+            previous = previous.get(key) if isinstance(previous, dict) else None
+        if not isinstance(current, (int, float)) or not isinstance(previous, (int, float)) or previous <= 0:
+            continue
+        if current > previous * (1 + tolerance):
+            regressions.append(f"{'.'.join(path)}: {previous} -> {current}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="成语接龙插件压力测试")
+    parser.add_argument("--words", default=os.path.join(PLUGIN_DIR, "idioms.txt"), help="成语词库文件")
+    parser.add_argument("--config", default=None, help="基础配置文件，默认使用插件目录下的config.toml")
+    parser.add_argument("--rooms", type=int, default=20, help="群数")
+    parser.add_argument("--players", type=int, default=50, help="玩家数")
+    parser.add_argument("--rate", type=float, default=100, help="每秒发送的消息数")
+    parser.add_argument("--duration", type=float, default=10, help="持续时间(秒)")
+    parser.add_argument("--valid-ratio", type=float, default=0.5, help="有效接龙的比例")
+    parser.add_argument("--wrong-ratio", type=float, default=0.3, help="首字不对的成语的比例，其余为不是成语的文字")
+    parser.add_argument("--validation", default="local-first", choices=("remote", "local", "local-first"))
+    parser.add_argument("--persistence", default="journal", choices=("journal", "sqlite", "off"))
+    parser.add_argument("--round-timeout", type=int, default=60)
+    parser.add_argument("--reminder-time", type=int, default=30)
+    parser.add_argument("--api-url", default=None, help="使用已启动的模拟API，不指定时在进程内启动")
+    parser.add_argument("--api-latency", type=float, default=0.05, help="模拟API平均延迟(秒)")
+    parser.add_argument("--api-jitter", type=float, default=0.02, help="模拟API延迟波动(秒)")
+    parser.add_argument("--api-error-rate", type=float, default=0.0, help="模拟API返回HTTP 500的概率")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="模拟发送消息的耗时(秒)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument("--baseline", default=None, help="基线结果JSON文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的变差比例")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("性能回退:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
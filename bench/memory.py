@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话内存测试 - 创建N个进行中的游戏会话，用tracemalloc统计平均每个会话占用的字节数
+
+在机器人根目录运行(需能导入 utils、WechatAPI):
+    python -m plugins.IdiomSolitaire.bench.memory --words plugins/IdiomSolitaire/idioms.txt --rooms 10000
+
+同时按原始的GameSession(普通dataclass、按wxid的三个字典、成语字符串列表)构造同样的会话作为对照。
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from ..dictionary import IdiomDictionary
+from ..main import GameSession
+from ..players import CONSECUTIVE, IDIOMS, SCORE
+from ..used import UsedIdioms
+
+
+@dataclass
+class _LegacySession:
+    """原始的会话结构，与改造前main.py中的GameSession一致，仅用于对照"""
+    chatroom_id: str
+    game_id: str
+    current_idiom: str
+    last_player: Optional[str] = None
+    active: bool = True
+    players: Dict[str, int] = field(default_factory=dict)
+    consecutive_players: Dict[str, int] = field(default_factory=dict)
+    total_idioms_count: Dict[str, int] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.time)
+    last_activity_time: float = field(default_factory=time.time)
+    reminder_sent: bool = False
+    used_idioms: List[str] = field(default_factory=list)
+
+
+def _strings(dictionary: IdiomDictionary, chain: List[int], players: List[int]):
+    """重新构造成语和wxid字符串，与从消息中收到的一样是独立的对象，计入会话占用的内存"""
+    return ([dictionary.word_at(i)[:1] + dictionary.word_at(i)[1:] for i in chain],
+            [f"wxid_bench{i:06d}" for i in players])
+
+
+def _build_compact(room: str, chain: List[str], players: List[str], dictionary: IdiomDictionary) -> GameSession:
+    session = GameSession(chatroom_id=room, game_id=f"local-{room}", current_idiom=chain[-1],
+                          used_idioms=UsedIdioms(chain, dictionary))
+    stats = session.stats
+    for i, wxid in enumerate(players):
+        stats.add(SCORE, wxid, 5 * (i + 1))
+        stats.set(CONSECUTIVE, wxid, 1)
+        stats.add(IDIOMS, wxid, i + 1)
+    session.last_player = players[-1]
+    return session
+
+
+def _build_legacy(room: str, chain: List[str], players: List[str], dictionary: IdiomDictionary) -> _LegacySession:
+    session = _LegacySession(chatroom_id=room, game_id=f"local-{room}", current_idiom=chain[-1])
+    session.used_idioms.extend(chain)
+    for i, wxid in enumerate(players):
+        session.players[wxid] = 5 * (i + 1)
+        session.consecutive_players[wxid] = 1
+        session.total_idioms_count[wxid] = i + 1
+    session.last_player = players[-1]
+    return session
+
+
+def measure(build: Callable, games: List[tuple], dictionary: IdiomDictionary) -> float:
+    """平均每个会话新占用的字节数"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = {room: build(room, *_strings(dictionary, chain, players), dictionary) for room, chain, players in games}
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del sessions
+    return used / len(games)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="成语接龙会话内存测试")
+    parser.add_argument("--words", required=True, help="成语词库文件")
+    parser.add_argument("--rooms", type=int, default=10000, help="进行中的游戏数")
+    parser.add_argument("--players", type=int, default=2000, help="玩家总数，每局随机取5人")
+    parser.add_argument("--rounds", type=int, default=20, help="每局已进行的轮数")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    dictionary = IdiomDictionary.load(args.words)
+    if dictionary is None:
+        raise SystemExit(f"词库文件不存在: {args.words}")
+    random_ = random.Random(args.seed)
+    # 预先生成各局的成语编号和玩家编号，字符串在统计期间构造
+    games = [(f"{1000000 + i}@chatroom",
+              [random_.randrange(len(dictionary)) for _ in range(args.rounds * 2 + 1)],
+              random_.sample(range(args.players), min(args.players, 5)))
+             for i in range(args.rooms)]
+
+    result = {
+        "rooms": args.rooms,
+        "rounds": args.rounds,
+        "bytes_per_session": round(measure(_build_compact, games, dictionary)),
+        "legacy_bytes_per_session": round(measure(_build_legacy, games, dictionary)),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模拟成语接龙API - 在本地实现 start / game_id / idiom 接口，可配置延迟和错误率
+
+单独运行: python -m plugins.IdiomSolitaire.bench.mock_api --words idioms.txt --port 8765 --latency 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from collections import Counter
+from typing import Dict, Optional, Sequence, Set
+
+from aiohttp import web
+
+from ..dictionary import IdiomDictionary
+
+
+class MockGame:
+    """模拟API中一局游戏的状态：当前成语和已使用的成语"""
+
+    __slots__ = ("current", "used")
+
+    def __init__(self, first_idiom: str):
+        self.current = first_idiom
+        self.used: Set[str] = {first_idiom}
+
+
+class MockIdiomApi:
+    """按相同尾字规则判定接龙的模拟API
+
+    latency为平均响应延迟，实际延迟在 latency±jitter 内均匀分布；
+    error_rate为返回HTTP 500的概率。calls按请求类型统计调用次数。
+    """
+
+    def __init__(self, words: Sequence[str], latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: Optional[int] = None):
+        self.dictionary = IdiomDictionary(words)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.games: Dict[str, MockGame] = {}
+        self.calls: Counter = Counter()  # start / guess / error
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """启动HTTP服务，返回API地址；port为0时自动选择端口"""
+        app = web.Application()
+        app.router.add_get("/api/chengyujielong", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/api/chengyujielong"
+        return self.url
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        query = request.query
+        kind = "start" if query.get("start") == "true" else "guess"
+        self.calls[kind] += 1
+        if self.random.random() < self.error_rate:
+            self.calls["error"] += 1
+            return web.Response(status=500, text="Internal Server Error")
+
+        if kind == "start":
+            return web.json_response(self._start(), dumps=dumps_json)
+        return web.json_response(self._guess(query.get("game_id", ""), query.get("idiom", "")),
+                                 dumps=dumps_json)
+
+    def _start(self) -> dict:
+        first_idiom = self.dictionary.word_at(self.random.randrange(len(self.dictionary)))
+        game_id = uuid.uuid4().hex
+        self.games[game_id] = MockGame(first_idiom)
+        return {"code": 200, "msg": "Game started successfully",
+                "result": {"game_id": game_id, "first_idiom": first_idiom}}
+
+    def _guess(self, game_id: str, idiom: str) -> dict:
+        game = self.games.get(game_id)
+        if game is None:
+            return {"code": 404, "msg": "游戏不存在"}
+        if idiom not in self.dictionary:
+            return {"code": 400, "msg": "成语不存在"}
+        if idiom[0] != game.current[-1]:
+            return {"code": 400, "msg": f"成语必须以\"{game.current[-1]}\"开头"}
+        if idiom in game.used:
+            return {"code": 400, "msg": "成语已被使用"}
+
+        game.used.add(idiom)
+        candidates = [i for i in self.dictionary.starting_with(idiom[-1])
+                      if self.dictionary.word_at(i) not in game.used]
+        if not candidates:
+            del self.games[game_id]
+            return {"code": 200, "msg": "Game over", "result": {}}
+
+        next_idiom = self.dictionary.word_at(self.random.choice(candidates))
+        game.used.add(next_idiom)
+        game.current = next_idiom
+        return {"code": 200, "msg": "Success", "result": {"next_idiom": next_idiom}}
+
+
+def dumps_json(data) -> str:
+    """响应体的JSON序列化，中文原样输出"""
+    return json.dumps(data, ensure_ascii=False)
+
+
+async def _serve(args):
+    dictionary = IdiomDictionary.load(args.words)
+    if dictionary is None:
+        raise SystemExit(f"词库文件不存在: {args.words}")
+    api = MockIdiomApi(dictionary.words, args.latency, args.jitter, args.error_rate, args.seed)
+    url = await api.start(args.host, args.port)
+    print(f"模拟API已启动: {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟成语接龙API")
+    parser.add_argument("--words", required=True, help="成语词库文件")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="平均响应延迟(秒)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="延迟波动范围(秒)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回HTTP 500的概率")
+    parser.add_argument("--seed", type=int, default=None)
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流量回放 - 把 capture-file 录制的轨迹按原始节奏或加速后重新送入插件，输出JSON结果
+
+在机器人根目录运行(需能导入 utils、WechatAPI):
+    python -m plugins.IdiomSolitaire.bench.replay plugins/IdiomSolitaire/trace.jsonl --speed 10 \\
+        --output after.json --baseline before.json
+
+上游请求优先返回轨迹中录制的响应和耗时，轨迹中没有的请求(如新版本多发或改发的请求)由模拟API按规则应答。
+加速时插件的超时、提醒、冷却等时间设置按同一倍数缩短，发送和限流速率按同一倍数提高。
+传入 --baseline 时与上次的结果比较，关键指标变差超过 --tolerance 时以退出码1结束。
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+from ..capture import read_trace
+from ..dictionary import IdiomDictionary
+from ..ledger import PointsLedger
+from ..main import IdiomSolitaire
+from .fake_bot import FakeWechatAPIClient
+from .loadtest import PLUGIN_DIR, base_config, compare, percentiles, write_config
+from .mock_api import MockGame, MockIdiomApi, dumps_json
+
+# 加速回放时按倍数缩短的时间设置及其默认值(秒)
+SCALED_DURATIONS = (
+    ("round-timeout", 60),
+    ("reminder-time", 30),
+    ("error-cooldown", 5),
+    ("error-merge-window", 1.5),
+    ("api-timeout", 8),
+    ("http-connect-timeout", 3),
+    ("http-read-timeout", 5),
+    ("breaker-slow-call", 3),
+    ("breaker-open-seconds", 30),
+)
+# 加速回放时按倍数提高的速率设置及其默认值(每秒)
+SCALED_RATES = (
+    ("send-rate", 1.0),
+    ("flood-rate", 1.0),
+)
+
+
+class _Reply(NamedTuple):
+    status: str
+    data: Optional[dict]
+    latency: float
+
+
+class RecordedApi(MockIdiomApi):
+    """优先按轨迹应答的模拟API
+
+    开始游戏的请求按录制顺序依次返回录制的响应；接龙请求按(游戏ID, 成语)取录制的响应，
+    找不到时按相同尾字规则判定。录制的响应同时更新模拟的游戏状态，之后按规则判定的请求仍然连贯。
+    录制的耗时按speed缩短，录制时失败的请求返回HTTP 500。
+    """
+
+    def __init__(self, words: Sequence[str], events: Sequence[dict], speed: float = 1.0,
+                 seed: Optional[int] = None):
+        super().__init__(words, seed=seed)
+        self.speed = speed
+        self._starts: Deque[_Reply] = deque()
+        self._guesses: Dict[Tuple[str, str], Deque[_Reply]] = {}
+        latencies = []
+        for event in events:
+            if event.get("type") != "upstream":
+                continue
+            reply = _Reply(event.get("status", "ok"), event.get("data"), event.get("latency", 0.0))
+            latencies.append(reply.latency)
+            params = event.get("params", {})
+            if "start" in params:
+                self._starts.append(reply)
+            else:
+                key = (params.get("game_id", ""), params.get("idiom", ""))
+                self._guesses.setdefault(key, deque()).append(reply)
+        self.recorded = len(latencies)
+        # 轨迹中没有的请求按录制的平均耗时应答
+        self.latency = sum(latencies) / len(latencies) / speed if latencies else 0.0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        query = request.query
+        kind = "start" if query.get("start") == "true" else "guess"
+        self.calls[kind] += 1
+        if kind == "start":
+            reply = self._starts.popleft() if self._starts else None
+        else:
+            replies = self._guesses.get((query.get("game_id", ""), query.get("idiom", "")))
+            reply = replies.popleft() if replies else None
+
+        delay = reply.latency / self.speed if reply is not None else self.latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if reply is None:
+            self.calls["synthesized"] += 1
+            if kind == "start":
+                return web.json_response(self._start(), dumps=dumps_json)
+            return web.json_response(self._guess(query.get("game_id", ""), query.get("idiom", "")), dumps=dumps_json)
+
+        self.calls["replayed"] += 1
+        if reply.status != "ok" or reply.data is None:
+            self.calls["error"] += 1
+            return web.Response(status=500, text="Internal Server Error")
+        self._follow(kind, query, reply.data)
+        return web.json_response(reply.data, dumps=dumps_json)
+
+    def _follow(self, kind: str, query, data: dict):
+        """按录制的响应更新模拟的游戏状态"""
+        result = data.get("result") or {}
+        if kind == "start":
+            if result.get("game_id") and result.get("first_idiom"):
+                self.games[result["game_id"]] = MockGame(result["first_idiom"])
+            return
+        game = self.games.get(query.get("game_id", ""))
+        if game is None or data.get("code") != 200:
+            return
+        game.used.add(query.get("idiom", ""))
+        next_idiom = result.get("next_idiom")
+        if next_idiom:
+            game.used.add(next_idiom)
+            game.current = next_idiom
+
+
+def replay_config(base: dict, recorded: dict, speed: float) -> dict:
+    """回放使用的配置：录制时的配置覆盖基础配置，时间设置按回放速度换算"""
+    game_config = dict(base)
+    game_config.update(recorded)
+    for key, default in SCALED_DURATIONS:
+        game_config[key] = game_config.get(key, default) / speed
+    for key, default in SCALED_RATES:
+        game_config[key] = game_config.get(key, default) * speed
+    return game_config
+
+
+async def run(args) -> dict:
+    events = read_trace(args.trace)
+    header, events = events[0], events[1:]
+    dictionary = IdiomDictionary.load(args.words)
+    if dictionary is None or len(dictionary) == 0:
+        raise SystemExit(f"词库文件不存在或为空: {args.words}")
+
+    mock = RecordedApi(dictionary.words, events, args.speed, args.seed)
+    api_url = await mock.start()
+
+    work_dir = tempfile.mkdtemp(prefix="idiom-replay-")
+    try:
+        game_config = replay_config(base_config(args.config), header.get("config", {}), args.speed)
+        pinyin_file = game_config.get("pinyin-file", "pinyin.txt")
+        game_config.update({
+            "enable": True,
+            "debug-mode": False,
+            "api-url": api_url,
+            "dictionary-file": os.path.abspath(args.words),
+            "pinyin-file": pinyin_file if os.path.isabs(pinyin_file) else os.path.join(PLUGIN_DIR, pinyin_file),
+            # 回放时不再录制，也不写归档、指标文件和共享的分片数据库
+            "capture-file": "",
+            "archive": False,
+            "metrics-file": "",
+            "sharding": False,
+        })
+        if args.validation:
+            game_config["validation"] = args.validation
+        config_path = os.path.join(work_dir, "config.toml")
+        write_config(config_path, game_config)
+
+        plugin = IdiomSolitaire(config_path)
+        if not plugin.enable:
+            raise SystemExit("插件初始化失败")
+
+        # 积分只在内存中累计，不写入真实的积分数据库
+        plugin.ledger = PointsLedger(lambda wxid, points: None, flush_interval=game_config.get("points-flush-interval", 10))
+
+        accepted = 0
+        handle_success = plugin._handle_success
+
+        async def counted_handle_success(*a, **kw):
+            nonlocal accepted
+            accepted += 1
+            return await handle_success(*a, **kw)
+
+        plugin._handle_success = counted_handle_success
+
+        await plugin.async_init()
+        bot = FakeWechatAPIClient(args.send_latency)
+        message_latencies: List[float] = []  # 毫秒
+        tick_latencies: List[float] = []
+        lags: List[float] = []  # 实际投递时间晚于计划的毫秒数
+
+        async def deliver(message: dict):
+            start = time.perf_counter()
+            await plugin.handle_message(bot, message)
+            message_latencies.append((time.perf_counter() - start) * 1000)
+
+        async def tick():
+            start = time.perf_counter()
+            await plugin.check_game_sessions(bot)
+            tick_latencies.append((time.perf_counter() - start) * 1000)
+
+        # 开环投递：按录制的时间点(除以speed)投递，不等待上一条处理完
+        kinds: Counter = Counter()
+        tasks = set()
+        loop = asyncio.get_running_loop()
+        begin = loop.time()
+        for event in events:
+            kind = event.get("type")
+            if kind == "message":
+                coro = deliver({"FromWxid": event["from"], "SenderWxid": event["sender"], "Content": event["content"]})
+            elif kind == "tick":
+                coro = tick()
+            else:
+                continue
+            scheduled = begin + event["t"] / args.speed
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lags.append(max(0.0, loop.time() - scheduled) * 1000)
+            kinds[kind] += 1
+            task = loop.create_task(coro)
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+        elapsed = loop.time() - begin
+
+        await plugin.session_store.close()
+        await plugin.outbox.close()
+        await plugin.ledger.close()
+        if plugin.leaderboard is not None:
+            await plugin.leaderboard.close()
+        if plugin.archive is not None:
+            await plugin.archive.close()
+        if plugin.solver is not None:
+            plugin.solver.close()
+        if plugin.http_session is not None:
+            await plugin.http_session.close()
+
+        recorded_calls = Counter("start" if "start" in e.get("params", {}) else "guess"
+                                 for e in events if e.get("type") == "upstream")
+        return {
+            "config": {
+                "trace": os.path.abspath(args.trace),
+                "speed": args.speed,
+                "trace_seconds": events[-1]["t"] if events else 0.0,
+                "validation": plugin.validation,
+                "mode": plugin.mode,
+                "dictionary_size": len(dictionary),
+            },
+            "messages": kinds["message"],
+            "ticks": kinds["tick"],
+            "elapsed_seconds": round(elapsed, 3),
+            "handle_latency_ms": percentiles(message_latencies),
+            "check_sessions_ms": percentiles(tick_latencies),
+            "schedule_lag_ms": percentiles(lags),
+            "accepted": accepted,
+            "upstream_calls": {kind: mock.calls[kind] for kind in ("start", "guess")},
+            "recorded_upstream_calls": dict(recorded_calls),
+            "upstream_replayed": mock.calls["replayed"],
+            "upstream_synthesized": mock.calls["synthesized"],
+            "upstream_errors": mock.calls["error"],
+            "upstream_calls_per_accept": round(mock.calls["guess"] / accepted, 3) if accepted else None,
+            "stages_ms": {
+                stage: {"p50": histogram.quantile(0.5) * 1000, "p95": histogram.quantile(0.95) * 1000,
+                        "count": histogram.count}
+                for stage, histogram in plugin.metrics.stages().items()
+            },
+            "sent_messages": len(bot.sent),
+            "verdict_cache": plugin.verdict_cache.stats(),
+        }
+    finally:
+        await mock.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="成语接龙插件流量回放")
+    parser.add_argument("trace", help="capture-file 录制的轨迹文件")
+    parser.add_argument("--words", default=os.path.join(PLUGIN_DIR, "idioms.txt"), help="成语词库文件")
+    parser.add_argument("--config", default=None, help="基础配置文件，轨迹中保存的配置会覆盖其中的同名项")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，1为按录制时的节奏")
+    parser.add_argument("--validation", default=None, choices=("remote", "local", "local-first"),
+                        help="覆盖录制时的验证方式")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="模拟发送消息的耗时(秒)")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="结果JSON文件，默认输出到标准输出")
+    parser.add_argument("--baseline", default=None, help="基线结果JSON文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的变差比例")
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error("--speed 必须大于0")
+
+    result = asyncio.run(run(args))
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("性能回退:\n" + "\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
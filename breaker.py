@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API熔断器 - 滚动统计API请求的耗时和失败率，失败过多时暂停请求并定时放行探测请求
+"""
+import time
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from loguru import logger
+
+# 熔断器状态
+CLOSED = "closed"  # 正常请求
+OPEN = "open"  # 熔断中，不发请求
+HALF_OPEN = "half_open"  # 熔断时间已过，放行少量探测请求
+
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """API熔断器
+
+    记录最近window次请求的耗时和成败，耗时超过slow_call秒的请求也计为失败。
+    请求数不少于min_requests且失败比例达到error_rate时熔断；熔断open_seconds秒后进入半开状态，
+    放行probes个探测请求，探测成功则恢复，失败则重新熔断。
+    """
+
+    def __init__(self, window: int = 50, min_requests: int = 10, error_rate: float = 0.5,
+                 slow_call: float = 3.0, open_seconds: float = 30.0, probes: int = 1):
+        self.min_requests = min_requests
+        self.error_rate_threshold = error_rate
+        self.slow_call = slow_call
+        self.open_seconds = open_seconds
+        self.probes = probes
+
+        self._calls: Deque[Tuple[float, bool]] = deque(maxlen=window)  # (耗时, 是否成功)
+        self._failures = 0
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._probing = 0
+        self.trips = 0  # 累计熔断次数
+
+    @property
+    def is_open(self) -> bool:
+        """是否处于熔断中且还不能放行探测请求"""
+        return self.state == OPEN and time.monotonic() < self._opened_at + self.open_seconds
+
+    @property
+    def error_rate(self) -> float:
+        """最近请求的失败比例"""
+        return self._failures / len(self._calls) if self._calls else 0.0
+
+    def allow(self) -> bool:
+        """是否可以发出请求；返回True后必须调用record记录结果，或在请求取消时调用release"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if self.is_open:
+                return False
+            self.state = HALF_OPEN
+            self._probing = 0
+            logger.info("API熔断时间已过，放行探测请求")
+        if self._probing < self.probes:
+            self._probing += 1
+            return True
+        return False
+
+    @property
+    def probe_pending(self) -> bool:
+        """半开状态下探测请求已全部发出、结果还没有返回"""
+        return self.state == HALF_OPEN and self._probing >= self.probes
+
+    def release(self):
+        """请求被取消、没有得出结果时调用，代替record归还探测名额"""
+        if self.state == HALF_OPEN:
+            self._probing = max(0, self._probing - 1)
+
+    def record(self, latency: float, ok: bool):
+        """记录一次请求的耗时和结果"""
+        ok = ok and latency < self.slow_call
+
+        if self.state == HALF_OPEN:
+            self._probing = max(0, self._probing - 1)
+            if ok:
+                self._reset()
+                logger.success("API探测请求成功，恢复正常请求")
+            else:
+                self._trip()
+            return
+        if self.state == OPEN:
+            # 熔断前发出、熔断后才返回的请求，不再统计
+            return
+
+        if len(self._calls) == self._calls.maxlen and not self._calls[0][1]:
+            self._failures -= 1
+        self._calls.append((latency, ok))
+        if not ok:
+            self._failures += 1
+
+        if len(self._calls) >= self.min_requests and self.error_rate >= self.error_rate_threshold:
+            self._trip()
+
+    def latency_quantile(self, q: float) -> Optional[float]:
+        """最近成功请求耗时的分位数，样本不足时返回None"""
+        latencies = sorted(latency for latency, ok in self._calls if ok)
+        if len(latencies) < self.min_requests:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+    def _trip(self):
+        logger.warning(f"API请求失败过多(失败率 {self.error_rate:.0%})，熔断 {self.open_seconds} 秒")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = 0
+        self.trips += 1
+
+    def _reset(self):
+        self.state = CLOSED
+        self._calls.clear()
+        self._failures = 0
+        self._probing = 0
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+验证结果缓存 - 记住哪些输入是/不是成语，避免重复请求API
+"""
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+
+def normalize_input(content: str) -> str:
+    """统一全角半角并去掉空白，作为缓存键"""
+    return "".join(unicodedata.normalize("NFKC", content).split())
+
+
+class VerdictCache:
+    """成语验证结果的LRU缓存，"是成语"和"不是成语"分别设置过期时间"""
+
+    def __init__(self, max_size: int = 10000, positive_ttl: float = 86400, negative_ttl: float = 3600):
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()  # {输入: (是否成语, 过期时间)}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, content: str) -> Optional[bool]:
+        """查询缓存的验证结果，未命中或已过期时返回None"""
+        key = normalize_input(content)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        is_idiom, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return is_idiom
+
+    def put(self, content: str, is_idiom: bool):
+        """记录验证结果，超出容量时淘汰最久未使用的条目"""
+        if self.max_size <= 0:
+            return
+        key = normalize_input(content)
+        ttl = self.positive_ttl if is_idiom else self.negative_ttl
+        self._entries[key] = (is_idiom, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计，用于评估缓存容量"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+class CooldownStore:
+    """错误提示的冷却记录
+
+    按记录时间顺序保存 {(群聊ID, 玩家ID): 记录时间}，最早的条目冷却期一过即删除，
+    因此只保留最近cooldown秒内的记录；条目数另有上限，超出时淘汰最早的记录。
+    """
+
+    def __init__(self, cooldown: float = 5.0, max_size: int = 10000):
+        self.cooldown = cooldown
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+
+    def allow(self, chatroom_id: str, wxid: str) -> bool:
+        """冷却期已过时记录本次并返回True，否则返回False"""
+        now = time.monotonic()
+        entries = self._entries
+        while entries and next(iter(entries.values())) < now - self.cooldown:
+            entries.popitem(last=False)
+
+        key = (chatroom_id, wxid)
+        if key in entries:
+            return False
+        entries[key] = now
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
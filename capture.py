@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流量录制 - 把游戏相关的群消息、定时检查和API响应按时间顺序写入JSONL轨迹文件，供 bench/replay.py 回放
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+TRACE_VERSION = 1
+
+# 不写入轨迹的请求参数
+_SECRET_PARAMS = ("AppSecret",)
+
+
+class TrafficRecorder:
+    """流量录制器
+
+    每个事件记录相对录制开始的秒数t：
+        header    录制开始时间和回放需要的配置
+        message   需要插件处理的群消息(群聊ID、发送者、内容)，即命令和进行中游戏里的接龙
+        tick      一次定时检查
+        upstream  一次API请求的参数、结果状态、响应和耗时
+    anonymize为True时群聊ID和wxid替换为加盐哈希，同一份轨迹内保持一致，消息内容原样记录。
+    事件先放在内存中，每隔flush_interval秒在单独的工作线程中追加写出。
+    """
+
+    def __init__(self, path: str, config: Optional[Dict] = None, anonymize: bool = True,
+                 flush_interval: float = 1.0):
+        self.path = path
+        self.anonymize = anonymize
+        self.flush_interval = flush_interval
+        self._salt = os.urandom(8).hex()
+        self._aliases: Dict[str, str] = {}
+        self._started = time.monotonic()
+        self._pending: List[str] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitaireCapture")
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()  # close时唤醒定时任务
+        self._closing = False
+        self.events = 0
+        self._emit({"type": "header", "version": TRACE_VERSION, "started": time.time(), "config": config or {}})
+        logger.info(f"流量录制已开启: {path}")
+
+    def _alias(self, wxid: str) -> str:
+        """匿名化的ID，群聊保留@chatroom后缀，插件据此区分群聊和私聊"""
+        if not self.anonymize or not wxid:
+            return wxid
+        alias = self._aliases.get(wxid)
+        if alias is None:
+            digest = hashlib.sha1(f"{self._salt}{wxid}".encode("utf-8")).hexdigest()[:12]
+            alias = f"{digest}@chatroom" if wxid.endswith("@chatroom") else f"wxid_{digest}"
+            self._aliases[wxid] = alias
+        return alias
+
+    def _emit(self, event: dict):
+        event["t"] = round(time.monotonic() - self._started, 4)
+        self._pending.append(json.dumps(event, ensure_ascii=False, separators=(",", ":")))
+        self.events += 1
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # 构造时还没有事件循环，头部随第一批事件写出
+        if self._timer is None or self._timer.done():
+            self._timer = loop.create_task(self._flush_later())
+
+    def message(self, message: dict):
+        self._emit({
+            "type": "message",
+            "from": self._alias(message.get("FromWxid", "")),
+            "sender": self._alias(message.get("SenderWxid", "")),
+            "content": str(message.get("Content", "")),
+        })
+
+    def tick(self):
+        self._emit({"type": "tick"})
+
+    def upstream(self, params: dict, status: str, data: Optional[dict], latency: float):
+        self._emit({
+            "type": "upstream",
+            "params": {k: v for k, v in params.items() if k not in _SECRET_PARAMS},
+            "status": status,
+            "data": data,
+            "latency": round(latency, 4),
+        })
+
+    async def _flush_later(self):
+        """每隔flush_interval秒写出一次，直到没有待写内容；close时提前写出"""
+        while self._pending and not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"批量写入流量轨迹失败: {str(e)}")
+
+    async def flush(self):
+        """把内存中的事件追加到轨迹文件"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            if not await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch):
+                # 写入失败的事件放回队首，下一轮重试
+                self._pending[:0] = batch
+
+    def _write(self, batch: List[str]) -> bool:
+        """在工作线程中追加一批事件，返回是否成功"""
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(batch) + "\n")
+            return True
+        except Exception as e:
+            logger.error(f"写入流量轨迹失败，{len(batch)} 个事件稍后重试: {str(e)}")
+            return False
+
+    async def close(self):
+        """写出全部事件并关闭工作线程"""
+        self._closing = True
+        if self._timer is not None and not self._timer.done():
+            # 不取消定时任务，以免中途取消的那一批既没写出也没放回
+            self._wakeup.set()
+            await self._timer
+        await self.flush()
+        if self._pending:
+            logger.error(f"结束录制时仍有 {len(self._pending)} 个事件未能写入轨迹")
+        self._executor.shutdown(wait=True)
+        logger.info(f"流量录制已结束，共 {self.events} 个事件: {self.path}")
+
+
+def read_trace(path: str) -> List[dict]:
+    """读取轨迹文件，返回按时间排序的事件，第一项为头部"""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                events.append(json.loads(line))
+    header = next((e for e in events if e.get("type") == "header"), {"type": "header", "config": {}})
+    body = sorted((e for e in events if e.get("type") != "header"), key=lambda e: e["t"])
+    return [header] + body
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接龙图 - 预计算成语之间的接龙关系，为机器人挑选下一个成语
+"""
+import random
+from array import array
+from typing import Callable, Collection, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from .dictionary import IdiomDictionary
+
+# 机器人出题难度
+DIFFICULTIES = ("easy", "normal", "hard")
+
+
+class ChainGraph:
+    """成语接龙图，按尾字连接到所有可以接上的成语"""
+
+    def __init__(self, dictionary: IdiomDictionary, successor_ids: Callable[[str], Sequence[int]],
+                 degrees: Optional[Tuple[Sequence[int], Sequence[int]]] = None):
+        self.dictionary = dictionary
+        self._successor_ids = successor_ids
+
+        # 尾字相同的成语后继相同，按尾字缓存邻接表，用到时才查询；预编译词库返回的是区间，不必展开
+        self._by_last_char: Dict[str, Sequence[int]] = {}
+
+        # 每个成语的出度，以及有多少后继本身不是死路；预编译词库已算好时直接使用映射的表
+        if degrees is not None:
+            self.out_degree, self.live_degree = degrees
+            logger.info(f"接龙图使用预编译的出度表: {len(dictionary)} 个成语")
+            return
+
+        self.out_degree = array("I", (len(self.successors_of(w[-1])) for w in dictionary.words))
+        self.live_degree = array("I", (
+            sum(1 for j in self.successors_of(w[-1]) if self.out_degree[j] > 0)
+            for w in dictionary.words
+        ))
+
+        dead_ends = sum(1 for d in self.out_degree if d == 0)
+        logger.info(f"接龙图构建完成: {len(dictionary)} 个成语，其中 {dead_ends} 个无法被接上")
+
+    def successors_of(self, char: str) -> Sequence[int]:
+        """可以接在该字后面的成语编号"""
+        ids = self._by_last_char.get(char)
+        if ids is None:
+            ids = self._by_last_char[char] = self._successor_ids(char)
+        return ids
+
+    def successors(self, index: int) -> Sequence[int]:
+        """可以接在该成语后面的成语编号"""
+        return self.successors_of(self.dictionary.word_at(index)[-1])
+
+    def has_move(self, index: int, used: Collection[int], exclude: int = -1) -> bool:
+        """该成语后面是否还有未使用的成语可接，exclude为另外视为已使用的成语"""
+        if self.out_degree[index] == 0:
+            return False
+        return any(j not in used and j != exclude for j in self.successors(index))
+
+
+class MoveSelector:
+    """机器人出招策略，避免给出无人能接的成语"""
+
+    def __init__(self, graph: ChainGraph, difficulty: str = "normal"):
+        if difficulty not in DIFFICULTIES:
+            logger.warning(f"未知的机器人难度: {difficulty}，使用normal")
+            difficulty = "normal"
+        self.graph = graph
+        self.difficulty = difficulty
+        self._starts: Optional[List[int]] = None
+
+    def choose_start(self) -> Optional[str]:
+        """挑选开局成语，只从后继较多的成语中挑选"""
+        dictionary = self.graph.dictionary
+        if self._starts is None:
+            self._starts = [i for i in range(len(dictionary)) if self.graph.live_degree[i] > 0]
+        if not self._starts:
+            return None
+        return dictionary.word_at(self._rank(self._starts))
+
+    def choose_reply(self, char: str, used: Collection[int]) -> Optional[str]:
+        """挑选接在该字后面的成语，优先选择玩家还能接上的"""
+        candidates = [i for i in self.graph.successors_of(char) if i not in used]
+        if not candidates:
+            return None
+
+        # 排除死路，机器人出的成语本身也算已使用(如首尾同字、只能接自己的成语)；
+        # 全部都是死路时不回复，让玩家接自己的成语
+        alive = [i for i in candidates if self.graph.has_move(i, used, exclude=i)]
+        if not alive:
+            return None
+        return self.graph.dictionary.word_at(self._rank(alive))
+
+    def _rank(self, candidates: List[int]) -> int:
+        """按难度从候选中挑选：easy选后继最多的，hard选后继最少的，normal随机"""
+        if self.difficulty == "normal" or len(candidates) == 1:
+            return random.choice(candidates)
+
+        degree = self.graph.live_degree
+        ordered = sorted(candidates, key=lambda i: degree[i], reverse=self.difficulty == "easy")
+        # 在前几名中随机，避免每局都出同样的成语
+        return random.choice(ordered[:5])
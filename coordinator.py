@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接龙协调器 - 同一个群内并发的接龙按消息到达顺序提交
+"""
+import asyncio
+from typing import Dict, Set, Tuple
+
+
+class RoomCoordinator:
+    """单个群的接龙协调器
+
+    每条接龙到达时领取顺序号，验证可以并发进行，但提交必须等排在前面的接龙全部处理完。
+    每次接龙成功后轮次加一，领号时的轮次已过期的接龙说明它针对的是旧成语。
+    """
+
+    def __init__(self):
+        self.epoch = 0  # 当前轮次，每次接龙成功加一
+        self._issued = 0  # 下一个要发放的顺序号
+        self._head = 0  # 最小的未完成顺序号
+        self._finished: Set[int] = set()  # 已完成但前面还有未完成的顺序号
+        self._waiters: Dict[int, asyncio.Future] = {}  # 等待轮到自己提交的接龙
+
+    def ticket(self) -> Tuple[int, int]:
+        """领取顺序号，返回(顺序号, 当前轮次)"""
+        ticket = self._issued
+        self._issued += 1
+        return ticket, self.epoch
+
+    async def wait_turn(self, ticket: int):
+        """等待排在前面的接龙全部处理完"""
+        if ticket <= self._head:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[ticket] = future
+        try:
+            await future
+        finally:
+            self._waiters.pop(ticket, None)
+
+    def finish(self, ticket: int):
+        """标记接龙处理完毕，唤醒下一个等待提交的接龙"""
+        self._finished.add(ticket)
+        while self._head in self._finished:
+            self._finished.discard(self._head)
+            self._head += 1
+
+        future = self._waiters.get(self._head)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    def advance(self):
+        """接龙成功，进入下一轮"""
+        self.epoch += 1
+
+    def is_stale(self, epoch: int) -> bool:
+        """领号之后是否已有其他接龙成功"""
+        return epoch != self.epoch
+
+    @property
+    def in_flight(self) -> int:
+        """尚未处理完的接龙数"""
+        return self._issued - self._head - len(self._finished)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预编译词库 - 把成语词库编译为二进制文件，运行时通过mmap直接查询
+
+文件格式(小端序，各段按4字节对齐)：
+    头部      magic(8字节) 成语数 首字索引条数 尾字索引条数 字符串区字节数
+    偏移表    uint32[成语数+1]，第i个成语在字符串区中的起止位置
+    字符串区  按码位排序的成语UTF-8编码依次拼接
+    首字索引  (首字码位, 起始编号, 结束编号)，排序后首字相同的成语编号连续
+    尾字索引  (尾字码位, 起始位置, 结束位置)，指向尾字编号表中的一段
+    尾字编号表 uint32[成语数]，按尾字排序的成语编号
+    出度表    uint32[成语数]，相同尾字规则下可以接在该成语后面的成语数
+    活跃度表  uint32[成语数]，其中本身还能被接上的成语数
+
+出度表和活跃度表供接龙图直接使用，启动时不必遍历词库计算；旧版(IDIOMDB1)文件没有这两张表。
+
+用法: python dictfile.py idioms.txt idioms.bin
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import Iterable, Iterator, Optional, Tuple
+
+from loguru import logger
+
+try:
+    from .dictionary import read_words
+except ImportError:  # 作为脚本运行
+    from dictionary import read_words
+
+MAGIC = b"IDIOMDB2"
+_MAGIC_V1 = b"IDIOMDB1"
+_HEADER = struct.Struct("<8sIIII")
+
+
+def _pad(size: int) -> int:
+    return (4 - size % 4) % 4
+
+
+def compile_dictionary(words: Iterable[str], path: str) -> int:
+    """把成语编译为二进制词库文件，返回成语数"""
+    words = sorted({w.strip() for w in words if w and w.strip()})
+    encoded = [w.encode("utf-8") for w in words]
+
+    offsets = array("I", [0])
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    strings = b"".join(encoded)
+
+    # 已按码位排序，首字相同的成语编号连续
+    first_index = array("I")
+    for i, word in enumerate(words):
+        code = ord(word[0])
+        if first_index and first_index[-3] == code:
+            first_index[-1] = i + 1
+        else:
+            first_index.extend((code, i, i + 1))
+
+    last_ids = array("I", sorted(range(len(words)), key=lambda i: (words[i][-1], i)))
+    last_index = array("I")
+    for pos, i in enumerate(last_ids):
+        code = ord(words[i][-1])
+        if last_index and last_index[-3] == code:
+            last_index[-1] = pos + 1
+        else:
+            last_index.extend((code, pos, pos + 1))
+
+    # 相同尾字规则下的出度和活跃度只取决于尾字：出度为以该字开头的成语数，活跃度为其中出度不为0的成语数
+    starts = {}
+    for code, begin, end in zip(first_index[::3], first_index[1::3], first_index[2::3]):
+        starts[chr(code)] = (begin, end)
+    out_degree = array("I", (_span(starts.get(w[-1])) for w in words))
+    live_by_char = {char: sum(1 for i in range(begin, end) if out_degree[i] > 0)
+                    for char, (begin, end) in starts.items()}
+    live_degree = array("I", (live_by_char.get(w[-1], 0) for w in words))
+
+    if sys.byteorder != "little":
+        for table in (offsets, first_index, last_index, last_ids, out_degree, live_degree):
+            table.byteswap()
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(words), len(first_index) // 3, len(last_index) // 3, len(strings)))
+        f.write(offsets.tobytes())
+        f.write(strings + b"\0" * _pad(len(strings)))
+        f.write(first_index.tobytes())
+        f.write(last_index.tobytes())
+        f.write(last_ids.tobytes())
+        f.write(out_degree.tobytes())
+        f.write(live_degree.tobytes())
+    os.replace(tmp_path, path)
+    return len(words)
+
+
+def _span(found: Optional[Tuple[int, int]]) -> int:
+    return found[1] - found[0] if found else 0
+
+
+class _WordTable(Sequence):
+    """按编号读取映射文件中的成语"""
+
+    def __init__(self, owner: "MappedIdiomDictionary"):
+        self._owner = owner
+
+    def __len__(self) -> int:
+        return self._owner.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._owner.word_at(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self._owner.word_at(index)
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._owner.word_at(i) for i in range(len(self)))
+
+
+class MappedIdiomDictionary:
+    """通过mmap打开的预编译词库，接口与IdiomDictionary一致
+
+    所有查询直接在映射的缓冲区上进行，多个进程打开同一文件时共享页缓存。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.count, first_count, last_count, strings_size = _HEADER.unpack_from(self._mm, 0)
+        if magic not in (MAGIC, _MAGIC_V1):
+            raise ValueError(f"不是有效的预编译词库文件: {path}")
+        if sys.byteorder != "little":
+            raise ValueError("预编译词库仅支持小端序平台")
+
+        buffer = memoryview(self._mm)
+        pos = _HEADER.size
+        self._offsets = buffer[pos:pos + (self.count + 1) * 4].cast("I")
+        pos += (self.count + 1) * 4
+        self._strings_start = pos
+        pos += strings_size + _pad(strings_size)
+        self._first_index = buffer[pos:pos + first_count * 12].cast("I")
+        pos += first_count * 12
+        self._last_index = buffer[pos:pos + last_count * 12].cast("I")
+        pos += last_count * 12
+        self._last_ids = buffer[pos:pos + self.count * 4].cast("I")
+        pos += self.count * 4
+
+        # 相同尾字规则下的(出度, 活跃度)，旧版文件没有时为None
+        self.degrees: Optional[Tuple[memoryview, memoryview]] = None
+        if magic == MAGIC:
+            self.degrees = (buffer[pos:pos + self.count * 4].cast("I"),
+                            buffer[pos + self.count * 4:pos + self.count * 8].cast("I"))
+
+        self.words = _WordTable(self)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["MappedIdiomDictionary"]:
+        """打开预编译词库文件，文件不存在时返回None"""
+        if not os.path.exists(path):
+            logger.warning(f"预编译词库文件不存在: {path}")
+            return None
+        dictionary = cls(path)
+        logger.info(f"已映射预编译词库: {path}，共 {len(dictionary)} 个成语")
+        return dictionary
+
+    def _bytes_at(self, index: int) -> bytes:
+        start = self._strings_start + self._offsets[index]
+        end = self._strings_start + self._offsets[index + 1]
+        return self._mm[start:end]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, word: str) -> bool:
+        return self.index_of(word) >= 0
+
+    def index_of(self, word: str) -> int:
+        """二分查找成语编号，不存在时返回-1；UTF-8字节序与码位顺序一致"""
+        target = word.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._bytes_at(lo) == target:
+            return lo
+        return -1
+
+    def word_at(self, index: int) -> str:
+        """按编号取成语"""
+        return self._bytes_at(index).decode("utf-8")
+
+    @staticmethod
+    def _find_range(index: memoryview, char: str) -> Optional[Tuple[int, int]]:
+        """在(码位, 起, 止)三元组表中二分查找某个字"""
+        code = ord(char)
+        lo, hi = 0, len(index) // 3
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if index[mid * 3] < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(index) // 3 and index[lo * 3] == code:
+            return index[lo * 3 + 1], index[lo * 3 + 2]
+        return None
+
+    def starting_with(self, char: str) -> Sequence[int]:
+        """以指定字开头的成语编号"""
+        found = self._find_range(self._first_index, char)
+        return range(*found) if found else ()
+
+    def ending_with(self, char: str) -> Sequence[int]:
+        """以指定字结尾的成语编号"""
+        found = self._find_range(self._last_index, char)
+        return self._last_ids[found[0]:found[1]] if found else ()
+
+
+def main(argv):
+    if len(argv) != 3:
+        print(__doc__)
+        return 1
+    source, target = argv[1], argv[2]
+    count = compile_dictionary(read_words(source), target)
+    print(f"已编译 {count} 个成语: {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+成语词典 - 本地成语词库的加载与索引
+"""
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from loguru import logger
+
+
+def read_words(path: str) -> List[str]:
+    """读取词库文件，每行一个成语，#开头为注释；预编译词库也用它读取，保证两种格式的成语一致"""
+    words = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            # 兼容"成语<TAB>拼音<TAB>释义"等多列格式，只取第一列
+            words.append(line.split()[0])
+    return words
+
+
+class IdiomDictionary:
+    """本地成语词典，按首字和尾字建立索引"""
+
+    def __init__(self, words: Iterable[str]):
+        # 去重排序，保证同一份词库得到稳定的成语编号
+        self.words: List[str] = sorted({w.strip() for w in words if w and w.strip()})
+        self._ids: Dict[str, int] = {word: i for i, word in enumerate(self.words)}
+        self._by_first: Dict[str, List[int]] = {}  # 首字索引 {字: [成语编号]}
+        self._by_last: Dict[str, List[int]] = {}  # 尾字索引 {字: [成语编号]}
+
+        for i, word in enumerate(self.words):
+            self._by_first.setdefault(word[0], []).append(i)
+            self._by_last.setdefault(word[-1], []).append(i)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IdiomDictionary"]:
+        """从词库文件加载，每行一个成语，#开头为注释；文件不存在时返回None"""
+        if not os.path.exists(path):
+            logger.warning(f"成语词库文件不存在: {path}")
+            return None
+
+        dictionary = cls(read_words(path))
+        logger.info(f"已加载成语词库: {path}，共 {len(dictionary)} 个成语")
+        return dictionary
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._ids
+
+    def index_of(self, word: str) -> int:
+        """返回成语编号，不存在时返回-1"""
+        return self._ids.get(word, -1)
+
+    def word_at(self, index: int) -> str:
+        """按编号取成语"""
+        return self.words[index]
+
+    def starting_with(self, char: str) -> Sequence[int]:
+        """以指定字开头的成语编号"""
+        return self._by_first.get(char, ())
+
+    def ending_with(self, char: str) -> Sequence[int]:
+        """以指定字结尾的成语编号"""
+        return self._by_last.get(char, ())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入站限流 - 按群内的每个玩家限制命令和接龙消息的速率，刷屏的消息在执行命令、验证和请求API之前丢弃
+"""
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from .metrics import Metrics
+
+
+class FloodGuard:
+    """每个群里每个玩家一个令牌桶
+
+    桶按最近使用的顺序保存；闲置超过补满时间(burst/rate秒)的桶与新桶没有区别，
+    每次检查时从最久未用的一端删除，因此只保留最近还在发消息的玩家。桶的总数另有上限。
+    rate不大于0时不限流。
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 5, max_size: int = 10000,
+                 metrics: Optional[Metrics] = None):
+        self.rate = rate
+        self.burst = burst
+        self.max_size = max_size
+        self.metrics = metrics
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()  # {(群, 玩家): [令牌数, 更新时间]}
+        self.dropped = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def allow(self, chatroom_id: str, wxid: str) -> bool:
+        """玩家的这条消息是否可以处理；被限流时计数并返回False"""
+        if not self.enabled:
+            return True
+
+        now = time.monotonic()
+        buckets = self._buckets
+        idle = self.burst / self.rate
+        while buckets and next(iter(buckets.values()))[1] < now - idle:
+            buckets.popitem(last=False)
+
+        key = (chatroom_id, wxid)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = [float(self.burst), now]
+            while len(buckets) > self.max_size:
+                buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            buckets.move_to_end(key)
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True
+
+        self.dropped += 1
+        if self.metrics is not None:
+            self.metrics.inc("flood_dropped_total")
+        return False
+
+    def __len__(self) -> int:
+        return len(self._buckets)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+排行榜 - 每局结束时把玩家成绩累加到各群和全局的排行榜，支持按周、按月统计
+"""
+import asyncio
+import datetime
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional
+
+from loguru import logger
+
+# 全局排行榜的范围标识，群聊ID不会是这个值
+GLOBAL_SCOPE = "*"
+
+# 统计周期及其名称
+WINDOWS = {"all": "总", "week": "本周", "month": "本月"}
+
+
+class Entry(NamedTuple):
+    """排行榜中的一行"""
+    wxid: str
+    points: int  # 累计积分
+    idioms: int  # 累计成功接龙次数
+    games: int  # 参与的局数
+
+
+def period_key(window: str, timestamp: float) -> str:
+    """统计周期的键：all / w年-周(ISO周) / m年-月，同类周期的键按时间先后递增"""
+    if window == "week":
+        year, week, _ = datetime.date.fromtimestamp(timestamp).isocalendar()
+        return f"w{year:04d}-{week:02d}"
+    if window == "month":
+        return time.strftime("m%Y-%m", time.localtime(timestamp))
+    return "all"
+
+
+class Leaderboard:
+    """跨局排行榜
+
+    成绩按(周期, 范围, 玩家)存放在SQLite中，范围为群聊ID或全局；每局结束时把本局成绩累加到
+    该群和全局的总榜、本周榜、本月榜，不必重新统计历史记录。(周期, 范围, 积分)上建有索引，
+    查询前K名只需沿索引读取K行。周和月的键由时间直接算出，进入新周期时自然写入新的行，
+    上个周期的行在第一次写入新周期时按键的范围删除。所有操作在单独的工作线程中按顺序执行。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitaireRank")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._periods: Dict[str, str] = {}  # {周期类型: 最近写入的周期键}，仅在工作线程中使用
+        self._executor.submit(self._connect).result()
+
+    def _connect(self):
+        # 多个工作进程共用数据库时等待其他进程的写锁
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scores (
+                period TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                wxid TEXT NOT NULL,
+                points INTEGER NOT NULL DEFAULT 0,
+                idioms INTEGER NOT NULL DEFAULT 0,
+                games INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (period, scope, wxid)
+            );
+            CREATE INDEX IF NOT EXISTS scores_rank ON scores (period, scope, points DESC, idioms DESC);
+        """)
+        self._conn.commit()
+
+    def record_game(self, chatroom_id: str, players: Dict[str, int], idioms: Dict[str, int],
+                    ended_at: Optional[float] = None):
+        """把一局的成绩累加到排行榜，在工作线程中写入，不等待完成"""
+        if not players:
+            return
+        ended_at = time.time() if ended_at is None else ended_at
+        # 复制一份交给工作线程
+        rows = [(wxid, points, idioms.get(wxid, 0)) for wxid, points in players.items()]
+        self._executor.submit(self._merge, chatroom_id, rows, ended_at)
+
+    def _merge(self, chatroom_id: str, rows: List[tuple], ended_at: float):
+        try:
+            periods = [period_key(window, ended_at) for window in WINDOWS]
+            with self._conn:
+                self._roll_over(periods)
+                self._conn.executemany(
+                    "INSERT INTO scores VALUES (?, ?, ?, ?, ?, 1) ON CONFLICT (period, scope, wxid) DO UPDATE SET"
+                    " points = points + excluded.points, idioms = idioms + excluded.idioms, games = games + 1",
+                    [(period, scope, wxid, points, count)
+                     for period in periods
+                     for scope in (chatroom_id, GLOBAL_SCOPE)
+                     for wxid, points, count in rows],
+                )
+        except Exception as e:
+            logger.error(f"写入排行榜失败: {str(e)}")
+
+    def _roll_over(self, periods: List[str]):
+        """进入新的周或月时删除之前周期的行"""
+        for period in periods:
+            kind = period[0]
+            if kind == "a" or self._periods.get(kind) == period:
+                continue
+            # 同类周期的键以同一字母开头且按时间递增，删除比当前小的即可
+            cursor = self._conn.execute("DELETE FROM scores WHERE period >= ? AND period < ?", (kind, period))
+            if cursor.rowcount:
+                logger.info(f"排行榜进入新周期 {period}，已清理 {cursor.rowcount} 行旧记录")
+            self._periods[kind] = period
+
+    async def top(self, scope: str = GLOBAL_SCOPE, window: str = "all", k: int = 10) -> List[Entry]:
+        """按积分从高到低取前k名，scope为群聊ID或GLOBAL_SCOPE"""
+        period = period_key(window, time.time())
+        return await asyncio.wrap_future(self._executor.submit(self._top, period, scope, k))
+
+    def _top(self, period: str, scope: str, k: int) -> List[Entry]:
+        rows = self._conn.execute(
+            "SELECT wxid, points, idioms, games FROM scores WHERE period = ? AND scope = ?"
+            " ORDER BY points DESC, idioms DESC LIMIT ?",
+            (period, scope, k),
+        )
+        return [Entry(*row) for row in rows]
+
+    async def close(self):
+        """等待排队的写入完成并关闭数据库"""
+        await asyncio.wrap_future(self._executor.submit(self._close))
+        self._executor.shutdown(wait=True)
+
+    def _close(self):
+        self._conn.close()
+        self._conn = None
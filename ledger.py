@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+积分账本 - 在内存中累计积分，批量写入积分数据库
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from loguru import logger
+
+
+class PointsLedger:
+    """积分账本
+
+    接龙成功时只在内存中按玩家累加积分，定时或游戏结束时在单独的工作线程中批量写库，
+    写入失败的积分放回账本等待下次写入。
+    """
+
+    def __init__(self, add_points: Callable[[str, int], None], flush_interval: float = 10.0):
+        self._add_points = add_points
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, int] = {}  # {wxid: 待写入积分}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitairePoints")
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()  # 提前写出时唤醒定时任务
+        self._closing = False
+
+    def award(self, wxid: str, points: int):
+        """记一笔积分，稍后批量写库"""
+        self._pending[wxid] = self._pending.get(wxid, 0) + points
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    @property
+    def pending(self) -> int:
+        """待写入的玩家数"""
+        return len(self._pending)
+
+    async def _flush_later(self):
+        """每隔flush_interval秒写出一次，直到没有待写内容；flush_soon或close时提前写出"""
+        while self._pending and not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"批量写入积分失败: {str(e)}")
+
+    def flush_soon(self):
+        """让定时写出任务立即写出"""
+        if self._timer is not None and not self._timer.done():
+            self._wakeup.set()
+
+    async def flush(self):
+        """把账本中的积分写入数据库"""
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            failed = await asyncio.get_running_loop().run_in_executor(self._executor, self._write, batch)
+
+            # 写入失败的积分放回账本
+            for wxid, points in failed.items():
+                self._pending[wxid] = self._pending.get(wxid, 0) + points
+
+    def _write(self, batch: Dict[str, int]) -> Dict[str, int]:
+        """在工作线程中逐个玩家写库，返回写入失败的部分"""
+        failed = {}
+        for wxid, points in batch.items():
+            try:
+                self._add_points(wxid, points)
+            except Exception as e:
+                logger.error(f"添加积分到数据库时出错: {str(e)}")
+                failed[wxid] = points
+        logger.debug(f"已批量写入 {len(batch) - len(failed)} 名玩家的积分")
+        return failed
+
+    async def close(self):
+        """写出全部积分并关闭工作线程"""
+        self._closing = True
+        if self._timer is not None and not self._timer.done():
+            # 不取消定时任务，以免中途取消的那一批既没写出也没放回
+            self._wakeup.set()
+            await self._timer
+        await self.flush()
+        if self._pending:
+            logger.error(f"卸载时仍有 {len(self._pending)} 名玩家的积分未能写入: {self._pending}")
+        self._executor.shutdown(wait=True)
@@ -6,11 +6,13 @@
 """
 import os
 import time
-import json
+import socket
+import asyncio
+import uuid
 import aiohttp
 import tomllib
-from typing import Dict, List, Optional
-from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional, Sequence, Set, Union
+from dataclasses import dataclass, field, fields
 
 from loguru import logger
 
@@ -19,6 +21,28 @@ from utils.plugin_base import PluginBase
 from utils.decorators import *
 from WechatAPI import WechatAPIClient
 
+from .dictionary import IdiomDictionary
+from .dictfile import MappedIdiomDictionary
+from .pinyin import PinyinIndex
+from .chain import ChainGraph, MoveSelector
+from .cache import CooldownStore, VerdictCache
+from .flood import FloodGuard
+from .coordinator import RoomCoordinator
+from .persistence import SessionJournal, SqliteSessionStore
+from .scheduler import DeadlineScheduler
+from .used import UsedIdioms
+from .players import ATTEMPTS, CONSECUTIVE, IDIOMS, SCORE, PlayerColumn, PlayerStats
+from .nickname import NicknameResolver
+from .ledger import PointsLedger
+from .outbox import PRIORITY_LOW, Outbox
+from .metrics import Metrics, timed, write_textfile
+from .breaker import STATE_VALUES, CircuitBreaker
+from .sharding import ShardCoordinator
+from .solver import ChainSolver
+from .leaderboard import GLOBAL_SCOPE, WINDOWS, Leaderboard
+from .archive import GameArchive
+from .capture import TrafficRecorder
+
 # 尝试导入积分管理插件
 try:
     from plugins.AdminPoint.main import AdminPoint
@@ -34,21 +58,50 @@ except ImportError:
     NicknameDatabase = None
     logger.warning("未找到NicknameSync插件，昵称显示可能不完整")
 
-@dataclass
+@dataclass(slots=True)
 class GameSession:
-    """游戏会话数据"""
+    """游戏会话数据，使用__slots__并把玩家计数存放在一个整数数组中，大量群同时游戏时节省内存"""
     chatroom_id: str  # 群聊ID
     game_id: str  # 游戏ID
     current_idiom: str  # 当前成语
     last_player: Optional[str] = None  # 上一个接龙成功的玩家ID
     active: bool = True  # 游戏是否进行中
-    players: Dict[str, int] = field(default_factory=dict)  # 玩家得分 {wxid: score}
-    consecutive_players: Dict[str, int] = field(default_factory=dict)  # 连续接龙次数 {wxid: count}
-    total_idioms_count: Dict[str, int] = field(default_factory=dict)  # 每个玩家成功接龙的总次数 {wxid: count}
     start_time: float = field(default_factory=time.time)  # 游戏开始时间
     last_activity_time: float = field(default_factory=time.time)  # 最后活动时间
     reminder_sent: bool = False  # 是否已发送提醒
-    used_idioms: List[str] = field(default_factory=list)  # 已使用的成语列表
+    used_idioms: UsedIdioms = field(default_factory=UsedIdioms)  # 已使用的成语，按接龙顺序记录
+    stats: PlayerStats = field(default_factory=PlayerStats)  # 各玩家的得分、连续接龙、成功和尝试次数
+    
+    # 以下为玩家计数的只读字典视图 {wxid: count}，修改计数通过stats进行
+    @property
+    def players(self) -> PlayerColumn:
+        """玩家得分"""
+        return self.stats.view(SCORE)
+    
+    @property
+    def consecutive_players(self) -> PlayerColumn:
+        """连续接龙次数"""
+        return self.stats.view(CONSECUTIVE)
+    
+    @property
+    def total_idioms_count(self) -> PlayerColumn:
+        """每个玩家成功接龙的总次数"""
+        return self.stats.view(IDIOMS)
+    
+    @property
+    def attempts(self) -> PlayerColumn:
+        """每个玩家的接龙尝试次数，开启对局归档时才逐次持久化"""
+        return self.stats.view(ATTEMPTS)
+    
+    def to_dict(self) -> dict:
+        """转换为可JSON序列化的字典，字典字段复制一份，可以交给其他线程写盘"""
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.name != "stats"}
+        data["players"] = dict(self.stats.items(SCORE))
+        data["consecutive_players"] = dict(self.stats.items(CONSECUTIVE))
+        data["total_idioms_count"] = dict(self.stats.items(IDIOMS))
+        data["attempts"] = dict(self.stats.items(ATTEMPTS))
+        data["used_idioms"] = self.used_idioms.to_data()
+        return data
 
 class IdiomSolitaire(PluginBase):
     """成语接龙插件，提供群聊成语接龙游戏"""
@@ -57,12 +110,14 @@ class IdiomSolitaire(PluginBase):
     author = "wspzf"
     version = "1.0.0"
     
-    def __init__(self):
+    def __init__(self, config_path: Optional[str] = None):
         super().__init__()
         
-        # 获取配置文件路径
-        self.plugin_dir = os.path.dirname(__file__)
-        config_path = os.path.join(self.plugin_dir, "config.toml")
+        # 获取配置文件路径，默认为插件目录下的config.toml；词库、会话等文件相对配置文件所在目录
+        # 压力测试等场景可以传入单独的配置文件，使数据文件与正式环境隔离
+        if config_path is None:
+            config_path = os.path.join(os.path.dirname(__file__), "config.toml")
+        self.plugin_dir = os.path.dirname(os.path.abspath(config_path))
         
         try:
             with open(config_path, "rb") as f:
@@ -87,21 +142,180 @@ class IdiomSolitaire(PluginBase):
             self.local_check = game_config.get("local-check", True)  # 是否进行本地判断
             self.cache_used_idioms = game_config.get("cache-used-idioms", True)  # 是否缓存已使用成语
             
+            # 本地词库设置
+            self.validation = game_config.get("validation", "local-first")  # 验证方式: remote/local/local-first
+            self.dictionary_file = os.path.join(self.plugin_dir, game_config.get("dictionary-file", "idioms.txt"))
+            self.pinyin_file = os.path.join(self.plugin_dir, game_config.get("pinyin-file", "pinyin.txt"))
+            self.pinyin_tone = game_config.get("pinyin-tone", False)  # 同音模式是否要求声调相同
+            self.bot_difficulty = game_config.get("bot-difficulty", "normal")  # 本地出题难度: easy/normal/hard
+            
+            # 提示和最长接龙设置，需要本地词库
+            self.hint_commands = game_config.get("hint-commands", ["提示"])
+            self.hint_count = game_config.get("hint-count", 3)  # 每次提示几个成语
+            self.solver_commands = game_config.get("solver-commands", ["最长接龙"])
+            self.solver_time_budget = game_config.get("solver-time-budget", 2.0)  # 每次搜索最长接龙的时间(秒)
+            self.solver_max_length = game_config.get("solver-max-length", 30)  # 接龙长度达到多少时停止搜索
+            
             # API设置
             self.api_url = game_config.get("api-url", "https://api.dudunas.top/api/chengyujielong")
             self.app_secret = game_config.get("app-secret", "6213a471bd150b1626bdd6c3a416c1aa")
             
+            # HTTP连接池设置
+            self.http_pool_size = game_config.get("http-pool-size", 100)  # 连接池最大连接数
+            self.http_pool_per_host = game_config.get("http-pool-per-host", 20)  # 单个主机最大连接数
+            self.http_keepalive = game_config.get("http-keepalive", 30)  # 空闲连接保持时间(秒)
+            self.http_connect_timeout = game_config.get("http-connect-timeout", 3)  # 连接超时(秒)
+            self.http_read_timeout = game_config.get("http-read-timeout", 5)  # 读取超时(秒)
+            self.api_timeout = game_config.get("api-timeout", 8)  # 单次API请求的总超时(秒)
+            self.http_session: Optional[aiohttp.ClientSession] = None
+            
+            # API熔断和降级设置
+            self.breaker = CircuitBreaker(
+                window=game_config.get("breaker-window", 50),  # 统计最近多少次请求
+                min_requests=game_config.get("breaker-min-requests", 10),  # 至少多少次请求后才判断是否熔断
+                error_rate=game_config.get("breaker-error-rate", 0.5),  # 失败比例达到多少时熔断
+                slow_call=game_config.get("breaker-slow-call", 3),  # 耗时超过多少秒的请求计为失败
+                open_seconds=game_config.get("breaker-open-seconds", 30),  # 熔断多少秒后放行探测请求
+            )
+            self.api_hedge = game_config.get("api-hedge", False)  # 开始游戏的请求慢于近期p95耗时时是否补发一个
+            self.api_fallback = game_config.get("api-fallback", True)  # API不可用时是否由本地词库接管游戏
+            
+            # 验证结果缓存设置
+            self.verdict_cache = VerdictCache(
+                max_size=game_config.get("verdict-cache-size", 10000),  # 最多缓存的输入数
+                positive_ttl=game_config.get("verdict-cache-ttl", 86400),  # "是成语"结果的缓存时间(秒)
+                negative_ttl=game_config.get("verdict-cache-negative-ttl", 3600),  # "不是成语"结果的缓存时间(秒)
+            )
+            
             # 积分设置
             self.base_points = game_config.get("base-points", 5)  # 基础积分
             self.bonus_points = game_config.get("bonus-points", 2)  # 连续接龙奖励积分
             
+            # 积分账本，批量写入AdminPoint数据库
+            self.ledger: Optional[PointsLedger] = None
+            if HAS_ADMIN_POINT:
+                try:
+                    admin_point = AdminPoint()
+                    self.ledger = PointsLedger(
+                        admin_point.db.add_points,
+                        flush_interval=game_config.get("points-flush-interval", 10),  # 积分批量写库间隔(秒)
+                    )
+                except Exception as e:
+                    logger.error(f"初始化积分数据库失败: {str(e)}")
+            
+            # 跨局排行榜设置
+            self.leaderboard: Optional[Leaderboard] = None
+            if game_config.get("leaderboard", True):
+                self.leaderboard = Leaderboard(os.path.join(self.plugin_dir, "leaderboard.db"))
+            self.leaderboard_commands = game_config.get("leaderboard-commands", ["排行榜"])
+            self.leaderboard_size = game_config.get("leaderboard-size", 10)  # 排行榜显示前几名
+            
             # 错误处理设置
-            self.error_cooldown = game_config.get("error-cooldown", 5)  # 错误提示冷却时间(秒)
+            self.error_cooldowns = CooldownStore(
+                cooldown=game_config.get("error-cooldown", 5),  # 错误提示冷却时间(秒)
+                max_size=game_config.get("error-cooldown-size", 10000),  # 最多保留多少条冷却记录
+            )
             self.show_error_tips = game_config.get("show-error-tips", True)  # 是否显示错误提示
             
             # 持久化设置
             self.enable_persistence = game_config.get("enable-persistence", True)  # 是否启用持久化
-            self.sessions_file = os.path.join(self.plugin_dir, "sessions.json")  # 会话存储文件
+            self.persistence_backend = game_config.get("persistence-backend", "journal")  # 存储方式: journal/sqlite
+            
+            # 多进程分片设置
+            self.shards: Optional[ShardCoordinator] = None
+            if game_config.get("sharding", False):
+                worker_id = (game_config.get("worker-id", "") or os.environ.get("IDIOM_SOLITAIRE_WORKER_ID", "")
+                             or f"{socket.gethostname()}-{os.getpid()}")
+                self.shards = ShardCoordinator(
+                    os.path.join(self.plugin_dir, game_config.get("shard-db", "shards.db")),  # 共享的分片数据库
+                    worker_id,
+                    lease_seconds=game_config.get("shard-lease-seconds", 15),  # 心跳和租约的有效期(秒)
+                )
+                # 多个进程只能共用逐行更新的SQLite存储，会话才能在进程之间交接
+                if self.persistence_backend != "sqlite":
+                    logger.warning("已启用多进程分片，会话存储改为sqlite")
+                    self.persistence_backend = "sqlite"
+                logger.info(f"多进程分片已启用，本进程ID: {worker_id}")
+            self.sessions_file = os.path.join(self.plugin_dir, "sessions.json")  # 会话快照文件
+            if self.persistence_backend == "sqlite":
+                self.session_store = SqliteSessionStore(os.path.join(self.plugin_dir, "sessions.db"))
+            else:
+                self.session_store = SessionJournal(
+                    self.sessions_file,
+                    os.path.join(self.plugin_dir, "sessions.journal"),  # 会话事件日志文件
+                    flush_delay=game_config.get("persistence-flush-delay", 1.0),  # 合并写盘的延迟(秒)
+                    compact_every=game_config.get("persistence-compact-every", 500),  # 日志记录数达到多少时压缩为快照
+                )
+            self.session_store.set_snapshot_provider(self._snapshot_sessions)
+            
+            # 对局归档设置，启用分片时每个工作进程写各自的文件
+            self.archive: Optional[GameArchive] = None
+            if game_config.get("archive", False):
+                self.archive = GameArchive(
+                    os.path.join(self.plugin_dir, game_config.get("archive-dir", "archive")),  # 归档目录(相对插件目录)
+                    max_bytes=game_config.get("archive-max-mb", 64) * 1024 * 1024,  # 单个文件的大小上限
+                    flush_interval=game_config.get("archive-flush-interval", 5),  # 批量写出间隔(秒)
+                    worker_id=self.shards.worker_id if self.shards is not None else "",
+                )
+            
+            # 昵称设置
+            nickname_database = None
+            if NicknameDatabase is not None:
+                try:
+                    nickname_database = NicknameDatabase()
+                except Exception as e:
+                    logger.warning(f"初始化昵称数据库失败: {str(e)}")
+            self.nicknames = NicknameResolver(
+                nickname_database,
+                max_size=game_config.get("nickname-cache-size", 5000),  # 最多缓存的昵称数
+                ttl=game_config.get("nickname-cache-ttl", 3600),  # 昵称缓存时间(秒)
+                concurrency=game_config.get("nickname-concurrency", 5),  # 批量查询昵称的并发数
+            )
+            
+            # 运行指标设置
+            self.metrics = Metrics()
+            metrics_file = game_config.get("metrics-file", "")  # Prometheus文本文件(相对插件目录)，为空时不导出
+            self.metrics_file = os.path.join(self.plugin_dir, metrics_file) if metrics_file else ""
+            if self.metrics_file and self.shards is not None:
+                # 每个工作进程写各自的指标文件
+                root, ext = os.path.splitext(self.metrics_file)
+                self.metrics_file = f"{root}.{self.shards.worker_id}{ext}"
+            self.metrics_interval = game_config.get("metrics-interval", 15)  # 导出间隔(秒)
+            self.metrics_command = game_config.get("metrics-command", "接龙状态")  # 查询运行状态的命令，为空时关闭
+            self.admins = game_config.get("admins", [])  # 可以查询运行状态的wxid，为空时无人可以查询
+            self._metrics_written_at = 0.0
+            self._metrics_task: Optional[asyncio.Task] = None
+            
+            # 流量录制设置，轨迹文件供 bench/replay.py 回放；配置随轨迹保存，去掉密钥和管理员
+            self.recorder: Optional[TrafficRecorder] = None
+            capture_file = game_config.get("capture-file", "")  # 轨迹文件(相对插件目录)，为空时不录制
+            if capture_file:
+                capture_path = os.path.join(self.plugin_dir, capture_file)
+                if self.shards is not None:
+                    # 每个工作进程录制各自收到的流量
+                    root, ext = os.path.splitext(capture_path)
+                    capture_path = f"{root}.{self.shards.worker_id}{ext}"
+                self.recorder = TrafficRecorder(
+                    capture_path,
+                    config={k: v for k, v in game_config.items() if k not in ("app-secret", "admins")},
+                    anonymize=game_config.get("capture-anonymize", True),  # 是否把群聊ID和wxid替换为哈希
+                )
+            
+            # 入站限流设置，刷屏的消息在验证和请求API之前丢弃
+            self.flood_guard = FloodGuard(
+                rate=game_config.get("flood-rate", 1.0),  # 每个玩家每秒可以接龙的次数，0为不限流
+                burst=game_config.get("flood-burst", 5),  # 每个玩家允许连续发送的消息数
+                max_size=game_config.get("flood-max-users", 10000),  # 最多同时跟踪多少个玩家
+                metrics=self.metrics,
+            )
+            
+            # 消息发送设置
+            self.outbox = Outbox(
+                rate=game_config.get("send-rate", 1.0),  # 每个群每秒最多发送的消息数
+                burst=game_config.get("send-burst", 3),  # 每个群允许连续发送的消息数
+                coalesce_window=game_config.get("error-merge-window", 1.5),  # 错误提示合并窗口(秒)
+                metrics=self.metrics,
+            )
             
             # 调试设置
             self.debug_mode = game_config.get("debug-mode", False)
@@ -111,13 +325,62 @@ class IdiomSolitaire(PluginBase):
                 logger.level("DEBUG")
                 logger.debug("成语接龙调试模式已启用")
             
-            # 游戏会话和错误记录
+            # 加载本地成语词库
+            self.dictionary: Optional[Union[IdiomDictionary, MappedIdiomDictionary]] = None
+            # remote模式下也加载词库，供API不可用时接管游戏
+            if self.validation != "remote" or self.api_fallback:
+                # .bin为dictfile.py编译的预编译词库，通过mmap打开，多个进程共享内存
+                if self.dictionary_file.endswith(".bin"):
+                    self.dictionary = MappedIdiomDictionary.load(self.dictionary_file)
+                else:
+                    self.dictionary = IdiomDictionary.load(self.dictionary_file)
+                if self.dictionary is None and self.validation == "local":
+                    logger.warning("未加载到本地成语词库，验证方式回退为remote")
+                    self.validation = "remote"
+            
+            # 同音模式加载拼音索引，API不可用时由本地词库接管游戏也需要拼音数据判断接龙
+            self.pinyin: Optional[PinyinIndex] = None
+            if self.mode == "pinyin" and (self.local_check or self.validation != "remote" or self.api_fallback):
+                self.pinyin = PinyinIndex.load(self.pinyin_file, self.dictionary)
+            if self.mode == "pinyin" and self.pinyin is None:
+                if self.validation == "local":
+                    logger.warning("未加载到拼音数据，同音模式无法本地验证，验证方式回退为local-first")
+                    self.validation = "local-first"
+                if self.api_fallback:
+                    logger.warning("未加载到拼音数据，同音模式下API不可用时无法由本地词库接管游戏")
+            
+            # 构建接龙图，用于本地出题和避开死路
+            self.move_selector: Optional[MoveSelector] = None
+            self.solver: Optional[ChainSolver] = None
+            if self.dictionary is not None:
+                # 预编译词库带有相同尾字规则下的出度表，同音模式的接龙关系不同，需要重新计算
+                degrees = None
+                if isinstance(self.dictionary, MappedIdiomDictionary) and (self.mode != "pinyin" or self.pinyin is None):
+                    degrees = self.dictionary.degrees
+                graph = ChainGraph(self.dictionary, self._successor_ids, degrees)
+                self.move_selector = MoveSelector(graph, self.bot_difficulty)
+                self.solver = ChainSolver(graph, self.solver_time_budget, self.solver_max_length)
+            
+            # 游戏会话
             self.game_sessions: Dict[str, GameSession] = {}
-            self.error_records: Dict[str, Dict[str, float]] = {}
+            self.coordinators: Dict[str, RoomCoordinator] = {}
+            self.timers = DeadlineScheduler()  # 各群下一次提醒或超时的截止时间
             
-            # 加载持久化的会话数据
-            if self.enable_persistence:
-                self._load_sessions()
+            # 导出时读取的瞬时指标
+            self.metrics.gauge("active_rooms", lambda: len(self.game_sessions), "进行中的游戏数")
+            self.metrics.gauge("pending_sends", lambda: self.outbox.pending, "排队待发送的消息数")
+            self.metrics.gauge("pending_guesses", lambda: sum(c.in_flight for c in self.coordinators.values()),
+                               "正在验证的接龙数")
+            self.metrics.gauge("flood_tracked", lambda: len(self.flood_guard), "入站限流跟踪的玩家数")
+            self.metrics.gauge("circuit_state", lambda: STATE_VALUES[self.breaker.state],
+                               "API熔断器状态(0正常/1探测中/2熔断)")
+            
+            # 持久化的会话在异步初始化时于工作线程中建立索引，各群收到消息或到达截止时间时才恢复
+            self.saved_sessions: Dict[str, float] = {}  # {群聊ID: 最后活动时间}，尚未恢复的会话
+            self._restoring: Dict[str, asyncio.Task] = {}
+            self._index_task: Optional[asyncio.Task] = None
+            self._acquiring: Dict[str, asyncio.Task] = {}  # 正在取得租约的群
+            self._rebalance_task: Optional[asyncio.Task] = None
             
             logger.success("成语接龙插件初始化成功")
             
@@ -125,99 +388,342 @@ class IdiomSolitaire(PluginBase):
             logger.error(f"加载成语接龙插件配置文件失败: {str(e)}")
             self.enable = False
     
-    def _load_sessions(self):
-        """从文件加载游戏会话数据"""
-        if not os.path.exists(self.sessions_file):
-            if self.debug_mode:
-                logger.debug("会话存储文件不存在，将创建新文件")
+    def _start_indexing(self) -> asyncio.Task:
+        """启动后台建立会话索引的任务"""
+        if self._index_task is None:
+            self._index_task = asyncio.get_running_loop().create_task(self._index_sessions())
+        return self._index_task
+    
+    async def _index_sessions(self):
+        """在工作线程中读取会话存储，只记录哪些群有保存的会话，过期会话在后台清理"""
+        # 启用分片时先写入心跳，得到哈希环后只索引归本进程的群
+        if self.shards is not None:
+            try:
+                await self.shards.heartbeat()
+            except Exception as e:
+                logger.error(f"分片心跳失败: {str(e)}")
+        
+        if not self.enable_persistence:
             return
         
         try:
-            with open(self.sessions_file, 'r', encoding='utf-8') as f:
-                sessions_data = json.load(f)
-            
-            for chatroom_id, session_data in sessions_data.items():
-                # 检查会话是否过期
-                last_activity_time = session_data.get('last_activity_time', 0)
-                if time.time() - last_activity_time > self.round_timeout * 2:
-                    # 会话已过期，不恢复
-                    if self.debug_mode:
-                        logger.debug(f"会话已过期，不恢复: {chatroom_id}")
-                    continue
-                
-                # 创建GameSession对象
-                game_session = GameSession(
-                    chatroom_id=session_data.get('chatroom_id', ''),
-                    game_id=session_data.get('game_id', ''),
-                    current_idiom=session_data.get('current_idiom', ''),
-                    last_player=session_data.get('last_player'),
-                    active=session_data.get('active', False),
-                    start_time=session_data.get('start_time', time.time()),
-                    last_activity_time=session_data.get('last_activity_time', time.time()),
-                    reminder_sent=session_data.get('reminder_sent', False),
-                )
-                
-                # 恢复字典类型的字段
-                game_session.players = session_data.get('players', {})
-                game_session.consecutive_players = session_data.get('consecutive_players', {})
-                game_session.total_idioms_count = session_data.get('total_idioms_count', {})
-                game_session.used_idioms = session_data.get('used_idioms', [])
-                
-                # 添加到游戏会话字典
-                self.game_sessions[chatroom_id] = game_session
+            index = await self.session_store.load_index()
+        except Exception as e:
+            logger.error(f"加载游戏会话数据失败: {str(e)}")
+            return
+        
+        current_time = time.time()
+        expired = []
+        for chatroom_id, (last_activity_time, reminder_sent) in index.items():
+            if self.shards is not None and not self.shards.should_own(chatroom_id):
+                continue
+            # 会话已过期，不恢复
+            if current_time - last_activity_time > self.round_timeout * 2:
+                expired.append(chatroom_id)
+                continue
+            # 到达提醒或超时时间时由定时检查恢复
+            self.saved_sessions[chatroom_id] = last_activity_time
+            self.timers.set(chatroom_id, self._next_deadline(last_activity_time, reminder_sent))
+        
+        logger.info(f"已索引 {len(self.saved_sessions)} 个待恢复的游戏会话，{len(expired)} 个过期会话将被清理")
+        
+        # 分批清理过期会话，每批之间让出事件循环
+        for i, chatroom_id in enumerate(expired, 1):
+            if self.debug_mode:
+                logger.debug(f"会话已过期，不恢复: {chatroom_id}")
+            self._record("end", chatroom_id)
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+    
+    async def _owns(self, chatroom_id: str) -> bool:
+        """本进程是否负责该群，未启用分片时总是负责"""
+        if self.shards is None or self.shards.holds(chatroom_id):
+            return True
+        task = self._acquiring.get(chatroom_id)
+        if task is None:
+            task = self._acquiring[chatroom_id] = asyncio.get_running_loop().create_task(self._acquire_room(chatroom_id))
+            task.add_done_callback(lambda _: self._acquiring.pop(chatroom_id, None))
+        return await asyncio.shield(task)
+    
+    async def _acquire_room(self, chatroom_id: str) -> bool:
+        """取得群的租约，新取得的群丢弃内存中的旧状态，改从共享存储恢复"""
+        try:
+            if not await self.shards.acquire(chatroom_id):
+                return False
+        except Exception as e:
+            logger.error(f"取得群 {chatroom_id} 的租约失败: {str(e)}")
+            return False
+        
+        # 该群可能由其他进程处理过，内存中的会话已经过时
+        self._forget_room(chatroom_id)
+        if self.enable_persistence:
+            self.saved_sessions[chatroom_id] = 0.0
+        return True
+    
+    def _forget_room(self, chatroom_id: str):
+        """丢弃群在本进程内存中的状态，不记录结束事件"""
+        self.game_sessions.pop(chatroom_id, None)
+        self.saved_sessions.pop(chatroom_id, None)
+        self.coordinators.pop(chatroom_id, None)
+        self.timers.discard(chatroom_id)
+        self.outbox.discard(chatroom_id, PRIORITY_LOW)
+    
+    async def _rebalance(self):
+        """写入心跳，按最新的哈希环交出或接管群"""
+        try:
+            changed = await self.shards.heartbeat()
             
-            active_count = sum(1 for session in self.game_sessions.values() if session.active)
-            logger.info(f"已加载 {len(self.game_sessions)} 个游戏会话，其中 {active_count} 个活跃会话")
+            # 不再归本进程的群：等待会话写盘后交出租约，由新的负责进程从共享存储恢复
+            rooms = set(self.shards.leased) | set(self.game_sessions) | set(self.saved_sessions)
+            moved = [chatroom_id for chatroom_id in rooms if not self.shards.should_own(chatroom_id)]
+            if moved:
+                for chatroom_id in moved:
+                    self._forget_room(chatroom_id)
+                if self.enable_persistence:
+                    await self.session_store.flush()
+                await self.shards.release(moved)
+                logger.info(f"已将 {len(moved)} 个群交给其他工作进程")
             
+            # 工作进程变化后，新归本进程的群(如退出进程留下的群)到达截止时间时从共享存储恢复
+            if changed and self.enable_persistence:
+                index = await self.session_store.load_index()
+                for chatroom_id, (last_activity_time, reminder_sent) in index.items():
+                    if (self.shards.should_own(chatroom_id) and chatroom_id not in self.game_sessions
+                            and chatroom_id not in self.saved_sessions):
+                        self.saved_sessions[chatroom_id] = last_activity_time
+                        self.timers.set(chatroom_id, self._next_deadline(last_activity_time, reminder_sent))
         except Exception as e:
-            logger.error(f"加载游戏会话数据失败: {str(e)}")
+            logger.error(f"分片心跳失败: {str(e)}")
+    
+    async def _restore_session(self, chatroom_id: str) -> Optional[GameSession]:
+        """需要时恢复保存的会话，同一个群并发调用时只读取一次"""
+        task = self._restoring.get(chatroom_id)
+        if task is None:
+            if chatroom_id not in self.saved_sessions:
+                return self.game_sessions.get(chatroom_id)
+            task = self._restoring[chatroom_id] = asyncio.get_running_loop().create_task(self._load_session(chatroom_id))
+            task.add_done_callback(lambda _: self._restoring.pop(chatroom_id, None))
+        return await asyncio.shield(task)
     
-    def _save_sessions(self):
-        """将游戏会话数据保存到文件"""
+    async def _load_session(self, chatroom_id: str) -> Optional[GameSession]:
+        """从会话存储读取一个群的会话并创建GameSession"""
+        try:
+            session_data = await self.session_store.load_session(chatroom_id)
+        except Exception as e:
+            logger.error(f"恢复群 {chatroom_id} 的游戏会话失败: {str(e)}")
+            session_data = None
+        finally:
+            self.saved_sessions.pop(chatroom_id, None)
+        
+        # 读取期间该群已开始新游戏时保留新游戏
+        if session_data is None or chatroom_id in self.game_sessions:
+            return self.game_sessions.get(chatroom_id)
+        
+        # 创建GameSession对象
+        game_session = GameSession(
+            chatroom_id=session_data.get('chatroom_id', chatroom_id),
+            game_id=session_data.get('game_id', ''),
+            current_idiom=session_data.get('current_idiom', ''),
+            last_player=session_data.get('last_player'),
+            active=session_data.get('active', False),
+            start_time=session_data.get('start_time', time.time()),
+            last_activity_time=session_data.get('last_activity_time', time.time()),
+            reminder_sent=session_data.get('reminder_sent', False),
+        )
+        
+        # 恢复玩家计数和已使用的成语
+        game_session.stats = PlayerStats.from_dicts(
+            session_data.get('players'),
+            session_data.get('consecutive_players'),
+            session_data.get('total_idioms_count'),
+            session_data.get('attempts'),
+        )
+        game_session.used_idioms = UsedIdioms.from_data(
+            session_data.get('used_idioms'), self.dictionary,
+            rounds=sum(game_session.total_idioms_count.values()),  # 每轮恰有一名玩家接龙成功
+        )
+        
+        # 添加到游戏会话字典
+        self.game_sessions[chatroom_id] = game_session
+        self._schedule_session(game_session)
+        if self.debug_mode:
+            logger.debug(f"已恢复群 {chatroom_id} 的游戏会话，当前成语：{game_session.current_idiom}")
+        return game_session
+    
+    def _snapshot_sessions(self) -> Dict[str, dict]:
+        """将活跃的游戏会话转换为字典，用于写快照"""
+        sessions_data = {}
+        for chatroom_id, session in self.game_sessions.items():
+            if not session.active:
+                # 不保存非活跃会话
+                continue
+            
+            sessions_data[chatroom_id] = session.to_dict()
+        
+        if self.debug_mode:
+            logger.debug(f"生成会话快照，共 {len(sessions_data)} 个活跃游戏会话")
+        return sessions_data
+    
+    def _record(self, op: str, chatroom_id: str, **fields):
+        """记录会话事件，由后台任务写盘，不阻塞消息处理"""
         if not self.enable_persistence:
             return
         
         try:
-            # 将GameSession对象转换为字典
-            sessions_data = {}
-            for chatroom_id, session in self.game_sessions.items():
-                if not session.active:
-                    # 不保存非活跃会话
-                    continue
-                
-                # 使用dataclasses的asdict将对象转为字典
-                session_dict = asdict(session)
-                sessions_data[chatroom_id] = session_dict
-            
-            # 将字典保存为JSON文件
-            with open(self.sessions_file, 'w', encoding='utf-8') as f:
-                json.dump(sessions_data, f, ensure_ascii=False, indent=2)
-            
-            if self.debug_mode:
-                logger.debug(f"已保存 {len(sessions_data)} 个活跃游戏会话到文件")
-                
+            with self.metrics.time("persist"):
+                self.session_store.record(op, chatroom_id, **fields)
         except Exception as e:
-            logger.error(f"保存游戏会话数据失败: {str(e)}")
+            logger.error(f"记录游戏会话事件失败: {str(e)}")
     
     async def async_init(self):
         """异步初始化，注册定时任务"""
         logger.info("成语接龙插件异步初始化")
+        self._get_http_session()
+        self._start_indexing()
+    
+    def _get_http_session(self) -> aiohttp.ClientSession:
+        """获取共享的HTTP客户端，所有API请求复用同一个连接池"""
+        if self.http_session is None or self.http_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.http_pool_size,
+                limit_per_host=self.http_pool_per_host,
+                keepalive_timeout=self.http_keepalive,
+                ttl_dns_cache=300,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=self.api_timeout,
+                connect=self.http_connect_timeout,
+                sock_read=self.http_read_timeout,
+            )
+            self.http_session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self.http_session
+    
+    async def _api_get(self, params: dict, hedge: bool = False) -> Optional[dict]:
+        """请求成语接龙API，返回响应JSON，请求失败或熔断时返回None
+        
+        hedge为True且开启了api-hedge时，超过近期p95耗时仍未返回就补发一个相同请求，取先成功的结果。
+        只用于开始游戏：接龙请求会改变API端的游戏状态，不能重复发送。
+        """
+        delay = self.breaker.latency_quantile(0.95) if hedge and self.api_hedge else None
+        if delay is None:
+            return await self._api_request(params)
+        
+        first = asyncio.ensure_future(self._api_request(params))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+        
+        self.metrics.inc("upstream_hedged_total")
+        pending = {first, asyncio.ensure_future(self._api_request(params))}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    data = task.result()
+                    if data is not None:
+                        return data
+            return None
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    async def _api_request(self, params: dict) -> Optional[dict]:
+        """发出一次API请求，耗时和结果同时计入熔断器和运行指标"""
+        kind = "start" if "start" in params else "guess"
+        if not self.breaker.allow():
+            self.metrics.inc("upstream_requests_total", kind=kind, status="circuit_open")
+            return None
+        
+        if self.debug_mode:
+            logger.debug(f"发起API请求: {self.api_url}，参数: {params}")
+        
+        data = None
+        status = "error"
+        start = time.perf_counter()
+        try:
+            async with self._get_http_session().get(self.api_url, params=params) as response:
+                if response.status != 200:
+                    logger.error(f"API请求失败，状态码: {response.status}")
+                    status = f"http_{response.status}"
+                else:
+                    try:
+                        data = await response.json(content_type=None)
+                        status = "ok"
+                    except Exception as e:
+                        logger.error(f"解析API响应JSON失败: {str(e)}")
+                        status = "bad_json"
+        except asyncio.CancelledError:
+            # 请求被取消(如补发的请求已先返回)，不计入熔断统计，只归还探测名额
+            status = "cancelled"
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"API请求超时: {self.api_timeout} 秒")
+            status = "timeout"
+        except aiohttp.ClientError as e:
+            logger.error(f"API请求出错: {str(e)}")
+        finally:
+            latency = time.perf_counter() - start
+            self.metrics.observe("stage_seconds", latency, stage="upstream")
+            self.metrics.inc("upstream_requests_total", kind=kind, status=status)
+            if status != "cancelled":
+                self.breaker.record(latency, status == "ok")
+            else:
+                self.breaker.release()
+        
+        if self.recorder is not None:
+            self.recorder.upstream(params, status, data, latency)
+        if self.debug_mode and data is not None:
+            logger.debug(f"API响应: {data}")
+        return data
+    
+    async def _write_metrics(self):
+        """在工作线程中写出Prometheus文本文件"""
+        try:
+            await asyncio.to_thread(write_textfile, self.metrics_file, self.metrics.render())
+        except Exception as e:
+            logger.error(f"写入运行指标文件失败: {str(e)}")
     
     @schedule('interval', seconds=1)
     async def check_game_sessions(self, bot: WechatAPIClient):
-        """定时检查游戏会话，处理超时和提醒"""
-        if not self.enable or not self.game_sessions:
+        """定时检查游戏会话，只处理提醒或超时时间已到的群"""
+        if not self.enable:
             return
+        if self.recorder is not None:
+            self.recorder.tick()
+        
+        current_time = time.time()
+        if self.shards is not None and self.shards.heartbeat_due() and (
+                self._rebalance_task is None or self._rebalance_task.done()):
+            self._rebalance_task = asyncio.get_running_loop().create_task(self._rebalance())
         
+        # 定期导出运行指标
+        if self.metrics_file and current_time - self._metrics_written_at >= self.metrics_interval and (
+                self._metrics_task is None or self._metrics_task.done()):
+            self._metrics_written_at = current_time
+            self._metrics_task = asyncio.get_running_loop().create_task(self._write_metrics())
+        
+        # 最近的截止时间还没到时直接返回，不遍历会话
+        next_deadline = self.timers.next_deadline()
+        if next_deadline is None or next_deadline > current_time:
+            return
+        
+        due_chatrooms = self.timers.pop_due(current_time)
         if self.debug_mode:
-            logger.debug(f"定时检查游戏会话，当前活跃游戏数: {len(self.game_sessions)}")
+            logger.debug(f"定时检查游戏会话，到期群数: {len(due_chatrooms)}，当前活跃游戏数: {len(self.game_sessions)}")
         
-        current_time = time.time()
         sessions_to_end = []
-        sessions_modified = False
         
-        for chatroom_id, session in list(self.game_sessions.items()):
-            if not session.active:
+        for chatroom_id in due_chatrooms:
+            # 只处理本进程负责的群；租约暂时取不到(如原负责进程的租约未过期)时稍后重试
+            if not await self._owns(chatroom_id):
+                if self.shards.should_own(chatroom_id):
+                    self.timers.set(chatroom_id, current_time + 1)
+                continue
+            
+            session = self.game_sessions.get(chatroom_id)
+            if session is None and chatroom_id in self.saved_sessions:
+                session = await self._restore_session(chatroom_id)
+            if session is None or not session.active:
                 continue
             
             # 计算距离上次活动的时间
@@ -230,7 +736,6 @@ class IdiomSolitaire(PluginBase):
                     logger.debug(f"群 {chatroom_id} 的游戏已超时 {elapsed_time:.1f} 秒，将结束游戏")
                 
                 sessions_to_end.append(chatroom_id)
-                sessions_modified = True
                 
             # 如果接近超时且未发送提醒，发送提醒
             elif remaining_time <= self.reminder_time and not session.reminder_sent:
@@ -238,17 +743,21 @@ class IdiomSolitaire(PluginBase):
                     logger.debug(f"群 {chatroom_id} 的游戏即将超时，还剩 {int(remaining_time)} 秒，发送提醒")
                 
                 session.reminder_sent = True
-                sessions_modified = True
+                self._record("remind", chatroom_id)
+                self._schedule_session(session)
                 
-                try:
-                    await bot.send_text_message(
-                        chatroom_id,
-                        f"⏰ 成语接龙即将超时！\n当前成语：{session.current_idiom}\n还剩 {int(remaining_time)} 秒"
-                    )
-                    if self.debug_mode:
-                        logger.debug(f"已发送超时提醒: 群={chatroom_id}, 剩余时间={int(remaining_time)}秒")
-                except Exception as e:
-                    logger.error(f"发送超时提醒时出错: {str(e)}")
+                self.outbox.post(
+                    bot,
+                    chatroom_id,
+                    f"⏰ 成语接龙即将超时！\n当前成语：{session.current_idiom}\n还剩 {int(remaining_time)} 秒",
+                    PRIORITY_LOW
+                )
+                if self.debug_mode:
+                    logger.debug(f"已发送超时提醒: 群={chatroom_id}, 剩余时间={int(remaining_time)}秒")
+            
+            # 还没到时间，重新排期
+            else:
+                self._schedule_session(session)
         
         # 结束超时的游戏
         for chatroom_id in sessions_to_end:
@@ -268,12 +777,21 @@ class IdiomSolitaire(PluginBase):
                 if chatroom_id in self.game_sessions:
                     logger.warning(f"强制清理游戏会话: 群={chatroom_id}")
                     del self.game_sessions[chatroom_id]
-                if chatroom_id in self.error_records:
-                    del self.error_records[chatroom_id]
-        
-        # 如果有会话状态变更，保存会话数据
-        if sessions_modified and self.enable_persistence:
-            self._save_sessions()
+                self.coordinators.pop(chatroom_id, None)
+                self.timers.discard(chatroom_id)
+                self._record("end", chatroom_id)
+    
+    def _schedule_session(self, game_session: GameSession):
+        """根据最后活动时间设置下一次提醒或超时的截止时间"""
+        self.timers.set(game_session.chatroom_id,
+                        self._next_deadline(game_session.last_activity_time, game_session.reminder_sent))
+    
+    def _next_deadline(self, last_activity_time: float, reminder_sent: bool) -> float:
+        """下一次提醒或超时的时间"""
+        timeout_at = last_activity_time + self.round_timeout
+        if not reminder_sent and 0 < self.reminder_time < self.round_timeout:
+            return timeout_at - self.reminder_time
+        return timeout_at
     
     @on_text_message(priority=50)
     async def handle_message(self, bot: WechatAPIClient, message: dict):
@@ -286,10 +804,58 @@ class IdiomSolitaire(PluginBase):
             from_wxid = message.get("FromWxid", "")
             sender_wxid = message.get("SenderWxid", "")
             
+            # 查询运行状态，仅限管理员，群聊和私聊均可；启用分片时由负责该群的进程回复本进程的统计，
+            # 私聊不占用租约，按哈希环选出一个进程回复
+            if self.metrics_command and content == self.metrics_command:
+                if (sender_wxid or from_wxid) not in self.admins:
+                    return
+                if not self.flood_guard.allow(from_wxid, sender_wxid or from_wxid):
+                    return
+                if from_wxid.endswith("@chatroom"):
+                    responsible = await self._owns(from_wxid)
+                else:
+                    responsible = self.shards is None or self.shards.should_own(from_wxid)
+                if responsible:
+                    self.outbox.post(bot, from_wxid, self.metrics.summary())
+                return
+            
             # 判断是否是群聊
             if not from_wxid.endswith("@chatroom"):
                 return
             
+            # 等待会话索引建立完成，只处理本进程负责的群，该群有保存的会话时先恢复
+            await asyncio.shield(self._start_indexing())
+            if not await self._owns(from_wxid):
+                return
+            if from_wxid in self.saved_sessions or from_wxid in self._restoring:
+                await self._restore_session(from_wxid)
+            
+            # 其余消息只有命令和进行中游戏里的接龙需要处理，也只录制这些消息
+            if not self._is_game_message(from_wxid, content):
+                return
+            if self.recorder is not None:
+                self.recorder.message(message)
+            
+            # 刷屏的玩家超出速率的消息直接丢弃，命令和接龙共用同一个令牌桶
+            if not self.flood_guard.allow(from_wxid, sender_wxid):
+                if self.debug_mode:
+                    logger.debug(f"群 {from_wxid} 的玩家 {sender_wxid} 发送过快，丢弃消息: {content}")
+                return
+            
+            # 处理提示和最长接龙查询
+            if content in self.hint_commands:
+                await self._send_hint(bot, from_wxid)
+                return
+            for command in self.solver_commands:
+                if content.startswith(command):
+                    await self._send_longest_chain(bot, from_wxid, content[len(command):].strip())
+                    return
+            if self.leaderboard is not None:
+                for command in self.leaderboard_commands:
+                    if content.startswith(command):
+                        await self._send_leaderboard(bot, from_wxid, content[len(command):].strip())
+                        return
+            
             # 处理开始游戏命令
             if content in self.commands:
                 await self._start_game(bot, from_wxid)
@@ -306,97 +872,179 @@ class IdiomSolitaire(PluginBase):
         except Exception as e:
             logger.error(f"处理文本消息时出错: {str(e)}")
     
+    def _is_game_message(self, chatroom_id: str, content: str) -> bool:
+        """是否为插件的命令，或该群进行中游戏里的接龙"""
+        session = self.game_sessions.get(chatroom_id)
+        if session is not None and session.active:
+            return True
+        if content in self.commands or content in self.hint_commands:
+            return True
+        commands = self.solver_commands + (self.leaderboard_commands if self.leaderboard is not None else [])
+        return any(content.startswith(command) for command in commands)
+    
+    async def _send_hint(self, bot: WechatAPIClient, chatroom_id: str):
+        """提示可以接在当前成语后面的成语"""
+        game_session = self.game_sessions.get(chatroom_id)
+        if game_session is None or not game_session.active:
+            return
+        if self.solver is None:
+            self.outbox.post(bot, chatroom_id, "❌ 未加载本地词库，无法提示")
+            return
+        
+        exclude = () if self.allow_repeat else game_session.used_idioms.ids
+        hints = self.solver.hints(game_session.current_idiom, exclude, self.hint_count)
+        if hints:
+            self.outbox.post(bot, chatroom_id, f"💡 可以接：{'、'.join(hints)}")
+        else:
+            self.outbox.post(bot, chatroom_id, f"💡 词库中没有可以接在\"{game_session.current_idiom}\"后面的成语了")
+    
+    async def _send_longest_chain(self, bot: WechatAPIClient, chatroom_id: str, start_idiom: str):
+        """搜索尽量长的接龙；不指定起点时从当前游戏的成语开始，排除已使用的成语"""
+        if self.solver is None:
+            self.outbox.post(bot, chatroom_id, "❌ 未加载本地词库，无法查询")
+            return
+        
+        exclude = ()
+        if not start_idiom:
+            game_session = self.game_sessions.get(chatroom_id)
+            if game_session is None or not game_session.active:
+                command = self.solver_commands[0]
+                self.outbox.post(bot, chatroom_id, f"💡 请发送\"{command} 成语\"查询从该成语开始的最长接龙")
+                return
+            start_idiom = game_session.current_idiom
+            if not self.allow_repeat:
+                exclude = game_session.used_idioms.ids
+        
+        start = self.dictionary.index_of(start_idiom)
+        if start < 0:
+            self.outbox.post(bot, chatroom_id, f"❌ 词库中没有\"{start_idiom}\"")
+            return
+        
+        with self.metrics.time("solve"):
+            chain = await self.solver.longest_chain(start, exclude)
+        if len(chain) < 2:
+            self.outbox.post(bot, chatroom_id, f"🔗 \"{start_idiom}\"后面已经没有可以接的成语了")
+            return
+        self.outbox.post(
+            bot,
+            chatroom_id,
+            f"🔗 从\"{start_idiom}\"开始找到 {len(chain) - 1} 个成语的接龙：\n{' → '.join(chain)}"
+        )
+    
+    async def _send_leaderboard(self, bot: WechatAPIClient, chatroom_id: str, option: str):
+        """发送排行榜，选项可以包含"本周"/"本月"和"全局"，如：排行榜 本周 全局"""
+        window = "week" if "周" in option else "month" if "月" in option else "all"
+        is_global = "全局" in option or "全部群" in option
+        entries = await self.leaderboard.top(GLOBAL_SCOPE if is_global else chatroom_id, window,
+                                             self.leaderboard_size)
+        
+        title = f"🏆 {'全局' if is_global else '本群'}{WINDOWS[window]}排行榜"
+        if not entries:
+            self.outbox.post(bot, chatroom_id, f"{title}\n还没有人上榜，发送\"{self.commands[0]}\"开始游戏")
+            return
+        
+        with self.metrics.time("nickname"):
+            nicknames = await self.nicknames.get_many(bot, (entry.wxid for entry in entries))
+        lines = [f"{title}："]
+        for i, entry in enumerate(entries, 1):
+            lines.append(f"{i}. {nicknames.get(entry.wxid, entry.wxid)}: {entry.points} 积分"
+                         f"，接龙 {entry.idioms} 次，参与 {entry.games} 局")
+        self.outbox.post(bot, chatroom_id, "\n".join(lines))
+    
+    @timed("start_game")
     async def _start_game(self, bot: WechatAPIClient, chatroom_id: str):
         """开始游戏"""
-        # 如果已有游戏在进行，先结束它
+        # 如果已有游戏在进行，先按正常流程结束它，成绩照常计入排行榜、归档和积分
         if chatroom_id in self.game_sessions and self.game_sessions[chatroom_id].active:
-            await bot.send_text_message(chatroom_id, "⚠️ 已有成语接龙游戏正在进行，将重新开始游戏")
-            self.game_sessions[chatroom_id].active = False
+            self.outbox.post(bot, chatroom_id, "⚠️ 已有成语接龙游戏正在进行，将重新开始游戏")
+            await self._end_game(bot, chatroom_id)
+        
+        # 本地验证模式，或API熔断中且可以降级时，直接从词库出题
+        if self.validation == "local" or (self.breaker.is_open and self._can_fall_back()):
+            await self._begin_local_session(bot, chatroom_id)
+            return
         
         try:
-            # 调用API开始游戏
-            async with aiohttp.ClientSession() as http_session:
-                # 根据API文档，参数为start、mode和AppSecret
-                params = {
-                    "AppSecret": self.app_secret,
-                    "start": "true",
-                    "mode": self.mode
-                }
-                
-                if self.debug_mode:
-                    logger.debug(f"发起游戏开始API请求: {self.api_url}，参数: {params}")
+            # 调用API开始游戏，根据API文档，参数为start、mode和AppSecret
+            data = await self._api_get({
+                "AppSecret": self.app_secret,
+                "start": "true",
+                "mode": self.mode
+            }, hedge=True)
+            if data is None:
+                # API不可用时改由本地词库出题
+                if self._can_fall_back():
+                    logger.warning(f"API请求失败，群 {chatroom_id} 改由本地词库出题")
+                    self.metrics.inc("upstream_fallback_total", stage="start")
+                    await self._begin_local_session(bot, chatroom_id)
+                else:
+                    self.outbox.post(bot, chatroom_id, "❌ 游戏开始失败，API请求错误")
+                return
+            
+            if data.get("code") == 200 and "result" in data:
+                result = data["result"]
+                game_id = result.get("game_id", "")
+                first_idiom = result.get("first_idiom", "")
                 
-                async with http_session.get(self.api_url, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"API请求失败，状态码: {response.status}")
-                        await bot.send_text_message(chatroom_id, "❌ 游戏开始失败，API请求错误")
-                        return
-                    
-                    try:
-                        data = await response.json()
-                    except Exception as e:
-                        logger.error(f"解析API响应JSON失败: {str(e)}")
-                        await bot.send_text_message(chatroom_id, "❌ 游戏开始失败，API响应格式错误")
-                        return
-                    
-                    if self.debug_mode:
-                        logger.debug(f"API响应: {data}")
-                    
-                    if data.get("code") == 200 and "result" in data:
-                        result = data["result"]
-                        game_id = result.get("game_id", "")
-                        first_idiom = result.get("first_idiom", "")
-                        
-                        if game_id and first_idiom:
-                            # 创建新的游戏会话
-                            self.game_sessions[chatroom_id] = GameSession(
-                                chatroom_id=chatroom_id,
-                                game_id=game_id,
-                                current_idiom=first_idiom,
-                                active=True,
-                                start_time=time.time(),
-                                last_activity_time=time.time(),
-                                used_idioms=[first_idiom]  # 记录第一个成语
-                            )
-                            
-                            # 创建或清空错误记录
-                            if chatroom_id not in self.error_records:
-                                self.error_records[chatroom_id] = {}
-                            else:
-                                self.error_records[chatroom_id].clear()
-                            
-                            # 发送游戏开始消息
-                            mode_text = "相同尾字模式" if self.mode == "exact" else "同音模式"
-                            end_command = self.end_commands[0] if self.end_commands else "游戏结束"
-                            repeat_rule = "允许使用用过的成语" if self.allow_repeat else "不允许使用用过的成语"
-                            await bot.send_text_message(
-                                chatroom_id,
-                                f"🎮 成语接龙游戏开始！({mode_text})\n"
-                                f"⏱️ 每轮限时 {self.round_timeout} 秒\n"
-                                f"🎯 第一个成语：{first_idiom}\n"
-                                f"📝 发送\"{end_command}\"可以手动结束游戏\n"
-                                f"💡 游戏规则：{repeat_rule}\n"
-                                f"请接龙！"
-                            )
-                            logger.info(f"群 {chatroom_id} 开始成语接龙游戏，首个成语：{first_idiom}")
-                            
-                            # 保存会话数据
-                            if self.enable_persistence:
-                                self._save_sessions()
-                                
-                            return
-                        else:
-                            logger.error(f"API响应缺少必要字段: {result}")
-                    else:
-                        logger.error(f"API响应错误: {data}")
+                if game_id and first_idiom:
+                    await self._begin_session(bot, chatroom_id, game_id, first_idiom)
+                    return
+                else:
+                    logger.error(f"API响应缺少必要字段: {result}")
+            else:
+                logger.error(f"API响应错误: {data}")
             
             # 如果执行到这里，说明API调用失败
-            await bot.send_text_message(chatroom_id, "❌ 游戏开始失败，请稍后再试")
+            self.outbox.post(bot, chatroom_id, "❌ 游戏开始失败，请稍后再试")
             
         except Exception as e:
             logger.error(f"开始成语接龙游戏时出错: {str(e)}")
-            await bot.send_text_message(chatroom_id, "❌ 游戏开始失败，请稍后再试")
+            self.outbox.post(bot, chatroom_id, "❌ 游戏开始失败，请稍后再试")
+    
+    async def _begin_local_session(self, bot: WechatAPIClient, chatroom_id: str):
+        """从本地词库出题开始游戏"""
+        first_idiom = self._pick_local_idiom()
+        if first_idiom:
+            await self._begin_session(bot, chatroom_id, f"local-{uuid.uuid4().hex}", first_idiom)
+        else:
+            self.outbox.post(bot, chatroom_id, "❌ 游戏开始失败，本地词库为空")
     
+    async def _begin_session(self, bot: WechatAPIClient, chatroom_id: str, game_id: str, first_idiom: str):
+        """创建游戏会话并发送开始消息"""
+        # 创建新的游戏会话
+        self.game_sessions[chatroom_id] = GameSession(
+            chatroom_id=chatroom_id,
+            game_id=game_id,
+            current_idiom=first_idiom,
+            active=True,
+            start_time=time.time(),
+            last_activity_time=time.time(),
+            used_idioms=UsedIdioms([first_idiom], self.dictionary)  # 记录第一个成语
+        )
+        
+        self._schedule_session(self.game_sessions[chatroom_id])
+        
+        # 发送游戏开始消息
+        mode_text = "相同尾字模式" if self.mode == "exact" else "同音模式"
+        end_command = self.end_commands[0] if self.end_commands else "游戏结束"
+        repeat_rule = "允许使用用过的成语" if self.allow_repeat else "不允许使用用过的成语"
+        self.outbox.post(
+            bot,
+            chatroom_id,
+            f"🎮 成语接龙游戏开始！({mode_text})\n"
+            f"⏱️ 每轮限时 {self.round_timeout} 秒\n"
+            f"🎯 第一个成语：{first_idiom}\n"
+            f"📝 发送\"{end_command}\"可以手动结束游戏\n"
+            f"💡 游戏规则：{repeat_rule}\n"
+            f"请接龙！"
+        )
+        logger.info(f"群 {chatroom_id} 开始成语接龙游戏，首个成语：{first_idiom}")
+        self.metrics.inc("games_total", event="start")
+        
+        # 记录会话数据
+        self._record("start", chatroom_id, session=self.game_sessions[chatroom_id].to_dict())
+    
+    @timed("handle_idiom")
     async def _handle_idiom(self, bot: WechatAPIClient, message: dict):
         """处理玩家接龙"""
         content = str(message.get("Content", "")).strip()
@@ -419,137 +1067,307 @@ class IdiomSolitaire(PluginBase):
             )
             return
         
-        # 首字匹配检查（仅在exact模式下）
-        if self.local_check and self.mode == "exact" and game_session.current_idiom:
-            current_last_char = game_session.current_idiom[-1]
-            input_first_char = content[0]
-            
-            if current_last_char != input_first_char:
-                await self._send_error_message(
-                    bot, 
-                    from_wxid, 
-                    sender_wxid, 
-                    f"接龙错误，成语必须以\"{current_last_char}\"开头",
-                    game_session.current_idiom
-                )
+        # API熔断中不再请求API：能降级时由本地词库接管这局游戏，否则立即提示玩家
+        if not self._is_local_game(game_session) and self.breaker.is_open:
+            if not self._take_over_locally(game_session, "API熔断中"):
+                self.metrics.guess("error")
+                await self._send_error_message(bot, from_wxid, sender_wxid, "接龙服务暂时不可用，请稍后再试",
+                                               game_session.current_idiom)
                 return
         
-        # 重复成语检查
-        if not self.allow_repeat and content in game_session.used_idioms:
-            await self._send_error_message(
-                bot, 
-                from_wxid, 
-                sender_wxid, 
-                f"\"{content}\"已经被使用过了，请换一个",
-                game_session.current_idiom
-            )
+        # 熔断后的探测请求还没有返回时只是暂时不能请求API，不接管游戏，请玩家稍后再试
+        if not self._is_local_game(game_session) and self.breaker.probe_pending:
+            self.metrics.guess("error")
+            await self._send_error_message(bot, from_wxid, sender_wxid, "接龙服务正在恢复，请稍后再试",
+                                           game_session.current_idiom)
+            return
+        
+        # 本地预判断：接龙规则、重复使用、词库收录
+        with self.metrics.time("local_check"):
+            error_tip = self._check_local(game_session, content)
+        if error_tip:
+            self.metrics.guess("rejected_local")
+            self._count_attempt(from_wxid, game_session, sender_wxid)
+            await self._send_error_message(bot, from_wxid, sender_wxid, error_tip, game_session.current_idiom)
             return
         
+        # 领取顺序号：验证可以并发进行，但按消息到达顺序提交结果
+        coordinator = self._get_coordinator(from_wxid)
+        ticket, epoch = coordinator.ticket()
+        outcome = "error"  # 计入指标的接龙结果
         try:
-            # 调用API验证接龙
-            async with aiohttp.ClientSession() as http_session:
-                params = {
-                    "AppSecret": self.app_secret,
-                    "game_id": game_session.game_id,
-                    "idiom": content
-                }
+            # 本地游戏由词库给出下一个成语，无需请求API
+            if self._is_local_game(game_session):
+                with self.metrics.time("queue_wait"):
+                    await coordinator.wait_turn(ticket)
+                # 排在前面的接龙已经成功，这条接龙针对的是旧成语，直接放弃
+                if coordinator.is_stale(epoch) or not self._is_current(game_session):
+                    outcome = "stale"
+                    return
                 
-                if self.debug_mode:
-                    logger.debug(f"发起接龙验证API请求: {self.api_url}，参数: {params}")
+                outcome = "accepted"
+                await self._accept_locally(bot, coordinator, game_session, from_wxid, sender_wxid, content)
+                return
+            
+            # 调用API验证接龙，多条接龙的请求并发进行
+            data = await self._api_get({
+                "AppSecret": self.app_secret,
+                "game_id": game_session.game_id,
+                "idiom": content
+            })
+            with self.metrics.time("queue_wait"):
+                await coordinator.wait_turn(ticket)
+            if not self._is_current(game_session):
+                outcome = "stale"
+                return
+            
+            # API请求失败：能降级时这条接龙改按本地词库判定，否则提示玩家，不再让玩家空等
+            if data is None:
+                if coordinator.is_stale(epoch):
+                    outcome = "stale"
+                    return
+                if not self._take_over_locally(game_session, "API请求失败"):
+                    await self._send_error_message(bot, from_wxid, sender_wxid, "接龙服务暂时不可用，请稍后再试",
+                                                   game_session.current_idiom)
+                    return
+                error_tip = self._check_local(game_session, content)
+                if error_tip:
+                    outcome = "rejected_local"
+                    await self._send_error_message(bot, from_wxid, sender_wxid, error_tip, game_session.current_idiom)
+                    return
+                outcome = "accepted"
+                await self._accept_locally(bot, coordinator, game_session, from_wxid, sender_wxid, content)
+                return
+            
+            # 接龙成功，以API的游戏状态为准，即使排在前面的接龙已经成功也要提交
+            if data.get("code") == 200 and "result" in data:
+                result = data["result"]
+                next_idiom = result.get("next_idiom", "")
                 
-                async with http_session.get(self.api_url, params=params) as response:
-                    if response.status != 200:
-                        logger.error(f"API请求失败，状态码: {response.status}")
-                        return
+                if next_idiom:
+                    self.verdict_cache.put(content, True)
+                    self.verdict_cache.put(next_idiom, True)
                     
-                    try:
-                        data = await response.json()
-                    except Exception as e:
-                        logger.error(f"解析API响应JSON失败: {str(e)}")
-                        return
+                    # API给出的成语在本地词库中已无人能接时，改由本地词库接管这局游戏
+                    if (self.validation != "remote" and self._can_play_locally() and content in self.dictionary
+                            and self._is_dead_end(next_idiom, self._used_ids(game_session, content))):
+                        logger.info(f"群 {from_wxid} 的API成语 {next_idiom} 无法继续接龙，改由本地词库出题")
+                        game_session.game_id = f"local-{uuid.uuid4().hex}"
+                        next_idiom = self._pick_local_idiom(content[-1], self._used_ids(game_session, content))
                     
-                    if self.debug_mode:
-                        logger.debug(f"API响应: {data}")
-                    
-                    # 接龙成功
-                    if data.get("code") == 200 and "result" in data:
-                        result = data["result"]
-                        next_idiom = result.get("next_idiom", "")
-                        
-                        if next_idiom:
-                            await self._handle_success(bot, game_session, from_wxid, sender_wxid, content, next_idiom)
-                            
-                            # 保存会话数据
-                            if self.enable_persistence:
-                                self._save_sessions()
-                                
-                            return
-                    
-                    # 接龙失败
-                    error_msg = data.get("msg", "接龙失败")
-                    await self._handle_failure(bot, from_wxid, sender_wxid, content, error_msg, game_session.current_idiom)
+                    coordinator.advance()
+                    outcome = "accepted"
+                    await self._handle_success(bot, game_session, from_wxid, sender_wxid, content, next_idiom)
+                    return
             
+            # 接龙失败
+            error_msg = data.get("msg", "接龙失败")
+            if "成语不存在" in error_msg:
+                self.verdict_cache.put(content, False)
+            
+            # 排在前面的接龙已经成功时，失败原因多半是成语已更新，不再提示
+            outcome = "rejected_upstream"
+            if coordinator.is_stale(epoch):
+                if self.debug_mode:
+                    logger.debug(f"群 {from_wxid} 的接龙 {content} 已过期，不再提示")
+                return
+            await self._handle_failure(bot, from_wxid, sender_wxid, content, error_msg, game_session.current_idiom)
+        
         except Exception as e:
             logger.error(f"处理成语接龙时出错: {str(e)}")
+        finally:
+            coordinator.finish(ticket)
+            self.metrics.guess(outcome)
+            if outcome in ("accepted", "rejected_local", "rejected_upstream"):
+                self._count_attempt(from_wxid, game_session, sender_wxid)
+    
+    def _count_attempt(self, chatroom_id: str, game_session: GameSession, sender_wxid: str):
+        """记录玩家的一次接龙尝试，用于统计接龙成功率；过期和出错的接龙不计
+
+        尝试次数只有对局归档会用到，未开启归档时只保存在内存和快照中，不为每次尝试写一条记录
+        """
+        attempts = game_session.stats.add(ATTEMPTS, sender_wxid)
+        if self.archive is not None and game_session.active:
+            self._record("attempt", chatroom_id, player=sender_wxid, attempts=attempts)
+    
+    async def _accept_locally(self, bot: WechatAPIClient, coordinator: RoomCoordinator, game_session: GameSession,
+                              from_wxid: str, sender_wxid: str, content: str):
+        """接龙有效，由本地词库给出下一个成语"""
+        next_idiom = self._pick_local_idiom(content[-1], self._used_ids(game_session, content))
+        coordinator.advance()
+        await self._handle_success(bot, game_session, from_wxid, sender_wxid, content, next_idiom)
+    
+    def _can_play_locally(self) -> bool:
+        """能否完全由本地词库出题和判断接龙，同音模式还需要拼音数据"""
+        return self.move_selector is not None and (self.mode != "pinyin" or self.pinyin is not None)
+    
+    def _can_fall_back(self) -> bool:
+        """API不可用时能否由本地词库接管游戏"""
+        return self.api_fallback and self._can_play_locally()
+    
+    def _take_over_locally(self, game_session: GameSession, reason: str) -> bool:
+        """把API驱动的游戏改为本地游戏，无法降级时返回False"""
+        if not self._can_fall_back():
+            return False
+        logger.warning(f"{reason}，群 {game_session.chatroom_id} 的游戏改由本地词库出题")
+        game_session.game_id = f"local-{uuid.uuid4().hex}"
+        self.metrics.inc("upstream_fallback_total", stage="guess")
+        return True
+    
+    def _get_coordinator(self, chatroom_id: str) -> RoomCoordinator:
+        """获取群的接龙协调器"""
+        coordinator = self.coordinators.get(chatroom_id)
+        if coordinator is None:
+            coordinator = self.coordinators[chatroom_id] = RoomCoordinator()
+        return coordinator
+    
+    def _is_current(self, game_session: GameSession) -> bool:
+        """会话是否仍是该群正在进行的游戏"""
+        return game_session.active and self.game_sessions.get(game_session.chatroom_id) is game_session
+    
+    def _is_local_game(self, game_session: GameSession) -> bool:
+        """是否为本地词库驱动的游戏"""
+        return self.dictionary is not None and game_session.game_id.startswith("local-")
+    
+    def _check_local(self, game_session: GameSession, content: str) -> Optional[str]:
+        """本地判断接龙是否有效，无效时返回错误提示"""
+        local_game = self._is_local_game(game_session)
+        
+        # 首字匹配检查
+        if (self.local_check or local_game) and game_session.current_idiom:
+            current_last_char = game_session.current_idiom[-1]
+            if self.mode == "exact" and content[0] != current_last_char:
+                return f"接龙错误，成语必须以\"{current_last_char}\"开头"
+            
+            # 同音模式下两个字都有拼音数据时按读音判断；无法判断时API游戏交给API，
+            # 本地游戏没有其他判断依据，只接受相同的字
+            if self.mode == "pinyin":
+                if self.pinyin is not None and current_last_char in self.pinyin and content[0] in self.pinyin:
+                    if not self.pinyin.is_homophone(current_last_char, content[0], self.pinyin_tone):
+                        return f"接龙错误，成语首字必须与\"{current_last_char}\"同音"
+                elif local_game and content[0] != current_last_char:
+                    return f"接龙错误，成语首字必须与\"{current_last_char}\"同音"
+        
+        # 重复成语检查
+        if not self.allow_repeat and content in game_session.used_idioms:
+            return f"\"{content}\"已经被使用过了，请换一个"
+        
+        # 词库收录检查
+        if self.dictionary is not None and (local_game or self.validation == "local-first"):
+            if content not in self.dictionary:
+                return f"\"{content}\"不是成语，请重新输入"
+        
+        # API曾判定不是成语的输入直接拒绝
+        if not local_game and self.verdict_cache.get(content) is False:
+            if self.debug_mode:
+                logger.debug(f"验证缓存命中，\"{content}\"不是成语，缓存统计: {self.verdict_cache.stats()}")
+            return f"\"{content}\"不是成语，请重新输入"
+        
+        return None
+    
+    def _pick_local_idiom(self, last_char: Optional[str] = None, used_ids: Optional[Set[int]] = None) -> Optional[str]:
+        """从本地词库挑选成语，指定字时挑选能接在该字后面的成语"""
+        if self.move_selector is None:
+            return None
+        
+        if last_char is None:
+            return self.move_selector.choose_start()
+        
+        return self.move_selector.choose_reply(last_char, used_ids or set())
+    
+    def _used_ids(self, game_session: GameSession, *extra: str) -> Set[int]:
+        """已使用成语在词库中的编号，允许重复时视为没有已使用成语"""
+        if self.allow_repeat or self.dictionary is None:
+            return set()
+        if not extra:
+            return game_session.used_idioms.ids
+        return game_session.used_idioms.ids | {i for i in map(self.dictionary.index_of, extra) if i >= 0}
+    
+    def _is_dead_end(self, idiom: str, used_ids: Set[int]) -> bool:
+        """根据本地词库判断该成语是否已经无人能接，该成语本身也算已使用"""
+        if self.move_selector is None:
+            return False
+        index = self.dictionary.index_of(idiom)
+        if index < 0:
+            return False
+        return not self.move_selector.graph.has_move(index, used_ids, exclude=index)
+    
+    def _successor_ids(self, char: str) -> Sequence[int]:
+        """按当前模式返回可以接在该字后面的成语编号"""
+        if self.mode == "pinyin" and self.pinyin is not None:
+            ids = set()
+            for syllable in self.pinyin.readings(char, self.pinyin_tone):
+                ids.update(self.pinyin.starting_with(syllable))
+            return sorted(ids)
+        return self.dictionary.starting_with(char)
     
     async def _handle_success(self, bot: WechatAPIClient, game_session: GameSession, 
-                             from_wxid: str, sender_wxid: str, content: str, next_idiom: str):
+                             from_wxid: str, sender_wxid: str, content: str, next_idiom: Optional[str]):
         """处理接龙成功"""
-        # 更新游戏状态
-        game_session.current_idiom = next_idiom
+        # 更新游戏状态，机器人接不上时以玩家的成语继续接龙
+        game_session.current_idiom = next_idiom or content
         game_session.last_activity_time = time.time()
         game_session.reminder_sent = False
+        self._schedule_session(game_session)
         
         # 记录已使用的成语
-        game_session.used_idioms.append(content)
-        game_session.used_idioms.append(next_idiom)
+        game_session.used_idioms.add_round(content, next_idiom)
         
         # 计算积分
         points = self.base_points
         consecutive_bonus = 0
         
         # 检查是否是连续接龙
+        stats = game_session.stats
         if game_session.last_player == sender_wxid:
-            game_session.consecutive_players[sender_wxid] = game_session.consecutive_players.get(sender_wxid, 0) + 1
-            consecutive_bonus = game_session.consecutive_players[sender_wxid] * self.bonus_points
+            consecutive = stats.add(CONSECUTIVE, sender_wxid)
+            consecutive_bonus = consecutive * self.bonus_points
         else:
-            game_session.consecutive_players[sender_wxid] = 1
+            consecutive = 1
+            stats.set(CONSECUTIVE, sender_wxid, consecutive)
         
         # 更新总接龙次数
-        game_session.total_idioms_count[sender_wxid] = game_session.total_idioms_count.get(sender_wxid, 0) + 1
+        count = stats.add(IDIOMS, sender_wxid)
         
         # 更新玩家积分
         total_points = points + consecutive_bonus
-        game_session.players[sender_wxid] = game_session.players.get(sender_wxid, 0) + total_points
+        score = stats.add(SCORE, sender_wxid, total_points)
         game_session.last_player = sender_wxid
         
-        # 添加积分到数据库
-        if HAS_ADMIN_POINT:
-            try:
-                admin_point = AdminPoint()
-                admin_point.db.add_points(sender_wxid, total_points)
-                if self.debug_mode:
-                    logger.debug(f"已为玩家 {sender_wxid} 添加 {total_points} 积分")
-            except Exception as e:
-                logger.error(f"添加积分到数据库时出错: {str(e)}")
+        # 记录会话变化
+        self._record(
+            "success",
+            from_wxid,
+            game_id=game_session.game_id,
+            current_idiom=game_session.current_idiom,
+            player=sender_wxid,
+            time=game_session.last_activity_time,
+            used=[content, next_idiom] if next_idiom else [content],
+            score=score,
+            consecutive=consecutive,
+            count=count,
+        )
+        
+        # 记入积分账本，稍后批量写入数据库
+        if self.ledger is not None:
+            self.ledger.award(sender_wxid, total_points)
+            if self.debug_mode:
+                logger.debug(f"已为玩家 {sender_wxid} 记入 {total_points} 积分")
         
         # 获取玩家昵称
-        try:
-            nickname = await bot.get_nickname(sender_wxid)
-            if not nickname:
-                nickname = sender_wxid
-        except Exception as e:
-            logger.error(f"获取玩家昵称时出错: {str(e)}")
-            nickname = sender_wxid
+        with self.metrics.time("nickname"):
+            nickname = await self.nicknames.get(bot, sender_wxid)
         
         # 发送接龙成功消息
-        consecutive_text = f"，连续接龙 {game_session.consecutive_players[sender_wxid]} 次" if game_session.consecutive_players[sender_wxid] > 1 else ""
+        consecutive_text = f"，连续接龙 {consecutive} 次" if consecutive > 1 else ""
         bonus_text = f"，额外奖励 {consecutive_bonus} 积分" if consecutive_bonus > 0 else ""
+        chain_text = f"{content} ➡️ {next_idiom}" if next_idiom else f"{content}（机器人接不上了，请接\"{content}\"）"
         
-        await bot.send_text_message(
+        self.outbox.post(
+            bot,
             from_wxid,
             f"✅ {nickname} 接龙成功！\n"
-            f"🎯 {content} ➡️ {next_idiom}\n"
+            f"🎯 {chain_text}\n"
             f"💰 获得 {points} 积分{consecutive_text}{bonus_text}\n"
             f"请继续接龙！"
         )
@@ -576,34 +1394,26 @@ class IdiomSolitaire(PluginBase):
     async def _send_error_message(self, bot: WechatAPIClient, from_wxid: str, 
                                  sender_wxid: str, error_tip: str, current_idiom: str):
         """发送错误消息，带冷却控制"""
-        # 检查冷却时间
-        current_time = time.time()
-        last_error_time = self.error_records.get(from_wxid, {}).get(sender_wxid, 0)
-        
-        if current_time - last_error_time <= self.error_cooldown:
+        # 检查冷却时间，同时记下本次提示
+        if not self.error_cooldowns.allow(from_wxid, sender_wxid):
             return
         
         # 获取玩家昵称
-        try:
-            nickname = await bot.get_nickname(sender_wxid)
-            if not nickname:
-                nickname = sender_wxid
-        except Exception as e:
-            logger.error(f"获取玩家昵称时出错: {str(e)}")
-            nickname = sender_wxid
+        with self.metrics.time("nickname"):
+            nickname = await self.nicknames.get(bot, sender_wxid)
         
         # 发送错误提示
-        await bot.send_text_message(
+        # 错误提示低优先级发送，合并窗口内的多条错误提示合并为一条
+        self.outbox.post(
+            bot,
             from_wxid,
-            f"❌ {nickname}，{error_tip}\n"
-            f"当前成语：{current_idiom}"
+            f"❌ {nickname}，{error_tip}",
+            PRIORITY_LOW,
+            footer=f"当前成语：{current_idiom}",
+            coalesce=True
         )
-        
-        # 更新错误记录
-        if from_wxid not in self.error_records:
-            self.error_records[from_wxid] = {}
-        self.error_records[from_wxid][sender_wxid] = current_time
     
+    @timed("end_game")
     async def _end_game(self, bot: WechatAPIClient, chatroom_id: str):
         """结束游戏"""
         game_session = self.game_sessions.get(chatroom_id)
@@ -615,9 +1425,20 @@ class IdiomSolitaire(PluginBase):
             # 标记游戏为非活动状态
             game_session.active = False
             
-            # 保存会话数据（虽然游戏结束了，但保存一下可以记录最终状态）
-            if self.enable_persistence:
-                self._save_sessions()
+            # 把本局成绩累加到排行榜，完整的对局写入归档
+            if self.leaderboard is not None:
+                self.leaderboard.record_game(chatroom_id, game_session.players, game_session.total_idioms_count)
+            if self.archive is not None:
+                self.archive.append({
+                    "chatroom_id": chatroom_id,
+                    "game_id": game_session.game_id,
+                    "start_time": game_session.start_time,
+                    "end_time": time.time(),
+                    "chain": list(game_session.used_idioms),
+                    "players": dict(game_session.players),
+                    "idioms": dict(game_session.total_idioms_count),
+                    "attempts": dict(game_session.attempts),
+                })
             
             # 计算游戏时长
             duration = int(time.time() - game_session.start_time)
@@ -629,17 +1450,13 @@ class IdiomSolitaire(PluginBase):
                 sorted_players = sorted(game_session.players.items(), key=lambda x: x[1], reverse=True)
                 
                 # 生成积分排行榜文本
+                # 一次性并发获取所有玩家的昵称
+                with self.metrics.time("nickname"):
+                    nicknames = await self.nicknames.get_many(bot, game_session.players)
+                
                 points_leaderboard = "🏆 积分排行榜：\n"
                 for i, (wxid, points) in enumerate(sorted_players, 1):
-                    try:
-                        nickname = await bot.get_nickname(wxid)
-                        if not nickname:
-                            nickname = wxid
-                    except Exception as e:
-                        logger.error(f"获取玩家昵称时出错: {str(e)}")
-                        nickname = wxid
-                    
-                    points_leaderboard += f"{i}. {nickname}: {points} 积分\n"
+                    points_leaderboard += f"{i}. {nicknames.get(wxid, wxid)}: {points} 积分\n"
                 
                 # 按接龙成功次数排序
                 sorted_by_counts = sorted(game_session.total_idioms_count.items(), key=lambda x: x[1], reverse=True)
@@ -647,23 +1464,14 @@ class IdiomSolitaire(PluginBase):
                 # 生成成功次数排行榜文本
                 counts_leaderboard = "🔄 接龙次数排行榜：\n"
                 for i, (wxid, count) in enumerate(sorted_by_counts, 1):
-                    try:
-                        nickname = await bot.get_nickname(wxid)
-                        if not nickname:
-                            nickname = wxid
-                    except Exception as e:
-                        logger.error(f"获取玩家昵称时出错: {str(e)}")
-                        nickname = wxid
-                    
-                    counts_leaderboard += f"{i}. {nickname}: 成功接龙 {count} 次\n"
+                    counts_leaderboard += f"{i}. {nicknames.get(wxid, wxid)}: 成功接龙 {count} 次\n"
                 
                 # 发送游戏结束消息
-                used_idioms_count = len(game_session.used_idioms)
                 end_message = (
                     f"🎮 成语接龙游戏结束！\n"
                     f"⏱️ 游戏时长: {minutes}分{seconds}秒\n"
                     f"🔢 共有 {len(game_session.players)} 人参与\n"
-                    f"📚 共接龙 {used_idioms_count//2} 轮\n\n"
+                    f"📚 共接龙 {game_session.used_idioms.rounds} 轮\n\n"
                     f"{counts_leaderboard}\n"
                     f"{points_leaderboard}\n"
                     f"发送 \"{self.commands[0]}\" 开始新游戏"
@@ -672,7 +1480,7 @@ class IdiomSolitaire(PluginBase):
                 if self.debug_mode:
                     logger.debug(f"发送游戏结束消息: {end_message}")
                 
-                await bot.send_text_message(chatroom_id, end_message)
+                self.outbox.post(bot, chatroom_id, end_message)
             else:
                 # 如果没有人参与
                 end_message = (
@@ -680,7 +1488,7 @@ class IdiomSolitaire(PluginBase):
                     f"😢 没有人参与游戏\n"
                     f"发送 \"{self.commands[0]}\" 开始新游戏"
                 )
-                await bot.send_text_message(chatroom_id, end_message)
+                self.outbox.post(bot, chatroom_id, end_message)
             
             logger.info(f"群 {chatroom_id} 的成语接龙游戏结束，游戏时长: {minutes}分{seconds}秒")
             
@@ -693,9 +1501,17 @@ class IdiomSolitaire(PluginBase):
             
             if chatroom_id in self.game_sessions:
                 del self.game_sessions[chatroom_id]
-            # 清理错误记录
-            if chatroom_id in self.error_records:
-                del self.error_records[chatroom_id]
+            # 清理接龙协调器，仍在等待的接龙会因会话已结束而放弃
+            self.coordinators.pop(chatroom_id, None)
+            self.timers.discard(chatroom_id)
+            self._record("end", chatroom_id)
+            self.metrics.inc("games_total", event="end")
+            # 丢弃还未发出的错误提示和提醒
+            self.outbox.discard(chatroom_id, PRIORITY_LOW)
+            
+            # 游戏结束时让账本的定时任务立即写入本局积分
+            if self.ledger is not None:
+                self.ledger.flush_soon()
     
     async def unload(self):
         """插件卸载时调用，清理资源"""
@@ -717,9 +1533,48 @@ class IdiomSolitaire(PluginBase):
                         except Exception as e:
                             logger.error(f"卸载插件时结束游戏出错: {str(e)}")
             
-            # 保存会话数据
+            # 等待进行中的分片心跳和租约获取，它们还会读写会话存储和分片数据库
+            if self.shards is not None:
+                tasks = [task for task in (self._rebalance_task, *self._acquiring.values())
+                         if task is not None and not task.done()]
+                if tasks:
+                    await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # 写出最终快照，尚未恢复的会话也要保留
             if self.enable_persistence:
-                self._save_sessions()
+                if self._index_task is not None:
+                    await self._index_task
+                await self.session_store.close()
+            
+            if self.solver is not None:
+                self.solver.close()
+            
+            # 等待排行榜和归档写入完成
+            if self.leaderboard is not None:
+                await self.leaderboard.close()
+            if self.archive is not None:
+                await self.archive.close()
+            if self.recorder is not None:
+                await self.recorder.close()
+            if self._metrics_task is not None:
+                await self._metrics_task
+            
+            # 交出全部租约，其他工作进程立即可以接管
+            if self.shards is not None:
+                await self.shards.close()
+            
+            # 等待排队中的消息发出
+            await self.outbox.close()
+            
+            # 写出账本中的全部积分
+            if self.ledger is not None:
+                await self.ledger.close()
+            
+            logger.info(f"验证缓存统计: {self.verdict_cache.stats()}")
+            
+            # 关闭共享的HTTP客户端
+            if self.http_session is not None and not self.http_session.closed:
+                await self.http_session.close()
                 
             logger.success("成语接龙插件已卸载")
         except Exception as e:
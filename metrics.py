@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标 - 各处理阶段的耗时直方图和计数器，可导出为Prometheus文本格式
+"""
+import bisect
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+# 耗时直方图的桶上界(秒)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 各阶段的中文名称，用于聊天命令输出
+STAGE_NAMES = {
+    "local_check": "本地判断",
+    "queue_wait": "排队等待",
+    "upstream": "API请求",
+    "nickname": "昵称查询",
+    "persist": "会话记录",
+    "send": "消息发送",
+    "send_queue": "发送排队",
+    "handle_idiom": "接龙处理",
+    "start_game": "开始游戏",
+    "end_game": "结束游戏",
+    "solve": "最长接龙",
+}
+
+_HELP = {
+    "stage_seconds": "各处理阶段的耗时",
+    "guesses_total": "收到的接龙次数，按结果分类",
+    "games_total": "开始和结束的游戏数",
+    "upstream_requests_total": "API请求次数，按请求类型和结果分类",
+    "upstream_hedged_total": "慢请求补发次数",
+    "upstream_fallback_total": "API不可用时改由本地词库接管的次数",
+    "flood_dropped_total": "发送过快被入站限流丢弃的消息数",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """固定桶的累计直方图"""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一个桶为+Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """估算分位数：与Prometheus的histogram_quantile一样在所在的桶内线性插值，
+        第一个桶的下界为0，落在+Inf桶时返回最大的有限上界"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and cumulative + count >= target:
+                return lower + (bound - lower) * (target - cumulative) / count
+            cumulative += count
+            lower = bound
+        return self.buckets[-1]
+
+
+class RateWindow:
+    """按秒分桶的滑动窗口计数，用于计算最近一段时间的每秒速率"""
+
+    __slots__ = ("window", "_counts", "_seconds")
+
+    def __init__(self, window: int = 60):
+        self.window = window
+        self._counts = [0] * window
+        self._seconds = [0] * window  # 每个桶对应的整秒时间戳
+
+    def add(self, n: int = 1):
+        second = int(time.time())
+        slot = second % self.window
+        if self._seconds[slot] != second:
+            self._seconds[slot] = second
+            self._counts[slot] = 0
+        self._counts[slot] += n
+
+    def rate(self) -> float:
+        """最近window秒内的平均每秒次数"""
+        now = int(time.time())
+        total = sum(c for c, s in zip(self._counts, self._seconds) if now - s < self.window)
+        return total / self.window
+
+
+class Metrics:
+    """插件运行指标
+
+    stage_seconds直方图按阶段记录耗时，计数器按标签区分；活跃群数等瞬时值在导出时
+    通过注册的函数读取。所有操作都在事件循环线程中进行，不加锁。
+    """
+
+    def __init__(self, prefix: str = "idiom_solitaire", buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+                 window: int = 60):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[str, Tuple[Callable[[], float], str]] = {}
+        self.guess_rate = RateWindow(window)
+
+    @staticmethod
+    def _labels(labels: Dict[str, str]) -> Labels:
+        return tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        """计数器加一"""
+        key = (name, self._labels(labels))
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        """记录一次耗时"""
+        key = (name, self._labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram(self.buckets)
+        histogram.observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """统计代码块的耗时，计入对应阶段"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def gauge(self, name: str, read: Callable[[], float], help_text: str):
+        """注册一个导出时读取的瞬时值"""
+        self._gauges[name] = (read, help_text)
+
+    def guess(self, result: str):
+        """记录一次接龙及其结果: accepted / rejected_local / rejected_upstream / stale / error"""
+        self.inc("guesses_total", result=result)
+        self.guess_rate.add()
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        """计数器的值，不指定标签时为各标签之和"""
+        if labels:
+            return self._counters.get((name, self._labels(labels)), 0)
+        return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    @property
+    def accept_ratio(self) -> float:
+        """接龙成功次数占全部接龙次数的比例"""
+        total = self.counter_value("guesses_total")
+        return self.counter_value("guesses_total", result="accepted") / total if total else 0.0
+
+    def stages(self) -> Dict[str, Histogram]:
+        """各阶段的耗时直方图"""
+        return {dict(labels)["stage"]: histogram
+                for (name, labels), histogram in sorted(self._histograms.items()) if name == "stage_seconds"}
+
+    def render(self) -> str:
+        """导出为Prometheus文本格式"""
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {self.prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        def label_text(labels: Labels, extra: str = "") -> str:
+            parts = [f'{k}="{v}"' for k, v in labels]
+            if extra:
+                parts.append(extra)
+            return "{" + ",".join(parts) + "}" if parts else ""
+
+        for name in sorted({n for n, _ in self._counters}):
+            header(name, "counter", _HELP.get(name, name))
+            for (n, labels), value in sorted(self._counters.items()):
+                if n == name:
+                    lines.append(f"{self.prefix}_{name}{label_text(labels)} {value:g}")
+
+        for name in sorted({n for n, _ in self._histograms}):
+            header(name, "histogram", _HELP.get(name, name))
+            for (n, labels), histogram in sorted(self._histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.prefix}_{name}_bucket{label_text(labels, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.prefix}_{name}_bucket{label_text(labels, le)} {histogram.count}")
+                lines.append(f"{self.prefix}_{name}_sum{label_text(labels)} {histogram.sum:.6f}")
+                lines.append(f"{self.prefix}_{name}_count{label_text(labels)} {histogram.count}")
+
+        gauges = dict(self._gauges)
+        gauges["guesses_per_second"] = (self.guess_rate.rate, f"最近{self.guess_rate.window}秒平均每秒接龙次数")
+        gauges["accept_ratio"] = (lambda: self.accept_ratio, "接龙成功次数占全部接龙次数的比例")
+        for name, (read, help_text) in sorted(gauges.items()):
+            header(name, "gauge", help_text)
+            lines.append(f"{self.prefix}_{name} {read():g}")
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """生成聊天命令回复的文本"""
+        lines = ["📊 成语接龙运行状态"]
+        for name, (read, help_text) in sorted(self._gauges.items()):
+            lines.append(f"{help_text}: {read():g}")
+        lines.append(f"接龙速率: {self.guess_rate.rate():.2f} 次/秒")
+        lines.append(f"接龙成功率: {self.accept_ratio:.1%}")
+        dropped = self.counter_value("flood_dropped_total")
+        if dropped:
+            lines.append(f"限流丢弃: {dropped:g} 条")
+
+        stages = self.stages()
+        if stages:
+            lines.append("⏱️ 阶段耗时(p50/p95，毫秒)：")
+        for stage, histogram in stages.items():
+            lines.append(
+                f"{STAGE_NAMES.get(stage, stage)}: {histogram.quantile(0.5) * 1000:g}/"
+                f"{histogram.quantile(0.95) * 1000:g} ({histogram.count}次)"
+            )
+        return "\n".join(lines)
+
+
+def timed(stage: str):
+    """装饰插件的异步方法，把整个方法的耗时计入指定阶段，要求实例有metrics属性"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            with self.metrics.time(stage):
+                return await func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def write_textfile(path: str, text: str):
+    """原子写入Prometheus文本文件，供node_exporter的textfile收集器读取"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+昵称解析 - 带过期时间的昵称缓存，支持批量并发查询
+"""
+import asyncio
+import inspect
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+
+class NicknameResolver:
+    """玩家昵称解析
+
+    依次查询内存缓存、本地昵称库(NicknameSync插件)和 bot.get_nickname，
+    查到的昵称缓存一段时间；批量查询时限制并发数同时请求。
+    """
+
+    def __init__(self, database: Any = None, max_size: int = 5000, ttl: float = 3600, concurrency: int = 5):
+        self.database = database
+        self.max_size = max_size
+        self.ttl = ttl
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # {wxid: (昵称, 过期时间)}
+
+    def _get_cached(self, wxid: str) -> Optional[str]:
+        entry = self._cache.get(wxid)
+        if entry is None:
+            return None
+        nickname, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._cache[wxid]
+            return None
+        self._cache.move_to_end(wxid)
+        return nickname
+
+    def _put(self, wxid: str, nickname: str):
+        self._cache[wxid] = (nickname, time.monotonic() + self.ttl)
+        self._cache.move_to_end(wxid)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+
+    async def _query_database(self, wxid: str) -> Optional[str]:
+        """查询本地昵称库，兼容同步和异步接口"""
+        if self.database is None:
+            return None
+        try:
+            result = self.database.get_nickname(wxid)
+            if inspect.isawaitable(result):
+                result = await result
+            return result or None
+        except Exception as e:
+            logger.debug(f"查询本地昵称库失败: {str(e)}")
+            return None
+
+    async def _fetch(self, bot, wxid: str) -> str:
+        """缓存未命中时查询昵称，查不到时返回wxid"""
+        nickname = await self._query_database(wxid)
+        if not nickname:
+            try:
+                async with self._semaphore:
+                    nickname = await bot.get_nickname(wxid)
+            except Exception as e:
+                logger.error(f"获取玩家昵称时出错: {str(e)}")
+                # 查询失败不缓存，下次重试
+                return wxid
+
+        if not nickname:
+            nickname = wxid
+        self._put(wxid, nickname)
+        return nickname
+
+    async def get(self, bot, wxid: str) -> str:
+        """获取单个玩家的昵称"""
+        nickname = self._get_cached(wxid)
+        if nickname is not None:
+            return nickname
+        return await self._fetch(bot, wxid)
+
+    async def get_many(self, bot, wxids: Iterable[str]) -> Dict[str, str]:
+        """批量获取昵称，未缓存的并发查询"""
+        result: Dict[str, str] = {}
+        missing = []
+        for wxid in dict.fromkeys(wxids):
+            nickname = self._get_cached(wxid)
+            if nickname is None:
+                missing.append(wxid)
+            else:
+                result[wxid] = nickname
+
+        if missing:
+            fetched = await asyncio.gather(*(self._fetch(bot, wxid) for wxid in missing))
+            result.update(zip(missing, fetched))
+        return result
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+消息发送队列 - 每个群一个按优先级发送的队列，令牌桶限速，错误提示合并发送
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from .metrics import Metrics
+
+# 消息优先级，数值越小越先发送
+PRIORITY_HIGH = 0  # 开始、接龙成功、结束
+PRIORITY_LOW = 1  # 错误提示、超时提醒
+
+
+class TokenBucket:
+    """令牌桶，按固定速率补充令牌，最多积攒burst个"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """有令牌时取走一个并返回True"""
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def is_full(self) -> bool:
+        """令牌已补满，即最近一段时间没有发送；不限速时总是视为已满"""
+        self._refill()
+        return self._tokens >= self.burst or self.rate <= 0
+
+    def full_in(self) -> float:
+        """距离令牌补满还需要多少秒"""
+        if self.is_full():
+            return 0.0
+        return (self.burst - self._tokens) / self.rate
+
+    def wait_time(self) -> float:
+        """距离下一个令牌可用还需要多少秒"""
+        self._refill()
+        if self._tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+@dataclass(order=True)
+class _Message:
+    priority: int
+    seq: int
+    lines: List[str] = field(compare=False)
+    footer: str = field(default="", compare=False)
+    coalesce: bool = field(default=False, compare=False)
+    created: float = field(default_factory=time.monotonic, compare=False)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines + [self.footer] if self.footer else self.lines)
+
+
+class _RoomQueue:
+    """单个群的待发送消息"""
+
+    def __init__(self, rate: float, burst: int):
+        self.heap: List[_Message] = []
+        self.bucket = TokenBucket(rate, burst)
+        self.open_batch: Optional[_Message] = None  # 还在合并窗口内、可以继续合并的错误提示
+        self.task: Optional[asyncio.Task] = None
+        self.wakeup = asyncio.Event()  # 有新消息入队时唤醒等待中的发送任务
+
+    async def sleep(self, seconds: float):
+        """等待一段时间，有新消息入队时提前醒来"""
+        self.wakeup.clear()
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+class Outbox:
+    """按群排队发送消息
+
+    高优先级消息优先发出；可合并的低优先级消息先等待一个合并窗口，窗口内同一群的
+    其他可合并消息追加到同一条消息中，尾行(如"当前成语")只保留最新的一份。
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 3, coalesce_window: float = 1.5, max_lines: int = 10,
+                 metrics: Optional[Metrics] = None):
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.max_lines = max_lines
+        self.metrics = metrics
+        self._rooms: Dict[str, _RoomQueue] = {}
+        self._seq = itertools.count()
+        self.sent = 0
+        self.merged = 0
+        self._closing = False
+
+    def post(self, bot, chatroom_id: str, text: str, priority: int = PRIORITY_HIGH,
+             footer: str = "", coalesce: bool = False):
+        """加入发送队列，立即返回"""
+        room = self._rooms.get(chatroom_id)
+        if room is None:
+            room = self._rooms[chatroom_id] = _RoomQueue(self.rate, self.burst)
+
+        batch = room.open_batch
+        if coalesce and batch is not None and len(batch.lines) < self.max_lines:
+            # 合并到窗口内尚未发出的消息
+            if text not in batch.lines:
+                batch.lines.append(text)
+            batch.footer = footer or batch.footer
+            self.merged += 1
+        else:
+            message = _Message(priority, next(self._seq), [text], footer, coalesce)
+            heapq.heappush(room.heap, message)
+            if coalesce:
+                room.open_batch = message
+
+        room.wakeup.set()
+        if room.task is None or room.task.done():
+            room.task = asyncio.get_running_loop().create_task(self._drain(bot, chatroom_id, room))
+
+    def discard(self, chatroom_id: str, priority: int = PRIORITY_LOW):
+        """丢弃群里尚未发出的指定优先级及更低优先级的消息，如游戏结束后的错误提示"""
+        room = self._rooms.get(chatroom_id)
+        if room is None:
+            return
+        room.heap = [m for m in room.heap if m.priority < priority]
+        heapq.heapify(room.heap)
+        if room.open_batch is not None and room.open_batch.priority >= priority:
+            room.open_batch = None
+
+    async def _drain(self, bot, chatroom_id: str, room: _RoomQueue):
+        """依次发送群里排队的消息
+
+        队列空了以后等到令牌补满再释放这个群的状态，期间有新消息入队则继续发送，
+        提前释放会让限速被绕过；关闭时队列空了就退出。
+        """
+        while room.heap or not (self._closing or room.bucket.is_full()):
+            if not room.heap:
+                await room.sleep(room.bucket.full_in())
+                continue
+            message = room.heap[0]
+
+            # 可合并的消息等满合并窗口，期间到达的高优先级消息会排到前面先发
+            if message.coalesce:
+                remaining = message.created + self.coalesce_window - time.monotonic()
+                if remaining > 0:
+                    await room.sleep(remaining)
+                    continue
+
+            wait = room.bucket.wait_time()
+            if wait > 0:
+                await room.sleep(wait)
+                continue
+            room.bucket.try_acquire()
+
+            message = heapq.heappop(room.heap)
+            if room.open_batch is message:
+                room.open_batch = None
+
+            start = time.monotonic()
+            try:
+                await bot.send_text_message(chatroom_id, message.text)
+                self.sent += 1
+            except Exception as e:
+                logger.error(f"发送消息时出错: {str(e)}")
+            if self.metrics is not None:
+                self.metrics.observe("stage_seconds", start - message.created, stage="send_queue")
+                self.metrics.observe("stage_seconds", time.monotonic() - start, stage="send")
+
+        if self._rooms.get(chatroom_id) is room:
+            del self._rooms[chatroom_id]
+
+    @property
+    def pending(self) -> int:
+        """尚未发出的消息数"""
+        return sum(len(room.heap) for room in self._rooms.values())
+
+    async def close(self, timeout: float = 5.0):
+        """等待已排队的消息发送完毕"""
+        self._closing = True
+        for room in self._rooms.values():
+            room.wakeup.set()
+        tasks = [room.task for room in self._rooms.values() if room.task is not None and not room.task.done()]
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+            for task in pending:
+                task.cancel()
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会话持久化 - 追加写事件日志(后台定期压缩为快照)或SQLite逐行更新
+"""
+import asyncio
+import json
+import os
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# 快照提供函数，返回 {群聊ID: 会话字典}
+SnapshotProvider = Callable[[], Dict[str, dict]]
+
+# 会话索引，{群聊ID: (最后活动时间, 是否已发送提醒)}
+SessionIndex = Dict[str, Tuple[float, bool]]
+
+
+def apply_record(sessions: Dict[str, dict], record: dict):
+    """将一条事件记录应用到会话字典上"""
+    op = record.get("op")
+    chatroom_id = record.get("chatroom_id", "")
+
+    if op == "start":
+        sessions[chatroom_id] = record["session"]
+        return
+
+    if op == "end":
+        sessions.pop(chatroom_id, None)
+        return
+
+    session = sessions.get(chatroom_id)
+    if session is None:
+        return
+
+    if op == "success":
+        player = record["player"]
+        session["game_id"] = record.get("game_id", session.get("game_id", ""))
+        session["current_idiom"] = record["current_idiom"]
+        session["last_player"] = player
+        session["last_activity_time"] = record["time"]
+        session["reminder_sent"] = False
+        session.setdefault("used_idioms", []).extend(record["used"])
+        session.setdefault("players", {})[player] = record["score"]
+        session.setdefault("consecutive_players", {})[player] = record["consecutive"]
+        session.setdefault("total_idioms_count", {})[player] = record["count"]
+    elif op == "attempt":
+        session.setdefault("attempts", {})[record["player"]] = record["attempts"]
+    elif op == "remind":
+        session["reminder_sent"] = True
+
+
+class SessionJournal:
+    """会话事件日志
+
+    每次状态变化只追加一条很小的记录，由后台任务合并后写盘；记录数达到阈值时
+    把当前全部会话写成快照并清空日志。快照先写临时文件再原子替换。
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str,
+                 flush_delay: float = 1.0, compact_every: int = 500):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.flush_delay = flush_delay
+        self.compact_every = compact_every
+
+        self._pending: List[dict] = []  # 尚未写盘的记录
+        self._seq = 0  # 最后一条记录的序号
+        self._journal_size = 0  # 上次快照之后日志中的记录数
+        self._flush_task: Optional[asyncio.Task] = None
+        self._snapshot_provider: Optional[SnapshotProvider] = None
+        self._unclaimed: Dict[str, dict] = {}  # 已读入但尚未恢复为游戏会话的会话
+
+    def load(self) -> Dict[str, dict]:
+        """读取快照并重放日志，返回 {群聊ID: 会话字典}"""
+        sessions: Dict[str, dict] = {}
+        snapshot_seq = 0
+
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                content = f.read()
+            if content.strip():
+                data = json.loads(content)
+                if "sessions" in data and "seq" in data:
+                    sessions, snapshot_seq = data["sessions"], data["seq"]
+                else:
+                    # 旧版本的快照直接是 {群聊ID: 会话字典}
+                    sessions = data
+        self._seq = snapshot_seq
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # 进程崩溃时最后一行可能写了一半
+                        logger.warning(f"跳过损坏的会话日志记录: {line[:50]}")
+                        continue
+                    # 快照写完但日志未清空时进程退出，日志中会残留已包含在快照里的记录
+                    seq = record.get("seq", 0)
+                    if seq <= snapshot_seq:
+                        continue
+                    apply_record(sessions, record)
+                    self._seq = max(self._seq, seq)
+                    self._journal_size += 1
+
+        return sessions
+
+    async def load_index(self) -> SessionIndex:
+        """在工作线程中读取快照并重放日志，只返回各群的索引；会话内容由load_session按需取出"""
+        self._unclaimed = await asyncio.to_thread(self.load)
+        return {
+            chatroom_id: (session.get("last_activity_time", 0), session.get("reminder_sent", False))
+            for chatroom_id, session in self._unclaimed.items()
+        }
+
+    async def load_session(self, chatroom_id: str) -> Optional[dict]:
+        """取出一个群保存的会话"""
+        return self._unclaimed.pop(chatroom_id, None)
+
+    def set_snapshot_provider(self, provider: SnapshotProvider):
+        """设置压缩时获取当前全部会话的函数"""
+        self._snapshot_provider = provider
+
+    def _snapshot(self) -> Dict[str, dict]:
+        """当前全部会话，包括还没有恢复的会话"""
+        sessions = dict(self._unclaimed)
+        sessions.update(self._snapshot_provider())
+        return sessions
+
+    def record(self, op: str, chatroom_id: str, **fields: Any):
+        """追加一条事件记录，稍后由后台任务写盘"""
+        if op in ("start", "end"):
+            self._unclaimed.pop(chatroom_id, None)
+        self._seq += 1
+        self._pending.append({"seq": self._seq, "op": op, "chatroom_id": chatroom_id, **fields})
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        """等待一段时间，把期间的记录合并写盘，写盘期间产生的新记录在下一轮写出"""
+        while self._pending:
+            await asyncio.sleep(self.flush_delay)
+            try:
+                await self._flush()
+            except Exception as e:
+                logger.error(f"写入会话日志失败: {str(e)}")
+
+    async def _flush(self):
+        """写出待写记录，达到阈值时改为写快照"""
+        if not self._pending:
+            return
+
+        records, self._pending = self._pending, []
+        if self._snapshot_provider is not None and self._journal_size + len(records) >= self.compact_every:
+            # 快照与记录在同一时刻取出，快照已包含这些记录的效果
+            snapshot = self._snapshot()
+            await asyncio.to_thread(self._write_snapshot, snapshot, self._seq)
+            self._journal_size = 0
+        else:
+            await asyncio.to_thread(self._append, records)
+            self._journal_size += len(records)
+
+    def _append(self, records: List[dict]):
+        """追加记录到日志文件"""
+        lines = "".join(json.dumps(r, ensure_ascii=False, separators=(",", ":")) + "\n" for r in records)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def _write_snapshot(self, sessions: Dict[str, dict], seq: int):
+        """原子写入快照并清空日志"""
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "sessions": sessions}, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        # 快照已落盘，日志中的记录都已包含在内
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+
+    async def close(self):
+        """等待后台写盘完成，并写出最终快照"""
+        # 不能取消正在写盘的任务，否则线程中的追加可能与快照交错
+        if self._flush_task is not None and not self._flush_task.done():
+            await self._flush_task
+
+        self._pending.clear()
+        if self._snapshot_provider is not None:
+            await asyncio.to_thread(self._write_snapshot, self._snapshot(), self._seq)
+            self._journal_size = 0
+
+
+class SqliteSessionStore:
+    """基于SQLite的会话存储
+
+    会话、玩家得分和已使用成语分表存放，每个事件只更新相关的几行；
+    所有写操作在单独的工作线程中按顺序执行，不阻塞事件循环。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # 单线程执行器保证写入顺序，连接只在该线程中使用
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitaireDB")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor.submit(self._connect).result()
+
+    def _connect(self):
+        """在工作线程中打开数据库并建表"""
+        # 多个工作进程共用数据库时等待其他进程的写锁
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                chatroom_id TEXT PRIMARY KEY,
+                game_id TEXT NOT NULL,
+                current_idiom TEXT NOT NULL,
+                last_player TEXT,
+                active INTEGER NOT NULL,
+                start_time REAL NOT NULL,
+                last_activity_time REAL NOT NULL,
+                reminder_sent INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS session_players (
+                chatroom_id TEXT NOT NULL,
+                wxid TEXT NOT NULL,
+                score INTEGER NOT NULL DEFAULT 0,
+                consecutive INTEGER NOT NULL DEFAULT 0,
+                idioms INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (chatroom_id, wxid)
+            );
+            CREATE TABLE IF NOT EXISTS used_idioms (
+                chatroom_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                idiom TEXT NOT NULL,
+                PRIMARY KEY (chatroom_id, seq)
+            );
+        """)
+        # 旧版本创建的表没有尝试次数列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(session_players)")}
+        if "attempts" not in columns:
+            self._conn.execute("ALTER TABLE session_players ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._conn.commit()
+
+    def load(self) -> Dict[str, dict]:
+        """读取全部会话，返回 {群聊ID: 会话字典}"""
+        return self._executor.submit(self._load).result()
+
+    async def load_index(self) -> SessionIndex:
+        """只读取会话表中各群的最后活动时间，不读取玩家和已使用成语"""
+        return await asyncio.wrap_future(self._executor.submit(self._load_index))
+
+    def _load_index(self) -> SessionIndex:
+        return {
+            chatroom_id: (last_activity_time, bool(reminder_sent))
+            for chatroom_id, last_activity_time, reminder_sent in self._conn.execute(
+                "SELECT chatroom_id, last_activity_time, reminder_sent FROM sessions")
+        }
+
+    async def load_session(self, chatroom_id: str) -> Optional[dict]:
+        """读取一个群保存的会话"""
+        sessions = await asyncio.wrap_future(self._executor.submit(self._load, chatroom_id))
+        return sessions.get(chatroom_id)
+
+    def _load(self, chatroom_id: Optional[str] = None) -> Dict[str, dict]:
+        """读取会话，指定群时只读取该群"""
+        where, args = (" WHERE chatroom_id = ?", (chatroom_id,)) if chatroom_id is not None else ("", ())
+        sessions: Dict[str, dict] = {}
+        for row in self._conn.execute(
+                "SELECT chatroom_id, game_id, current_idiom, last_player, active, start_time,"
+                " last_activity_time, reminder_sent FROM sessions" + where, args):
+            sessions[row[0]] = {
+                "chatroom_id": row[0],
+                "game_id": row[1],
+                "current_idiom": row[2],
+                "last_player": row[3],
+                "active": bool(row[4]),
+                "start_time": row[5],
+                "last_activity_time": row[6],
+                "reminder_sent": bool(row[7]),
+                "players": {},
+                "consecutive_players": {},
+                "total_idioms_count": {},
+                "attempts": {},
+                "used_idioms": [],
+            }
+
+        for room_id, wxid, score, consecutive, idioms, attempts in self._conn.execute(
+                "SELECT chatroom_id, wxid, score, consecutive, idioms, attempts FROM session_players" + where, args):
+            session = sessions.get(room_id)
+            if session is not None:
+                # 只尝试过、还没有接龙成功的玩家只有尝试次数
+                if score or idioms:
+                    session["players"][wxid] = score
+                    session["consecutive_players"][wxid] = consecutive
+                    session["total_idioms_count"][wxid] = idioms
+                if attempts:
+                    session["attempts"][wxid] = attempts
+
+        for room_id, idiom in self._conn.execute(
+                "SELECT chatroom_id, idiom FROM used_idioms" + where + " ORDER BY chatroom_id, seq", args):
+            session = sessions.get(room_id)
+            if session is not None:
+                session["used_idioms"].append(idiom)
+
+        return sessions
+
+    def set_snapshot_provider(self, provider: SnapshotProvider):
+        """逐行更新，无需快照"""
+
+    def record(self, op: str, chatroom_id: str, **fields: Any):
+        """提交一个事件，在工作线程中以一个小事务写入"""
+        future = self._executor.submit(self._apply, op, chatroom_id, fields)
+        future.add_done_callback(self._log_error)
+
+    @staticmethod
+    def _log_error(future: Future):
+        if future.exception() is not None:
+            logger.error(f"写入会话数据库失败: {str(future.exception())}")
+
+    def _apply(self, op: str, chatroom_id: str, fields: dict):
+        with self._conn:
+            if op in ("start", "end"):
+                self._conn.execute("DELETE FROM sessions WHERE chatroom_id = ?", (chatroom_id,))
+                self._conn.execute("DELETE FROM session_players WHERE chatroom_id = ?", (chatroom_id,))
+                self._conn.execute("DELETE FROM used_idioms WHERE chatroom_id = ?", (chatroom_id,))
+
+            if op == "start":
+                session = fields["session"]
+                self._conn.execute(
+                    "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (chatroom_id, session["game_id"], session["current_idiom"], session.get("last_player"),
+                     int(session.get("active", True)), session["start_time"], session["last_activity_time"],
+                     int(session.get("reminder_sent", False))),
+                )
+                self._conn.executemany(
+                    "INSERT INTO used_idioms VALUES (?, ?, ?)",
+                    [(chatroom_id, i, idiom) for i, idiom in enumerate(session.get("used_idioms", []))],
+                )
+                players, attempts = session.get("players", {}), session.get("attempts", {})
+                self._conn.executemany(
+                    "INSERT INTO session_players (chatroom_id, wxid, score, consecutive, idioms, attempts)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    [(chatroom_id, wxid, players.get(wxid, 0),
+                      session.get("consecutive_players", {}).get(wxid, 0),
+                      session.get("total_idioms_count", {}).get(wxid, 0),
+                      attempts.get(wxid, 0))
+                     for wxid in {**players, **attempts}],
+                )
+
+            elif op == "success":
+                self._conn.execute(
+                    "UPDATE sessions SET game_id = ?, current_idiom = ?, last_player = ?,"
+                    " last_activity_time = ?, reminder_sent = 0 WHERE chatroom_id = ?",
+                    (fields["game_id"], fields["current_idiom"], fields["player"], fields["time"], chatroom_id),
+                )
+                self._conn.execute(
+                    "INSERT INTO session_players (chatroom_id, wxid, score, consecutive, idioms) VALUES (?, ?, ?, ?, ?)"
+                    " ON CONFLICT (chatroom_id, wxid) DO UPDATE SET"
+                    " score = excluded.score, consecutive = excluded.consecutive, idioms = excluded.idioms",
+                    (chatroom_id, fields["player"], fields["score"], fields["consecutive"], fields["count"]),
+                )
+                (next_seq,) = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq), -1) + 1 FROM used_idioms WHERE chatroom_id = ?", (chatroom_id,)
+                ).fetchone()
+                self._conn.executemany(
+                    "INSERT INTO used_idioms VALUES (?, ?, ?)",
+                    [(chatroom_id, next_seq + i, idiom) for i, idiom in enumerate(fields["used"])],
+                )
+
+            elif op == "attempt":
+                self._conn.execute(
+                    "INSERT INTO session_players (chatroom_id, wxid, attempts) VALUES (?, ?, ?)"
+                    " ON CONFLICT (chatroom_id, wxid) DO UPDATE SET attempts = excluded.attempts",
+                    (chatroom_id, fields["player"], fields["attempts"]),
+                )
+
+            elif op == "remind":
+                self._conn.execute("UPDATE sessions SET reminder_sent = 1 WHERE chatroom_id = ?", (chatroom_id,))
+
+    async def flush(self):
+        """等待已提交的写入完成"""
+        await asyncio.wrap_future(self._executor.submit(lambda: None))
+
+    async def close(self):
+        """等待已提交的写入完成并关闭数据库"""
+        await asyncio.to_thread(self._executor.submit(self._close).result)
+        self._executor.shutdown(wait=True)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
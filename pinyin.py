@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+拼音索引 - 汉字到拼音的预计算表及同音接龙的本地判断
+"""
+import os
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+from loguru import logger
+
+from .dictionary import IdiomDictionary
+
+# 尝试导入pypinyin，未提供拼音数据文件时用于生成拼音表
+try:
+    from pypinyin import Style, pinyin as _pypinyin
+except ImportError:
+    _pypinyin = None
+
+# 带声调字母 -> (无调字母, 声调)
+_TONE_MARKS = {
+    "ā": ("a", 1), "á": ("a", 2), "ǎ": ("a", 3), "à": ("a", 4),
+    "ē": ("e", 1), "é": ("e", 2), "ě": ("e", 3), "è": ("e", 4),
+    "ī": ("i", 1), "í": ("i", 2), "ǐ": ("i", 3), "ì": ("i", 4),
+    "ō": ("o", 1), "ó": ("o", 2), "ǒ": ("o", 3), "ò": ("o", 4),
+    "ū": ("u", 1), "ú": ("u", 2), "ǔ": ("u", 3), "ù": ("u", 4),
+    "ǖ": ("v", 1), "ǘ": ("v", 2), "ǚ": ("v", 3), "ǜ": ("v", 4), "ü": ("v", 0),
+    "ń": ("n", 2), "ň": ("n", 3), "ǹ": ("n", 4), "ḿ": ("m", 2),
+}
+
+# pinyin-data格式: "U+4E00: yī,yí  # 一"
+_PINYIN_DATA_LINE = re.compile(r"^U\+([0-9A-Fa-f]+):\s*([^#]+)")
+
+
+def normalize_syllable(syllable: str) -> str:
+    """将拼音统一为"数字声调"形式，如 yī -> yi1、lü4 -> lv4，轻声不带数字"""
+    syllable = syllable.strip().lower()
+    tone = 0
+    if syllable and syllable[-1].isdigit():
+        tone = int(syllable[-1])
+        syllable = syllable[:-1]
+
+    letters = []
+    for ch in syllable:
+        if ch in _TONE_MARKS:
+            base, mark = _TONE_MARKS[ch]
+            letters.append(base)
+            tone = mark or tone
+        else:
+            letters.append(ch)
+
+    base = "".join(letters).replace("u:", "v")
+    return f"{base}{tone}" if 1 <= tone <= 4 else base
+
+
+def strip_tone(syllable: str) -> str:
+    """去掉声调数字"""
+    return syllable.rstrip("012345")
+
+
+class PinyinIndex:
+    """汉字拼音表及按首字读音建立的成语反向索引"""
+
+    def __init__(self, table: Dict[str, Iterable[str]], dictionary: Optional[IdiomDictionary] = None):
+        # 多音字保留全部读音，分别建立带声调与不带声调的键
+        self._toned: Dict[str, FrozenSet[str]] = {}
+        self._toneless: Dict[str, FrozenSet[str]] = {}
+        for char, readings in table.items():
+            toned = frozenset(normalize_syllable(r) for r in readings if r.strip())
+            if not toned:
+                continue
+            self._toned[char] = toned
+            self._toneless[char] = frozenset(strip_tone(r) for r in toned)
+
+        # 反向索引 {读音: [首字为该读音的成语编号]}，带声调与不带声调的键共用一张表
+        self._by_syllable: Dict[str, List[int]] = {}
+        if dictionary is not None:
+            for i, word in enumerate(dictionary.words):
+                first = word[0]
+                for key in self._toned.get(first, frozenset()) | self._toneless.get(first, frozenset()):
+                    self._by_syllable.setdefault(key, []).append(i)
+
+    @classmethod
+    def load(cls, path: str, dictionary: Optional[IdiomDictionary] = None) -> Optional["PinyinIndex"]:
+        """从拼音数据文件加载，文件不存在时尝试用pypinyin为词库中的字生成拼音表"""
+        table: Dict[str, List[str]] = {}
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith("#"):
+                        continue
+                    match = _PINYIN_DATA_LINE.match(line)
+                    if match:
+                        # pinyin-data格式
+                        char = chr(int(match.group(1), 16))
+                        readings = match.group(2)
+                    else:
+                        # "字 读音1,读音2"格式
+                        parts = line.split(None, 1)
+                        if len(parts) != 2:
+                            continue
+                        char, readings = parts
+                    table.setdefault(char, []).extend(readings.replace(",", " ").split())
+            logger.info(f"已加载拼音数据: {path}，共 {len(table)} 个汉字")
+
+        elif _pypinyin is not None and dictionary is not None:
+            chars = {word[0] for word in dictionary.words} | {word[-1] for word in dictionary.words}
+            for char in chars:
+                table[char] = _pypinyin(char, style=Style.TONE3, heteronym=True, neutral_tone_with_five=True)[0]
+            logger.info(f"已使用pypinyin生成拼音表，共 {len(table)} 个汉字")
+
+        else:
+            logger.warning(f"未找到拼音数据文件（或未安装pypinyin），同音模式无法本地判断: {path}")
+            return None
+
+        return cls(table, dictionary)
+
+    def __contains__(self, char: str) -> bool:
+        return char in self._toned
+
+    def readings(self, char: str, tone_sensitive: bool = False) -> FrozenSet[str]:
+        """汉字的全部读音"""
+        table = self._toned if tone_sensitive else self._toneless
+        return table.get(char, frozenset())
+
+    def is_homophone(self, a: str, b: str, tone_sensitive: bool = False) -> bool:
+        """两个字是否有相同读音，多音字任一读音相同即可"""
+        return not self.readings(a, tone_sensitive).isdisjoint(self.readings(b, tone_sensitive))
+
+    def starting_with(self, syllable: str) -> Sequence[int]:
+        """首字为该读音的成语编号"""
+        return self._by_syllable.get(syllable, ())
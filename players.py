@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+玩家计数 - 玩家ID在进程内统一编号，每局的玩家计数紧凑地存放在一个整数数组中
+"""
+from array import array
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 每局为每个玩家记录的计数
+SCORE, CONSECUTIVE, IDIOMS, ATTEMPTS = range(4)
+COLUMNS = ("score", "consecutive", "idioms", "attempts")
+
+# 每个玩家占一行: 玩家编号、已设置的计数(位掩码)、各项计数
+_STRIDE = 2 + len(COLUMNS)
+
+
+class PlayerTable:
+    """wxid与小整数编号的双向映射，同一个玩家在所有群中只保存一份wxid
+
+    每个编号记录被多少局游戏引用，引用数归零时删除该玩家，编号留给之后的新玩家复用，
+    因此表中只有进行中的游戏里的玩家，不会随进程运行时间增长。
+    """
+
+    __slots__ = ("_ids", "_wxids", "_refs", "_free")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._wxids: List[str] = []  # 已释放的编号处为空字符串
+        self._refs = array("i")  # 每个编号被多少局游戏引用
+        self._free: List[int] = []  # 已释放、可以复用的编号
+
+    def acquire(self, wxid: str) -> int:
+        """增加玩家的引用并返回编号，第一次出现时分配编号"""
+        player_id = self._ids.get(wxid)
+        if player_id is None:
+            if self._free:
+                player_id = self._free.pop()
+                self._wxids[player_id] = wxid
+            else:
+                player_id = len(self._wxids)
+                self._wxids.append(wxid)
+                self._refs.append(0)
+            self._ids[wxid] = player_id
+        self._refs[player_id] += 1
+        return player_id
+
+    def release(self, player_id: int):
+        """减少玩家的引用，没有游戏再引用时删除"""
+        self._refs[player_id] -= 1
+        if self._refs[player_id] == 0:
+            del self._ids[self._wxids[player_id]]
+            self._wxids[player_id] = ""
+            self._free.append(player_id)
+
+    def find(self, wxid: str) -> int:
+        """玩家编号，未出现过时返回-1"""
+        return self._ids.get(wxid, -1)
+
+    def wxid_of(self, player_id: int) -> str:
+        return self._wxids[player_id]
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+# 进程内所有会话共用的玩家编号表
+PLAYERS = PlayerTable()
+
+
+class PlayerStats:
+    """一局游戏中各玩家的计数
+
+    所有玩家的全部计数按行存放在同一个array中，每行依次为玩家编号、位掩码和各项计数；
+    一局的玩家通常只有几个，按行顺序查找即可。位掩码记录玩家设置过哪些计数，
+    只尝试过接龙的玩家不会出现在得分中。每行持有玩家编号表中的一个引用，对象销毁时归还。
+    """
+
+    __slots__ = ("_rows",)
+
+    def __init__(self):
+        self._rows = array("i")
+
+    @classmethod
+    def from_dicts(cls, *columns: Optional[Mapping[str, int]]) -> "PlayerStats":
+        """从按COLUMNS顺序给出的 {wxid: 计数} 字典恢复"""
+        stats = cls()
+        for column, values in enumerate(columns):
+            for wxid, value in (values or {}).items():
+                stats.set(column, wxid, value)
+        return stats
+
+    def __del__(self):
+        rows = self._rows
+        for offset in range(0, len(rows), _STRIDE):
+            PLAYERS.release(rows[offset])
+
+    def _find(self, player_id: int) -> int:
+        rows = self._rows
+        for offset in range(0, len(rows), _STRIDE):
+            if rows[offset] == player_id:
+                return offset
+        return -1
+
+    def _offset(self, wxid: str, create: bool) -> int:
+        player_id = PLAYERS.find(wxid)
+        offset = self._find(player_id) if player_id >= 0 else -1
+        if offset < 0 and create:
+            offset = len(self._rows)
+            self._rows.extend((PLAYERS.acquire(wxid),) + (0,) * (_STRIDE - 1))
+        return offset
+
+    def get(self, column: int, wxid: str) -> Optional[int]:
+        """玩家的某项计数，未设置时返回None"""
+        offset = self._offset(wxid, False)
+        if offset < 0 or not self._rows[offset + 1] & (1 << column):
+            return None
+        return self._rows[offset + 2 + column]
+
+    def set(self, column: int, wxid: str, value: int):
+        offset = self._offset(wxid, True)
+        self._rows[offset + 1] |= 1 << column
+        self._rows[offset + 2 + column] = value
+
+    def add(self, column: int, wxid: str, delta: int = 1) -> int:
+        """计数加上delta，返回新值"""
+        offset = self._offset(wxid, True)
+        self._rows[offset + 1] |= 1 << column
+        self._rows[offset + 2 + column] += delta
+        return self._rows[offset + 2 + column]
+
+    def items(self, column: int) -> Iterator[Tuple[str, int]]:
+        """设置过该项计数的玩家及其计数"""
+        rows, mask = self._rows, 1 << column
+        for offset in range(0, len(rows), _STRIDE):
+            if rows[offset + 1] & mask:
+                yield PLAYERS.wxid_of(rows[offset]), rows[offset + 2 + column]
+
+    def view(self, column: int) -> "PlayerColumn":
+        return PlayerColumn(self, column)
+
+
+class PlayerColumn(Mapping):
+    """某项计数的只读字典视图，兼容原先 {wxid: 计数} 字典的读取方式"""
+
+    __slots__ = ("_stats", "_column")
+
+    def __init__(self, stats: PlayerStats, column: int):
+        self._stats = stats
+        self._column = column
+
+    def __getitem__(self, wxid: str) -> int:
+        value = self._stats.get(self._column, wxid)
+        if value is None:
+            raise KeyError(wxid)
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return (wxid for wxid, _ in self._stats.items(self._column))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._stats.items(self._column))
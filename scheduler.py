@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+定时器 - 用最小堆保存各群的下一个截止时间，只处理已到期的群
+"""
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+
+class DeadlineScheduler:
+    """按截止时间排序的定时器
+
+    每个键只保留一个有效的截止时间。更新截止时间时直接压入新条目，旧条目留在堆中，
+    弹出时与当前有效值比较后丢弃，因此更新和查询下一个截止时间都不需要遍历。
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}  # {键: 当前有效的截止时间}
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def set(self, key: str, deadline: float):
+        """设置或更新键的截止时间"""
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+        # 过期条目太多时重建堆，避免频繁更新的键让堆无限增长
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(d, k) for k, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, key: str):
+        """取消键的截止时间"""
+        self._deadlines.pop(key, None)
+
+    def next_deadline(self) -> Optional[float]:
+        """最近的有效截止时间"""
+        while self._heap:
+            deadline, key = self._heap[0]
+            if self._deadlines.get(key) == deadline:
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> List[str]:
+        """取出所有已到期的键，取出后需要重新设置才会再次到期"""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                due.append(key)
+        return due
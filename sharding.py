@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程分片 - 一致性哈希把群分配给各个工作进程，通过共享SQLite表的租约保证同一时刻只有一个进程处理
+"""
+import asyncio
+import bisect
+import hashlib
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """一致性哈希环，每个节点放置vnodes个虚拟节点，节点增减时只有少量群换主"""
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 64):
+        self.nodes = frozenset(nodes)
+        self._ring: List[Tuple[int, str]] = sorted(
+            (_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(vnodes)
+        )
+        self._keys = [h for h, _ in self._ring]
+
+    def node_for(self, key: str) -> Optional[str]:
+        """群归属的节点，环为空时返回None"""
+        if not self._ring:
+            return None
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardCoordinator:
+    """工作进程的分片协调器
+
+    各进程定期在共享数据库中写入心跳，心跳未过期的进程组成哈希环；处理某个群前须先取得
+    该群的租约，租约随心跳续期。进程退出或卡死时心跳和租约一同过期，群由哈希环上的下一个进程接管。
+    所有数据库操作在单独的工作线程中执行。
+    """
+
+    def __init__(self, db_path: str, worker_id: str, lease_seconds: float = 15.0, vnodes: int = 64):
+        self.db_path = db_path
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.vnodes = vnodes
+        self.ring = HashRing((worker_id,), vnodes)
+        self._leases: Dict[str, float] = {}  # {群聊ID: 本地记录的租约到期时间}
+        self._last_heartbeat = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitaireShard")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor.submit(self._connect).result()
+
+    def _connect(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS workers (
+                worker_id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                chatroom_id TEXT PRIMARY KEY,
+                worker_id TEXT NOT NULL,
+                expires REAL NOT NULL
+            );
+        """)
+        self._conn.commit()
+
+    async def _run(self, func, *args):
+        return await asyncio.wrap_future(self._executor.submit(func, *args))
+
+    def heartbeat_due(self) -> bool:
+        """距上次心跳已超过租约时长的三分之一"""
+        return time.time() - self._last_heartbeat >= self.lease_seconds / 3
+
+    async def heartbeat(self) -> bool:
+        """写入心跳、续期本进程的租约并刷新哈希环，返回哈希环是否变化"""
+        self._last_heartbeat = now = time.time()
+        workers, held = await self._run(self._heartbeat, now)
+        # 只保留数据库中仍归本进程的租约，卡顿期间被其他进程接管的群不再视为持有
+        expires = now + self.lease_seconds
+        self._leases = {chatroom_id: expires for chatroom_id in self._leases if chatroom_id in held}
+
+        if workers == self.ring.nodes:
+            return False
+        logger.info(f"工作进程变化: {sorted(self.ring.nodes)} -> {sorted(workers)}")
+        self.ring = HashRing(workers, self.vnodes)
+        return True
+
+    def _heartbeat(self, now: float) -> Tuple[frozenset, set]:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO workers VALUES (?, ?) ON CONFLICT (worker_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                (self.worker_id, now),
+            )
+            self._conn.execute("UPDATE leases SET expires = ? WHERE worker_id = ?",
+                               (now + self.lease_seconds, self.worker_id))
+            # 顺便清理早已停止心跳的进程
+            self._conn.execute("DELETE FROM workers WHERE heartbeat < ?", (now - self.lease_seconds * 10,))
+        rows = self._conn.execute("SELECT worker_id FROM workers WHERE heartbeat >= ?", (now - self.lease_seconds,))
+        workers = frozenset(worker_id for (worker_id,) in rows) | {self.worker_id}
+        rows = self._conn.execute("SELECT chatroom_id FROM leases WHERE worker_id = ?", (self.worker_id,))
+        return workers, {chatroom_id for (chatroom_id,) in rows}
+
+    def should_own(self, chatroom_id: str) -> bool:
+        """按哈希环该群是否归本进程"""
+        return self.ring.node_for(chatroom_id) == self.worker_id
+
+    def holds(self, chatroom_id: str) -> bool:
+        """本进程是否持有该群未过期的租约"""
+        expires = self._leases.get(chatroom_id)
+        return expires is not None and expires > time.time()
+
+    @property
+    def leased(self) -> List[str]:
+        """本进程持有租约的群"""
+        return list(self._leases)
+
+    async def acquire(self, chatroom_id: str) -> bool:
+        """尝试取得该群的租约：群须归本进程，且租约空闲、已过期或本就属于本进程"""
+        if not self.should_own(chatroom_id):
+            return False
+        now = time.time()
+        if await self._run(self._acquire, chatroom_id, now):
+            self._leases[chatroom_id] = now + self.lease_seconds
+            return True
+        self._leases.pop(chatroom_id, None)
+        return False
+
+    def _acquire(self, chatroom_id: str, now: float) -> bool:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT (chatroom_id) DO UPDATE SET"
+                " worker_id = excluded.worker_id, expires = excluded.expires"
+                " WHERE leases.worker_id = excluded.worker_id OR leases.expires < ?",
+                (chatroom_id, self.worker_id, now + self.lease_seconds, now),
+            )
+        row = self._conn.execute("SELECT worker_id FROM leases WHERE chatroom_id = ?", (chatroom_id,)).fetchone()
+        return row is not None and row[0] == self.worker_id
+
+    async def release(self, chatroom_ids: Iterable[str]):
+        """交出这些群的租约"""
+        chatroom_ids = list(chatroom_ids)
+        for chatroom_id in chatroom_ids:
+            self._leases.pop(chatroom_id, None)
+        await self._run(self._release, chatroom_ids)
+
+    def _release(self, chatroom_ids: List[str]):
+        with self._conn:
+            self._conn.executemany("DELETE FROM leases WHERE chatroom_id = ? AND worker_id = ?",
+                                   [(chatroom_id, self.worker_id) for chatroom_id in chatroom_ids])
+
+    async def close(self):
+        """交出全部租约并注销本进程"""
+        chatroom_ids, self._leases = list(self._leases), {}
+        await self._run(self._release, chatroom_ids)
+        await self._run(self._unregister)
+        self._executor.shutdown(wait=True)
+
+    def _unregister(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM workers WHERE worker_id = ?", (self.worker_id,))
+        self._conn.close()
+        self._conn = None
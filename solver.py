@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接龙求解 - 基于接龙图给出提示，并在限定时间内搜索尽量长的接龙
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Collection, Dict, FrozenSet, List, Sequence, Tuple
+
+from .chain import ChainGraph
+
+# 搜索时每展开多少个节点检查一次是否超时
+_CHECK_EVERY = 256
+
+_Key = Tuple[int, FrozenSet[int]]
+
+
+class ChainSolver:
+    """成语接龙求解器
+
+    每个尾字的后继按出度从大到小排序后缓存，提示和搜索共用。最长接龙是NP难问题，
+    这里按排序后的后继做深度优先搜索，先沿出度最大的分支走到底，再在时间预算内回溯改进；
+    搜索在单独的工作线程中执行，结果按(起点, 排除的成语)缓存。
+    """
+
+    def __init__(self, graph: ChainGraph, time_budget: float = 2.0, max_length: int = 30, cache_size: int = 256):
+        self.graph = graph
+        self.time_budget = time_budget
+        self.max_length = max_length
+        self.cache_size = cache_size
+        self._ordered: Dict[str, Tuple[int, ...]] = {}  # {尾字: 按出度排序的后继编号}
+        self._results: "OrderedDict[_Key, Tuple[int, ...]]" = OrderedDict()
+        self._pending: Dict[_Key, asyncio.Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="IdiomSolitaireSolver")
+
+    def ordered_successors(self, char: str) -> Tuple[int, ...]:
+        """可以接在该字后面的成语编号，后继多的在前"""
+        ordered = self._ordered.get(char)
+        if ordered is None:
+            live, out = self.graph.live_degree, self.graph.out_degree
+            ordered = tuple(sorted(self.graph.successors_of(char), key=lambda i: (live[i], out[i]), reverse=True))
+            self._ordered[char] = ordered
+        return ordered
+
+    def hints(self, idiom: str, exclude: Collection[int] = (), limit: int = 3) -> List[str]:
+        """接在该成语后面的候选，排除已使用的成语，后继多的在前"""
+        hints = []
+        for i in self.ordered_successors(idiom[-1]):
+            if i not in exclude:
+                hints.append(self.graph.dictionary.word_at(i))
+                if len(hints) >= limit:
+                    break
+        return hints
+
+    async def longest_chain(self, start: int, exclude: Collection[int] = ()) -> List[str]:
+        """从该成语开始搜索尽量长的接龙，返回包括起点在内的成语列表"""
+        key = (start, frozenset(exclude))
+        chain = self._results.get(key)
+        if chain is not None:
+            self._results.move_to_end(key)
+        else:
+            # 同样的查询正在搜索时等待同一个结果
+            future = self._pending.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().run_in_executor(self._executor, self._search, start, key[1])
+                self._pending[key] = future
+                future.add_done_callback(lambda _: self._pending.pop(key, None))
+            chain = await asyncio.shield(future)
+            self._results[key] = chain
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return [self.graph.dictionary.word_at(i) for i in chain]
+
+    def _search(self, start: int, exclude: FrozenSet[int]) -> Tuple[int, ...]:
+        deadline = time.monotonic() + self.time_budget
+        word_at = self.graph.dictionary.word_at
+        path = [start]
+        visited = set(exclude)
+        visited.add(start)
+        best: Sequence[int] = (start,)
+        stack = [iter(self.ordered_successors(word_at(start)[-1]))]
+        steps = 0
+
+        while stack:
+            steps += 1
+            if steps % _CHECK_EVERY == 0 and time.monotonic() > deadline:
+                break
+
+            index = next((i for i in stack[-1] if i not in visited), None)
+            if index is None:
+                # 该分支已走完，回溯
+                stack.pop()
+                visited.discard(path.pop())
+                continue
+
+            path.append(index)
+            visited.add(index)
+            if len(path) > len(best):
+                best = tuple(path)
+                if len(best) >= self.max_length:
+                    break
+            stack.append(iter(self.ordered_successors(word_at(index)[-1])))
+
+        return tuple(best)
+
+    def close(self):
+        """停止工作线程，正在进行的搜索会在时间预算内结束"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,79 @@
+import time
+
+from ..breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def _tripped(open_seconds: float = 30.0) -> CircuitBreaker:
+    breaker = CircuitBreaker(window=4, min_requests=2, error_rate=0.5, open_seconds=open_seconds)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(0.01, False)
+    assert breaker.state == OPEN
+    return breaker
+
+
+def _expire(breaker: CircuitBreaker):
+    breaker._opened_at = time.monotonic() - breaker.open_seconds - 1
+
+
+def test_trips_after_error_rate_reached():
+    breaker = _tripped()
+    assert breaker.is_open
+    assert not breaker.allow()
+    assert breaker.trips == 1
+
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker(window=4, min_requests=2, slow_call=1.0)
+    breaker.record(2.0, True)
+    breaker.record(2.0, True)
+    assert breaker.state == OPEN
+
+
+def test_probe_success_closes():
+    breaker = _tripped()
+    _expire(breaker)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert breaker.probe_pending
+    assert not breaker.allow()
+    breaker.record(0.01, True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_probe_failure_reopens():
+    breaker = _tripped()
+    _expire(breaker)
+    assert breaker.allow()
+    breaker.record(0.01, False)
+    assert breaker.state == OPEN
+    assert breaker.is_open
+
+
+def test_cancelled_probe_releases_slot():
+    breaker = _tripped()
+    _expire(breaker)
+    assert breaker.allow()
+    breaker.release()
+    assert not breaker.probe_pending
+    assert breaker.allow()
+    breaker.record(0.01, True)
+    assert breaker.state == CLOSED
+
+
+def test_release_when_closed_is_noop():
+    breaker = CircuitBreaker()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == CLOSED
+    assert not breaker.probe_pending
+
+
+def test_latency_quantile_needs_samples():
+    breaker = CircuitBreaker(min_requests=3)
+    breaker.record(0.1, True)
+    assert breaker.latency_quantile(0.95) is None
+    breaker.record(0.2, True)
+    breaker.record(0.3, True)
+    assert breaker.latency_quantile(0.95) == 0.3
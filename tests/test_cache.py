@@ -0,0 +1,51 @@
+import time
+
+from ..cache import CooldownStore, VerdictCache, normalize_input
+
+
+def test_normalized_keys_share_entries():
+    cache = VerdictCache()
+    cache.put("一心一意", True)
+    assert normalize_input(" 一心 一意　") == "一心一意"
+    assert cache.get(" 一心 一意 ") is True
+    assert cache.get("意气风发") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_negative_verdicts_expire_separately():
+    cache = VerdictCache(positive_ttl=60, negative_ttl=0.01)
+    cache.put("一心一意", True)
+    cache.put("随便说说", False)
+    time.sleep(0.02)
+    assert cache.get("一心一意") is True
+    assert cache.get("随便说说") is None
+
+
+def test_evicts_least_recently_used():
+    cache = VerdictCache(max_size=2)
+    cache.put("一心一意", True)
+    cache.put("意气风发", True)
+    cache.get("一心一意")
+    cache.put("发扬光大", True)
+    assert cache.get("意气风发") is None
+    assert cache.get("一心一意") is True
+
+
+def test_cooldown_blocks_then_expires():
+    store = CooldownStore(cooldown=0.01)
+    assert store.allow("1@chatroom", "wxid_a")
+    assert not store.allow("1@chatroom", "wxid_a")
+    assert store.allow("2@chatroom", "wxid_a")
+    time.sleep(0.02)
+    assert store.allow("3@chatroom", "wxid_b")
+    # 过期的记录在下一次调用时删除
+    assert len(store) == 1
+    assert store.allow("1@chatroom", "wxid_a")
+
+
+def test_cooldown_size_is_bounded():
+    store = CooldownStore(cooldown=60, max_size=3)
+    for i in range(10):
+        store.allow("1@chatroom", f"wxid_{i}")
+    assert len(store) == 3
+    assert store.allow("1@chatroom", "wxid_0")
@@ -0,0 +1,55 @@
+import asyncio
+
+from ..capture import TrafficRecorder, read_trace
+
+
+def _record(path, anonymize=True):
+    async def run():
+        recorder = TrafficRecorder(str(path), config={"mode": "exact"}, anonymize=anonymize, flush_interval=0.01)
+        recorder.message({"FromWxid": "123@chatroom", "SenderWxid": "wxid_a", "Content": "成语接龙"})
+        recorder.tick()
+        recorder.upstream({"AppSecret": "secret", "start": "true"}, "ok", {"code": 200}, 0.05)
+        recorder.message({"FromWxid": "123@chatroom", "SenderWxid": "wxid_a", "Content": "一心一意"})
+        await recorder.close()
+
+    asyncio.run(run())
+    return read_trace(str(path))
+
+
+def test_trace_roundtrip(tmp_path):
+    header, *events = _record(tmp_path / "trace.jsonl")
+    assert header["config"] == {"mode": "exact"}
+    assert [e["type"] for e in events] == ["message", "tick", "upstream", "message"]
+    assert events[2]["params"] == {"start": "true"}
+    assert events[2]["data"] == {"code": 200}
+    assert all(a["t"] <= b["t"] for a, b in zip(events, events[1:]))
+
+
+def test_ids_anonymized_consistently(tmp_path):
+    _, first, _, _, second = _record(tmp_path / "trace.jsonl")
+    assert first["from"].endswith("@chatroom") and first["from"] != "123@chatroom"
+    assert first["sender"] != "wxid_a"
+    assert (first["from"], first["sender"]) == (second["from"], second["sender"])
+    assert first["content"] == "成语接龙"
+
+
+def test_ids_kept_without_anonymize(tmp_path):
+    _, first, *_ = _record(tmp_path / "trace.jsonl", anonymize=False)
+    assert (first["from"], first["sender"]) == ("123@chatroom", "wxid_a")
+
+
+def test_failed_write_is_retried(tmp_path):
+    path = tmp_path / "missing" / "trace.jsonl"
+
+    async def run():
+        recorder = TrafficRecorder(str(path), flush_interval=60)
+        recorder.tick()
+        # 目录不存在时写入失败，事件留在内存中等下一轮
+        await recorder.flush()
+        assert len(recorder._pending) == 2
+        path.parent.mkdir()
+        recorder.tick()
+        await recorder.close()
+
+    asyncio.run(run())
+    assert [e["type"] for e in read_trace(str(path))] == ["header", "tick", "tick"]
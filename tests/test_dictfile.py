@@ -0,0 +1,59 @@
+from ..chain import ChainGraph, MoveSelector
+from ..dictfile import MappedIdiomDictionary, compile_dictionary
+from ..dictionary import IdiomDictionary, read_words
+
+WORDS = ["一心一意", "意气风发", "发扬光大", "大公无私", "私心杂念", "念念不忘", "意味深长", "长驱直入", "入木三分"]
+
+
+def _compile(tmp_path, words=WORDS):
+    path = str(tmp_path / "idioms.bin")
+    compile_dictionary(words, path)
+    return MappedIdiomDictionary(path)
+
+
+def test_mapped_matches_in_memory(tmp_path):
+    mapped, plain = _compile(tmp_path), IdiomDictionary(WORDS)
+    assert list(mapped.words) == plain.words
+    for i, word in enumerate(plain.words):
+        assert mapped.index_of(word) == i and mapped.word_at(i) == word
+        assert list(mapped.starting_with(word[0])) == list(plain.starting_with(word[0]))
+        assert sorted(mapped.ending_with(word[-1])) == sorted(plain.ending_with(word[-1]))
+    assert mapped.index_of("不是成语") == -1
+
+
+def test_precompiled_degrees_match_graph(tmp_path):
+    mapped = _compile(tmp_path)
+    computed = ChainGraph(mapped, mapped.starting_with)
+    graph = ChainGraph(mapped, mapped.starting_with, mapped.degrees)
+    assert list(graph.out_degree) == list(computed.out_degree)
+    assert list(graph.live_degree) == list(computed.live_degree)
+    # "入木三分"之后无人能接
+    assert graph.out_degree[mapped.index_of("入木三分")] == 0
+    assert graph.has_move(mapped.index_of("一心一意"), set())
+
+
+def test_selector_avoids_dead_ends(tmp_path):
+    mapped = _compile(tmp_path)
+    selector = MoveSelector(ChainGraph(mapped, mapped.starting_with, mapped.degrees), "hard")
+    # 接"分"字无成语可选；接"意"字时两个候选都还能继续
+    assert selector.choose_reply("分", set()) is None
+    assert selector.choose_reply("意", set()) in ("意气风发", "意味深长")
+
+
+def test_selector_counts_its_own_reply_as_used(tmp_path):
+    mapped = _compile(tmp_path, WORDS + ["忘乎所忘"])
+    graph = ChainGraph(mapped, mapped.starting_with, mapped.degrees)
+    selector = MoveSelector(graph, "normal")
+    # "忘乎所忘"只能接它自己，机器人出了以后玩家就接不上了
+    index = mapped.index_of("忘乎所忘")
+    assert graph.has_move(index, set())
+    assert not graph.has_move(index, set(), exclude=index)
+    assert selector.choose_reply("忘", set()) is None
+
+
+def test_text_and_compiled_word_sets_agree(tmp_path):
+    source = tmp_path / "idioms.txt"
+    source.write_text("# 注释\n  # 缩进的注释\n一心一意\t yī xīn yī yì\n\n意气风发\n", encoding="utf-8")
+    words = read_words(str(source))
+    assert words == ["一心一意", "意气风发"]
+    assert list(_compile(tmp_path, words).words) == IdiomDictionary.load(str(source)).words
@@ -0,0 +1,45 @@
+import time
+
+from ..flood import FloodGuard
+from ..metrics import Metrics
+
+
+def test_burst_then_drop():
+    guard = FloodGuard(rate=1.0, burst=3)
+    assert [guard.allow("r@chatroom", "u") for _ in range(4)] == [True, True, True, False]
+    assert guard.dropped == 1
+
+
+def test_buckets_are_per_room_and_player():
+    guard = FloodGuard(rate=1.0, burst=1)
+    assert guard.allow("a@chatroom", "u")
+    assert guard.allow("b@chatroom", "u")
+    assert guard.allow("a@chatroom", "v")
+    assert not guard.allow("a@chatroom", "u")
+
+
+def test_refill_over_time():
+    guard = FloodGuard(rate=50.0, burst=1)
+    assert guard.allow("r@chatroom", "u")
+    assert not guard.allow("r@chatroom", "u")
+    time.sleep(0.03)
+    assert guard.allow("r@chatroom", "u")
+
+
+def test_idle_buckets_evicted_and_size_capped():
+    guard = FloodGuard(rate=100.0, burst=1, max_size=3)
+    for i in range(5):
+        guard.allow("r@chatroom", f"u{i}")
+    assert len(guard) == 3
+    time.sleep(0.02)
+    guard.allow("r@chatroom", "late")
+    assert len(guard) == 1
+
+
+def test_disabled_and_metrics():
+    assert all(FloodGuard(rate=0).allow("r@chatroom", "u") for _ in range(100))
+    metrics = Metrics()
+    guard = FloodGuard(rate=1.0, burst=1, metrics=metrics)
+    guard.allow("r@chatroom", "u")
+    guard.allow("r@chatroom", "u")
+    assert "flood_dropped_total 1" in metrics.render()
@@ -0,0 +1,46 @@
+import asyncio
+import datetime
+import time
+
+from ..leaderboard import GLOBAL_SCOPE, Leaderboard, period_key
+
+
+def _ts(year: int, month: int, day: int) -> float:
+    return time.mktime(datetime.datetime(year, month, day, 12).timetuple())
+
+
+def _top(board: Leaderboard, period: str, scope: str = GLOBAL_SCOPE):
+    return board._executor.submit(board._top, period, scope, 10).result()
+
+
+def test_period_keys_sort_by_time():
+    assert period_key("all", _ts(2026, 1, 5)) == "all"
+    assert period_key("month", _ts(2026, 1, 5)) == "m2026-01"
+    # 2026-01-01 属于 ISO 2026 年第1周，2025-12-29 所在的周
+    assert period_key("week", _ts(2026, 1, 1)) == "w2026-01"
+    assert period_key("week", _ts(2025, 12, 20)) < period_key("week", _ts(2026, 1, 1))
+    assert period_key("month", _ts(2025, 12, 20)) < period_key("month", _ts(2026, 1, 1))
+
+
+def test_scores_accumulate_per_room_and_globally(tmp_path):
+    board = Leaderboard(str(tmp_path / "rank.db"))
+    ended = _ts(2026, 3, 10)
+    board.record_game("1@chatroom", {"wxid_a": 10, "wxid_b": 5}, {"wxid_a": 2, "wxid_b": 1}, ended)
+    board.record_game("2@chatroom", {"wxid_b": 20}, {"wxid_b": 4}, ended)
+    month = period_key("month", ended)
+    assert [(e.wxid, e.points, e.games) for e in _top(board, month)] == [("wxid_b", 25, 2), ("wxid_a", 10, 1)]
+    assert [e.wxid for e in _top(board, month, "1@chatroom")] == ["wxid_a", "wxid_b"]
+    asyncio.run(board.close())
+
+
+def test_new_period_clears_previous_rows(tmp_path):
+    board = Leaderboard(str(tmp_path / "rank.db"))
+    march, april = _ts(2026, 3, 10), _ts(2026, 4, 20)
+    board.record_game("1@chatroom", {"wxid_a": 10}, {"wxid_a": 2}, march)
+    board.record_game("1@chatroom", {"wxid_b": 3}, {"wxid_b": 1}, april)
+    assert _top(board, period_key("month", march)) == []
+    assert _top(board, period_key("week", march)) == []
+    assert [e.wxid for e in _top(board, period_key("month", april))] == ["wxid_b"]
+    # 总榜不清理
+    assert [(e.wxid, e.points) for e in _top(board, "all")] == [("wxid_a", 10), ("wxid_b", 3)]
+    asyncio.run(board.close())
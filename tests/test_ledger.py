@@ -0,0 +1,66 @@
+import asyncio
+import threading
+
+from ..ledger import PointsLedger
+
+
+class _Points:
+    """记录写库结果，前fail_times次写入失败"""
+
+    def __init__(self, fail_times: int = 0, delay: float = 0.0):
+        self.fail_times = fail_times
+        self.delay = delay
+        self.totals = {}
+        self.started = threading.Event()
+
+    def add(self, wxid: str, points: int):
+        self.started.set()
+        if self.delay:
+            threading.Event().wait(self.delay)
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("database is locked")
+        self.totals[wxid] = self.totals.get(wxid, 0) + points
+
+
+def test_failed_points_are_requeued():
+    async def run():
+        db = _Points(fail_times=1)
+        ledger = PointsLedger(db.add, flush_interval=60)
+        ledger.award("wxid_a", 3)
+        await ledger.flush()
+        assert db.totals == {}
+        assert ledger.pending == 1
+        ledger.award("wxid_a", 2)
+        await ledger.close()
+        return db
+
+    assert asyncio.run(run()).totals == {"wxid_a": 5}
+
+
+def test_flush_soon_wakes_timer():
+    async def run():
+        db = _Points()
+        ledger = PointsLedger(db.add, flush_interval=60)
+        ledger.award("wxid_a", 1)
+        ledger.flush_soon()
+        await asyncio.sleep(0.05)
+        assert db.totals == {"wxid_a": 1}
+        await ledger.close()
+
+    asyncio.run(run())
+
+
+def test_close_waits_for_running_flush():
+    async def run():
+        db = _Points(fail_times=1, delay=0.05)
+        ledger = PointsLedger(db.add, flush_interval=0.01)
+        ledger.award("wxid_a", 4)
+        while not db.started.is_set():
+            await asyncio.sleep(0.005)
+        # 定时任务正在写库时卸载，失败的那一批仍要放回并在关闭前写出
+        await ledger.close()
+        assert ledger.pending == 0
+        return db
+
+    assert asyncio.run(run()).totals == {"wxid_a": 4}
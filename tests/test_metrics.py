@@ -0,0 +1,29 @@
+import pytest
+
+from ..metrics import Histogram
+
+
+def test_quantile_interpolates_within_bucket():
+    histogram = Histogram((0.1, 0.25, 0.5, 1.0))
+    for value in (0.3, 0.3, 0.4, 0.4):
+        histogram.observe(value)
+    # 四个样本都在(0.25, 0.5]桶内，中位数取桶的中点而不是上界
+    assert histogram.quantile(0.5) == pytest.approx(0.375)
+    assert histogram.quantile(1.0) == pytest.approx(0.5)
+
+
+def test_quantile_first_bucket_starts_at_zero():
+    histogram = Histogram((0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.05)
+    assert histogram.quantile(0.5) == pytest.approx(0.05)
+
+
+def test_quantile_skips_empty_buckets_and_caps_overflow():
+    histogram = Histogram((0.1, 0.25, 0.5))
+    histogram.observe(0.05)
+    histogram.observe(0.4)
+    histogram.observe(100.0)
+    assert histogram.quantile(0.5) == pytest.approx(0.25 + 0.25 * 0.5)
+    assert histogram.quantile(0.99) == 0.5
+    assert Histogram().quantile(0.5) == 0.0
@@ -0,0 +1,104 @@
+import asyncio
+import time
+
+from ..bench.fake_bot import FakeWechatAPIClient
+from ..outbox import PRIORITY_LOW, Outbox, TokenBucket
+
+
+def test_token_bucket_refills_to_full():
+    bucket = TokenBucket(rate=100.0, burst=2)
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert 0 < bucket.full_in() <= 0.02
+    time.sleep(0.03)
+    assert bucket.is_full()
+    assert bucket.full_in() == 0.0
+
+
+def test_unlimited_bucket_is_always_full():
+    bucket = TokenBucket(rate=0, burst=1)
+    bucket.try_acquire()
+    assert bucket.is_full()
+    assert bucket.wait_time() == 0.0
+
+
+def test_rooms_released_after_idle():
+    async def run():
+        bot = FakeWechatAPIClient()
+        outbox = Outbox(rate=10.0, burst=1, coalesce_window=0.0)
+        for i in range(200):
+            outbox.post(bot, f"{i}@chatroom", "hello")
+        await asyncio.sleep(0.01)
+        assert outbox.sent == 200
+        # 令牌补满(burst/rate=0.1秒)之前保留群的状态
+        assert len(outbox._rooms) == 200
+        await asyncio.sleep(0.2)
+        assert outbox._rooms == {}
+        return bot
+
+    bot = asyncio.run(run())
+    assert len(bot.sent) == 200
+
+
+def test_rate_limit_survives_idle_gap():
+    async def run():
+        bot = FakeWechatAPIClient()
+        outbox = Outbox(rate=20.0, burst=1, coalesce_window=0.0)
+        outbox.post(bot, "r@chatroom", "a")
+        await asyncio.sleep(0.01)
+        # 队列已空但令牌未补满，新消息仍需等待
+        outbox.post(bot, "r@chatroom", "b")
+        await asyncio.sleep(0.01)
+        assert outbox.sent == 1
+        await asyncio.sleep(0.06)
+        assert outbox.sent == 2
+        await outbox.close()
+        return bot
+
+    bot = asyncio.run(run())
+    assert [text for _, text, _ in bot.sent] == ["a", "b"]
+
+
+def test_coalesce_and_priority():
+    async def run():
+        bot = FakeWechatAPIClient()
+        outbox = Outbox(rate=100.0, burst=5, coalesce_window=0.05)
+        outbox.post(bot, "r@chatroom", "错误1", PRIORITY_LOW, footer="当前成语：甲", coalesce=True)
+        outbox.post(bot, "r@chatroom", "错误2", PRIORITY_LOW, footer="当前成语：乙", coalesce=True)
+        outbox.post(bot, "r@chatroom", "接龙成功")
+        await asyncio.sleep(0.1)
+        await outbox.close()
+        return bot, outbox
+
+    bot, outbox = asyncio.run(run())
+    assert [text for _, text, _ in bot.sent] == ["接龙成功", "错误1\n错误2\n当前成语：乙"]
+    assert outbox.merged == 1
+
+
+def test_discard_drops_low_priority():
+    async def run():
+        bot = FakeWechatAPIClient()
+        outbox = Outbox(rate=100.0, burst=5, coalesce_window=0.05)
+        outbox.post(bot, "r@chatroom", "提醒", PRIORITY_LOW, coalesce=True)
+        outbox.discard("r@chatroom")
+        outbox.post(bot, "r@chatroom", "游戏结束")
+        await outbox.close()
+        return bot, outbox
+
+    bot, outbox = asyncio.run(run())
+    assert [text for _, text, _ in bot.sent] == ["游戏结束"]
+    assert outbox.pending == 0
+
+
+def test_close_does_not_wait_for_refill():
+    async def run():
+        outbox = Outbox(rate=0.1, burst=1, coalesce_window=0.0)
+        outbox.post(FakeWechatAPIClient(), "r@chatroom", "a")
+        await asyncio.sleep(0)
+        start = time.monotonic()
+        await outbox.close(timeout=1.0)
+        return time.monotonic() - start, outbox
+
+    elapsed, outbox = asyncio.run(run())
+    assert elapsed < 0.5
+    assert outbox._rooms == {}
@@ -0,0 +1,64 @@
+import asyncio
+import sqlite3
+
+from ..persistence import SessionJournal, SqliteSessionStore
+
+START = {
+    "chatroom_id": "1@chatroom",
+    "game_id": "local-1",
+    "current_idiom": "一心一意",
+    "last_player": None,
+    "active": True,
+    "start_time": 1.0,
+    "last_activity_time": 1.0,
+    "reminder_sent": False,
+    "used_idioms": ["一心一意"],
+}
+
+
+def _play(store):
+    async def run():
+        store.record("start", "1@chatroom", session=dict(START))
+        store.record("attempt", "1@chatroom", player="wxid_a", attempts=1)
+        store.record("success", "1@chatroom", game_id="local-1", current_idiom="发扬光大", player="wxid_b",
+                     time=2.0, used=["意气风发", "发扬光大"], score=5, consecutive=1, count=1)
+        store.record("attempt", "1@chatroom", player="wxid_b", attempts=1)
+        store.record("attempt", "1@chatroom", player="wxid_a", attempts=2)
+        await store.close()
+
+    asyncio.run(run())
+
+
+def test_journal_replays_attempts(tmp_path):
+    snapshot, journal = str(tmp_path / "sessions.json"), str(tmp_path / "sessions.journal")
+    # 不设置快照提供函数，关闭时只写日志
+    _play(SessionJournal(snapshot, journal, flush_delay=0.01))
+    session = SessionJournal(snapshot, journal).load()["1@chatroom"]
+    assert session["attempts"] == {"wxid_a": 2, "wxid_b": 1}
+    assert session["players"] == {"wxid_b": 5}
+    assert session["used_idioms"] == ["一心一意", "意气风发", "发扬光大"]
+
+
+def test_sqlite_stores_attempts(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    _play(SqliteSessionStore(path))
+    store = SqliteSessionStore(path)
+    session = store.load()["1@chatroom"]
+    asyncio.run(store.close())
+    assert session["attempts"] == {"wxid_a": 2, "wxid_b": 1}
+    assert session["players"] == {"wxid_b": 5}
+    assert session["total_idioms_count"] == {"wxid_b": 1}
+
+
+def test_sqlite_adds_attempts_column_to_old_tables(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE session_players (chatroom_id TEXT NOT NULL, wxid TEXT NOT NULL,"
+                 " score INTEGER NOT NULL DEFAULT 0, consecutive INTEGER NOT NULL DEFAULT 0,"
+                 " idioms INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (chatroom_id, wxid))")
+    conn.commit()
+    conn.close()
+    _play(SqliteSessionStore(path))
+    store = SqliteSessionStore(path)
+    assert store.load()["1@chatroom"]["attempts"] == {"wxid_a": 2, "wxid_b": 1}
+    asyncio.run(store.close())
@@ -0,0 +1,41 @@
+from ..players import ATTEMPTS, IDIOMS, PLAYERS, SCORE, PlayerStats
+
+
+def test_counters_and_views():
+    stats = PlayerStats()
+    stats.add(SCORE, "wxid_a", 5)
+    stats.add(IDIOMS, "wxid_a")
+    stats.add(ATTEMPTS, "wxid_b")
+    assert dict(stats.view(SCORE)) == {"wxid_a": 5}
+    assert dict(stats.view(ATTEMPTS)) == {"wxid_b": 1}
+    assert stats.get(SCORE, "wxid_b") is None
+    restored = PlayerStats.from_dicts({"wxid_a": 5}, None, {"wxid_a": 1}, {"wxid_b": 1})
+    assert dict(restored.view(IDIOMS)) == {"wxid_a": 1}
+
+
+def test_players_released_when_sessions_end():
+    base = len(PLAYERS)
+    first, second = PlayerStats(), PlayerStats()
+    first.add(SCORE, "wxid_release_a", 1)
+    first.add(IDIOMS, "wxid_release_a")
+    first.add(SCORE, "wxid_release_b", 1)
+    second.add(SCORE, "wxid_release_a", 1)
+    assert len(PLAYERS) == base + 2
+
+    # 另一局还在引用的玩家保留
+    del first
+    assert len(PLAYERS) == base + 1
+    assert PLAYERS.find("wxid_release_a") >= 0 and PLAYERS.find("wxid_release_b") < 0
+    del second
+    assert len(PLAYERS) == base
+
+
+def test_released_ids_are_reused():
+    stats = PlayerStats()
+    stats.add(SCORE, "wxid_reuse_a")
+    player_id = PLAYERS.find("wxid_reuse_a")
+    del stats
+    stats = PlayerStats()
+    stats.add(SCORE, "wxid_reuse_b")
+    assert PLAYERS.find("wxid_reuse_b") == player_id
+    assert dict(stats.view(SCORE)) == {"wxid_reuse_b": 1}
@@ -0,0 +1,39 @@
+from ..scheduler import DeadlineScheduler
+
+
+def test_pops_due_keys_in_deadline_order():
+    timers = DeadlineScheduler()
+    timers.set("b", 20.0)
+    timers.set("a", 10.0)
+    timers.set("c", 30.0)
+    assert timers.next_deadline() == 10.0
+    assert timers.pop_due(25.0) == ["a", "b"]
+    assert len(timers) == 1
+    assert timers.next_deadline() == 30.0
+
+
+def test_update_replaces_previous_deadline():
+    timers = DeadlineScheduler()
+    timers.set("a", 10.0)
+    timers.set("a", 50.0)
+    assert timers.pop_due(20.0) == []
+    assert timers.next_deadline() == 50.0
+    assert timers.pop_due(50.0) == ["a"]
+    # 取出后不会再次到期
+    assert timers.pop_due(100.0) == []
+
+
+def test_discard_cancels_deadline():
+    timers = DeadlineScheduler()
+    timers.set("a", 10.0)
+    timers.discard("a")
+    assert timers.next_deadline() is None
+    assert timers.pop_due(20.0) == []
+
+
+def test_heap_is_rebuilt_after_many_updates():
+    timers = DeadlineScheduler()
+    for i in range(1000):
+        timers.set("a", float(i))
+    assert len(timers._heap) <= 2 * len(timers) + 64
+    assert timers.pop_due(999.0) == ["a"]
@@ -0,0 +1,68 @@
+import asyncio
+
+from ..archive import GameArchive, archive_files, iter_games
+from ..sharding import HashRing, ShardCoordinator
+
+ROOMS = [f"{i}@chatroom" for i in range(2000)]
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().node_for("1@chatroom") is None
+
+
+def test_rooms_spread_across_nodes():
+    ring = HashRing(["w1", "w2", "w3"])
+    owners = [ring.node_for(room) for room in ROOMS]
+    assert owners == [ring.node_for(room) for room in ROOMS]
+    for node in ("w1", "w2", "w3"):
+        assert owners.count(node) > len(ROOMS) / 6
+
+
+def test_adding_a_node_moves_only_its_share():
+    before = HashRing(["w1", "w2", "w3"])
+    after = HashRing(["w1", "w2", "w3", "w4"])
+    moved = [room for room in ROOMS if before.node_for(room) != after.node_for(room)]
+    # 换主的群都归新节点，数量约为四分之一
+    assert all(after.node_for(room) == "w4" for room in moved)
+    assert len(moved) < len(ROOMS) / 2
+
+
+def test_lease_is_exclusive_between_workers(tmp_path):
+    path = str(tmp_path / "shards.db")
+
+    async def run():
+        first = ShardCoordinator(path, "w1")
+        second = ShardCoordinator(path, "w2")
+        await first.heartbeat()
+        await second.heartbeat()
+        await first.heartbeat()
+        room = next(r for r in ROOMS if first.should_own(r))
+        assert not second.should_own(room)
+        assert await first.acquire(room) and first.holds(room)
+
+        # 环变化后即使按哈希归第二个进程，租约未过期前也取不到
+        second.ring = HashRing(["w2"])
+        assert not await second.acquire(room)
+
+        await first.close()
+        assert await second.acquire(room)
+        await second.close()
+
+    asyncio.run(run())
+
+
+def test_workers_archive_to_separate_files(tmp_path):
+    async def run():
+        for worker_id in ("", "w1", "w11"):
+            archive = GameArchive(str(tmp_path), worker_id=worker_id)
+            archive.append({"game_id": worker_id or "single"})
+            await archive.close()
+        # 再次启动时各自接着写自己当天的最后一个文件
+        archive = GameArchive(str(tmp_path), worker_id="w1")
+        archive.append({"game_id": "w1-again"})
+        await archive.close()
+
+    asyncio.run(run())
+    names = sorted(path.rsplit("/", 1)[-1][15:] for path in archive_files(str(tmp_path)))
+    assert names == ["001.jsonl.gz", "001.w1.jsonl.gz", "001.w11.jsonl.gz"]
+    assert sorted(game["game_id"] for game in iter_games(str(tmp_path))) == ["single", "w1", "w1-again", "w11"]
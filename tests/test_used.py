@@ -0,0 +1,35 @@
+import json
+
+from ..dictionary import IdiomDictionary
+from ..used import UsedIdioms
+
+WORDS = ["一心一意", "意气风发", "发扬光大", "大公无私"]
+
+
+def _dictionary() -> IdiomDictionary:
+    return IdiomDictionary(WORDS)
+
+
+def test_membership_for_known_and_unknown_idioms():
+    used = UsedIdioms(["一心一意", "自创成语"], _dictionary())
+    assert "一心一意" in used and "自创成语" in used
+    assert "意气风发" not in used
+    assert list(used) == ["一心一意", "自创成语"]
+    assert used.ids == {0}
+
+
+def test_rounds_count_player_moves():
+    used = UsedIdioms(["一心一意"], _dictionary())
+    used.add_round("意气风发", "发扬光大")
+    # 机器人接不上时一轮只有玩家的成语
+    used.add_round("大公无私")
+    assert used.rounds == 2
+    assert len(used) == 4
+
+
+def test_roundtrip_keeps_entries_with_commas():
+    used = UsedIdioms(["一心一意", "知己知彼,百战不殆"], _dictionary())
+    data = json.loads(json.dumps(used.to_data(), ensure_ascii=False))
+    restored = UsedIdioms.from_data(data, _dictionary(), rounds=1)
+    assert list(restored) == ["一心一意", "知己知彼,百战不殆"]
+    assert restored.rounds == 1
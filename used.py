@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已使用成语 - 保留接龙顺序，同时支持O(1)判断是否用过
+"""
+from array import array
+from typing import Iterable, Iterator, List, Optional, Protocol, Set
+
+
+class _Dictionary(Protocol):
+    def index_of(self, word: str) -> int: ...
+
+    def word_at(self, index: int) -> str: ...
+
+
+class UsedIdioms:
+    """一局游戏中已使用的成语
+
+    接龙链按顺序存放在整数数组中：词库收录的成语记为词库编号，其他成语记为负数，
+    指向单独保存的字符串，因此加载了词库时每个成语只占几个字节。词库编号集合同时用于
+    判断是否用过和供接龙图直接查询，未收录的成语另用字符串集合判断。
+    """
+
+    __slots__ = ("_chain", "_extra", "_extra_members", "_ids", "_dictionary", "_rounds")
+
+    def __init__(self, idioms: Iterable[str] = (), dictionary: Optional[_Dictionary] = None, rounds: int = 0):
+        self._chain = array("i")
+        self._extra: List[str] = []  # 词库未收录的成语，按出现顺序
+        self._extra_members: Set[str] = set()
+        self._ids: Set[int] = set()
+        self._dictionary = dictionary
+        self._rounds = rounds
+        for idiom in idioms:
+            self.append(idiom)
+
+    @classmethod
+    def from_data(cls, data: Optional[Iterable[str]],
+                  dictionary: Optional[_Dictionary] = None, rounds: int = 0) -> "UsedIdioms":
+        """从持久化数据恢复，轮数不随成语保存，由调用方根据玩家的接龙次数给出"""
+        return cls(data or (), dictionary, rounds)
+
+    def to_data(self) -> List[str]:
+        """序列化为成语列表，写入JSON时原样保存"""
+        return list(self)
+
+    def add_round(self, idiom: str, reply: Optional[str] = None):
+        """记录一轮接龙：玩家的成语和机器人的回应，机器人接不上时没有回应"""
+        self.append(idiom)
+        if reply:
+            self.append(reply)
+        self._rounds += 1
+
+    def append(self, idiom: str):
+        """记录一个已使用的成语"""
+        index = self._dictionary.index_of(idiom) if self._dictionary is not None else -1
+        if index >= 0:
+            self._chain.append(index)
+            self._ids.add(index)
+        else:
+            self._chain.append(-1 - len(self._extra))
+            self._extra.append(idiom)
+            self._extra_members.add(idiom)
+
+    def __contains__(self, idiom: str) -> bool:
+        if idiom in self._extra_members:
+            return True
+        return self._dictionary is not None and self._dictionary.index_of(idiom) in self._ids
+
+    def __len__(self) -> int:
+        return len(self._chain)
+
+    def __iter__(self) -> Iterator[str]:
+        for code in self._chain:
+            yield self._dictionary.word_at(code) if code >= 0 else self._extra[-1 - code]
+
+    @property
+    def ids(self) -> Set[int]:
+        """已使用成语在本地词库中的编号"""
+        return self._ids
+
+    @property
+    def rounds(self) -> int:
+        """接龙轮数，即玩家接龙成功的次数"""
+        return self._rounds